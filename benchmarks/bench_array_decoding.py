@@ -0,0 +1,76 @@
+"""
+Encode/decode time of 1 KB, 1 MB and 500 MB arrays through NumpyArrayType, compared to the np.save()/np.load()
+round trip through BytesIO it replaced. Decoding uncompressed blobs returns views of the fetched bytes, so its time
+should stay flat as the arrays grow.
+
+Run from the repository root:
+    python benchmarks/bench_array_decoding.py
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.codecs import encode_array, decode_array  # noqa: E402
+
+SIZES = {"1 KB": 1_000, "1 MB": 1_000_000, "500 MB": 500_000_000}
+
+
+def make_array(nbytes: int) -> np.ndarray:
+    # Smooth complex field, which compresses a little like real monitor data does
+    n = nbytes // np.dtype(np.complex64).itemsize
+    phase = np.linspace(0, 200 * np.pi, n, dtype=np.float32)
+    return (np.cos(phase) + 1j * np.sin(phase)).astype(np.complex64)
+
+
+def np_save(array: np.ndarray) -> bytes:
+    with io.BytesIO() as buf:
+        np.save(buf, array, allow_pickle=False)
+        return buf.getvalue()
+
+
+def np_load(blob: bytes) -> np.ndarray:
+    with io.BytesIO(blob) as buf:
+        return np.load(buf, allow_pickle=False)
+
+
+def timed(func, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'size':<8}{'path':<22}{'encode ms':>12}{'decode ms':>12}")
+    for label, nbytes in SIZES.items():
+        array = make_array(nbytes)
+        repeats = 3 if nbytes < 100_000_000 else 1
+
+        blob = np_save(array)
+        encode = timed(lambda: np_save(array), repeats)
+        decode = timed(lambda: np_load(blob), repeats)
+        print(f"{label:<8}{'np.save/np.load':<22}{encode * 1e3:>12.3f}{decode * 1e3:>12.3f}")
+
+        # Blobs written by np.save() before codecs were introduced are decoded as views too
+        decode = timed(lambda: decode_array(blob), repeats)
+        print(f"{label:<8}{'legacy .npy':<22}{'':>12}{decode * 1e3:>12.3f}")
+        del blob
+
+        for codec in ("none", "zlib"):
+            blob = encode_array(array, codec, level=1)
+            assert np.array_equal(decode_array(blob), array)
+            encode = timed(lambda: encode_array(array, codec, level=1), repeats)
+            decode = timed(lambda: decode_array(blob), repeats)
+            print(f"{label:<8}{codec:<22}{encode * 1e3:>12.3f}{decode * 1e3:>12.3f}")
+            del blob
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Encode/decode throughput and compression ratio of the NumpyArrayType codecs, compared to the plain np.save()
+path used before codecs were introduced.
+
+Run from the repository root:
+    python benchmarks/bench_codecs.py
+"""
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.codecs import encode_array, decode_array, available_codecs  # noqa: E402
+
+
+def make_datasets() -> dict:
+    rng = np.random.default_rng(0)
+
+    # Smooth transmission spectrum
+    wavelengths = np.linspace(400, 1000, 2000, dtype=np.float32)
+    spectrum = (0.5 + 0.4 * np.sin(wavelengths / 40) * np.exp(-((wavelengths - 700) / 200) ** 2)).astype(np.float32)
+
+    # Complex field on a 2D monitor with smooth spatial variation and a little noise
+    x, y = np.meshgrid(np.linspace(0, 8 * np.pi, 200), np.linspace(0, 8 * np.pi, 200), indexing="ij")
+    phases = np.linspace(0, np.pi, 50)
+    field = np.exp(1j * (x[..., None] + y[..., None] * 0.5 + phases))[:, :, None, :, None]
+    field = field * np.array([1, 0.5, 0.1])[None, None, None, None, :]
+    field = (field + 1e-3 * rng.normal(size=field.shape)).astype(np.complex64)
+
+    # Mesh faces of a lattice: many small, regular integers
+    faces = np.arange(3 * 200_000, dtype=np.int64).reshape(-1, 3) % 100_000
+
+    return {"spectrum": spectrum, "field": field, "faces": faces}
+
+
+def np_save_roundtrip(array: np.ndarray):
+    with io.BytesIO() as buf:
+        np.save(buf, array, allow_pickle=False)
+        blob = buf.getvalue()
+    with io.BytesIO(blob) as buf:
+        np.load(buf, allow_pickle=False)
+    return blob
+
+
+def timed(func, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'dataset':<10}{'codec':<12}{'ratio':>8}{'encode MB/s':>14}{'decode MB/s':>14}")
+    for name, array in make_datasets().items():
+        megabytes = array.nbytes / 1e6
+
+        blob = np_save_roundtrip(array)
+        encode = timed(lambda: np.save(io.BytesIO(), array, allow_pickle=False))
+        decode = timed(lambda: np.load(io.BytesIO(blob), allow_pickle=False))
+        print(f"{name:<10}{'np.save':<12}{array.nbytes / len(blob):>8.2f}"
+              f"{megabytes / encode:>14.0f}{megabytes / decode:>14.0f}")
+
+        for codec in available_codecs():
+            blob = encode_array(array, codec)
+            assert np.array_equal(decode_array(blob), array)
+            encode = timed(lambda: encode_array(array, codec))
+            decode = timed(lambda: decode_array(blob))
+            print(f"{name:<10}{codec:<12}{array.nbytes / len(blob):>8.2f}"
+                  f"{megabytes / encode:>14.0f}{megabytes / decode:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
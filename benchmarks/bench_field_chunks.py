@@ -0,0 +1,60 @@
+"""
+Time to read a single wavelength of a field stored as one array versus split into wavelength chunks, for an
+increasing number of recorded wavelengths.
+
+Run from the repository root:
+    python benchmarks/bench_field_chunks.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.handler import DatabaseHandler  # noqa: E402
+from fdtdream.results.monitors import FieldAndPowerMonitor, Field  # noqa: E402
+from fdtdream.results.simulation import Simulation  # noqa: E402
+
+
+def make_simulation(n_wavelengths: int) -> Simulation:
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 1000, 150, dtype=np.float32)
+    wavelengths = np.linspace(400, 1000, n_wavelengths, dtype=np.float32)
+    shape = (x.size, x.size, 1, n_wavelengths, 3)
+    E = Field("E", (rng.normal(size=shape) + 1j * rng.normal(size=shape)).astype(np.complex64), "xyz")
+    monitor = FieldAndPowerMonitor("monitor", {}, wavelengths, x, x, np.zeros(1, dtype=np.float32), E, None, None,
+                                   None, None)
+    return Simulation("benchmark", "simulation", {}, [monitor], [])
+
+
+def timed(func, repeats: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    print(f"{'wavelengths':<14}{'layout':<10}{'first frame ms':>16}{'full field ms':>16}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_wavelengths in (10, 50, 200):
+            simulation = make_simulation(n_wavelengths)
+            for layout, chunk_wavelengths in (("single", None), ("chunked", 1)):
+                db = DatabaseHandler(str(Path(directory) / f"{layout}_{n_wavelengths}.db"),
+                                     field_chunk_wavelengths=chunk_wavelengths)
+                db.add_simulation(simulation)
+                field_id = db.get_monitor_by_id(1).fields[0].id
+
+                first_frame = timed(lambda: db.read_field(field_id, wavelengths=0))
+                full_field = timed(lambda: db.get_monitor_by_id(1).fields[0].data)
+                print(f"{n_wavelengths:<14}{layout:<10}{first_frame * 1e3:>16.1f}{full_field * 1e3:>16.1f}")
+                db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
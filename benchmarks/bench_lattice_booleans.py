@@ -0,0 +1,62 @@
+"""
+Time to build the mesh of a 20 x 20 lattice of cylinders, etch a trench through it and clip it to half of the FDTD
+region, as Simulation._extract_meshes() does for a lattice with a symmetric boundary. This compares pairwise calls to
+trimesh.boolean, converting to and from Manifold on every call, against the booleans module, which converts each
+mesh once and evaluates the whole boolean tree when converting back.
+
+Run from the repository root:
+    python benchmarks/bench_lattice_booleans.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import trimesh
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.resources import booleans  # noqa: E402
+
+SITES = 20
+PERIOD = 300.0
+SECTIONS = 64
+
+
+def make_inputs():
+    base = trimesh.creation.cylinder(radius=100, height=200, sections=SECTIONS)
+    offsets = (np.arange(SITES) - (SITES - 1) / 2) * PERIOD
+    sites = [(x, y, 0.0) for x in offsets for y in offsets]
+    etch = trimesh.creation.box((SITES * PERIOD, PERIOD / 2, 400))
+    region = trimesh.creation.box((SITES * PERIOD / 2, SITES * PERIOD, 1000))
+    region.apply_translation((SITES * PERIOD / 4, 0, 0))
+    return base, sites, etch, region
+
+
+def trimesh_path(base, sites, etch, region) -> trimesh.Trimesh:
+    copies = [base.copy().apply_translation(site) for site in sites]
+    lattice = trimesh.boolean.union(copies)
+    etched = trimesh.boolean.difference([lattice, etch])
+    return trimesh.boolean.intersection([etched, region])
+
+
+def manifold_path(base, sites, etch, region) -> trimesh.Trimesh:
+    base = booleans.to_manifold(base)
+    lattice = booleans.union(base.translate(site) for site in sites)
+    etched = booleans.difference(lattice, [booleans.to_manifold(etch)])
+    return booleans.to_trimesh(booleans.intersection([etched, booleans.to_manifold(region)]))
+
+
+def main() -> None:
+    inputs = make_inputs()
+    for label, path in (("trimesh.boolean", trimesh_path), ("booleans", manifold_path)):
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            mesh = path(*inputs)
+            best = min(best, time.perf_counter() - start)
+        print(f"{label:<18}{best * 1e3:>10.1f} ms  {len(mesh.faces)} faces, volume {mesh.volume:.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Insert throughput and random monitor read latency of DatabaseHandler for each SQLite profile.
+
+Run from the repository root:
+    python benchmarks/bench_profiles.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.handler import DatabaseHandler  # noqa: E402
+from fdtdream.database.profiles import PROFILES  # noqa: E402
+from fdtdream.results.monitors import FieldAndPowerMonitor, Field  # noqa: E402
+from fdtdream.results.simulation import Simulation  # noqa: E402
+
+N_SIMULATIONS = 300
+N_READS = 300
+
+
+def make_simulation(i: int, rng: np.random.Generator) -> Simulation:
+    x = np.linspace(0, 500, 40, dtype=np.float32)
+    wavelengths = np.linspace(400, 1000, 20, dtype=np.float32)
+    shape = (x.size, x.size, 1, wavelengths.size, 3)
+    E = Field("E", (rng.normal(size=shape) + 1j * rng.normal(size=shape)).astype(np.complex64), "xyz")
+    T = rng.random(wavelengths.size).astype(np.float32)
+    monitor = FieldAndPowerMonitor("monitor", {}, wavelengths, x, x, np.zeros(1, dtype=np.float32), E, None, None,
+                                   T, None)
+    return Simulation("benchmark", f"simulation {i}", {"radius": i}, [monitor], [])
+
+
+def main() -> None:
+    rng = np.random.default_rng(0)
+    simulations = [make_simulation(i, rng) for i in range(N_SIMULATIONS)]
+
+    print(f"{'profile':<18}{'inserts/s':>12}{'read ms':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for profile in PROFILES:
+            db = DatabaseHandler(str(Path(directory) / f"{profile}.db"), profile=profile)
+
+            start = time.perf_counter()
+            for simulation in simulations:
+                db.add_simulation(simulation)
+            inserts = N_SIMULATIONS / (time.perf_counter() - start)
+
+            monitor_ids = rng.integers(1, N_SIMULATIONS + 1, N_READS)
+            start = time.perf_counter()
+            for monitor_id in monitor_ids:
+                db.get_monitor_by_id(int(monitor_id), with_fields=True).fields[0].read(wavelengths=0)
+            read = (time.perf_counter() - start) / N_READS
+
+            print(f"{profile:<18}{inserts:>12.1f}{read * 1e3:>10.2f}")
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Time to project the mesh of a 14 x 14 lattice of cylinders, about 50k faces, onto the three planes. This compares
+StructureModel._compute_projections(), which projects and filters the faces as arrays, against the loop it replaced,
+which built and validated a polygon per face. Both produce the same outlines.
+
+Run from the repository root:
+    python benchmarks/bench_projections.py
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import shapely.geometry as geom
+import shapely.ops as ops
+import trimesh
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.db import PLANE_INDICES, StructureModel  # noqa: E402
+
+SITES = 14
+PERIOD = 300.0
+
+
+def make_mesh() -> trimesh.Trimesh:
+    base = trimesh.creation.cylinder(radius=100, height=200, sections=64)
+    offsets = np.arange(SITES) * PERIOD
+    return trimesh.util.concatenate([base.copy().apply_translation((x, y, 0)) for x in offsets for y in offsets])
+
+
+def face_loop(structure: StructureModel, mesh: trimesh.Trimesh) -> dict:
+    projections = {}
+    for plane, indices in PLANE_INDICES.items():
+        polys = []
+        for face in mesh.faces:
+            polygon = geom.Polygon(mesh.vertices[face][:, indices])
+            if polygon.is_valid and not polygon.is_empty and polygon.minimum_clearance > 1e-4:
+                polys.append(polygon)
+        projections[plane] = structure._polygon_to_pathpatch(ops.unary_union(polys)) if polys else None
+    return projections
+
+
+def main() -> None:
+    mesh = make_mesh()
+    structure = StructureModel(name="lattice")
+    print(f"{len(mesh.faces)} faces")
+
+    results = {}
+    for label, path in (("polygon per face", lambda: face_loop(structure, mesh)),
+                        ("vectorised", lambda: structure._compute_projections(mesh))):
+        start = time.perf_counter()
+        results[label] = path()
+        print(f"{label:<18}{time.perf_counter() - start:>8.3f} s")
+
+    old, new = results.values()
+    for plane in PLANE_INDICES:
+        assert np.array_equal(old[plane].get_path().vertices, new[plane].get_path().vertices)
+        assert np.array_equal(old[plane].get_path().codes, new[plane].get_path().codes)
+
+
+if __name__ == "__main__":
+    main()
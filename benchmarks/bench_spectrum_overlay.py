@@ -0,0 +1,72 @@
+"""
+Time to overlay the T spectra of every simulation in a category of 500. This compares reading each monitor's
+wavelengths and T with DatabaseHandler.get_T_data() and drawing a line per monitor, against reading the resampled
+(Nruns, Nλ) block with DatabaseHandler.get_spectrum_block() and drawing it as a single LineCollection.
+
+Run from the repository root:
+    python benchmarks/bench_spectrum_overlay.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.handler import DatabaseHandler  # noqa: E402
+from fdtdream.results.monitors import FieldAndPowerMonitor  # noqa: E402
+from fdtdream.results.simulation import Simulation  # noqa: E402
+
+N_SIMULATIONS = 500
+N_WAVELENGTHS = 4000
+
+
+def make_simulation(i: int) -> Simulation:
+    wavelengths = np.linspace(400, 1000, N_WAVELENGTHS, dtype=np.float32)
+    T = (0.5 + 0.4 * np.sin(wavelengths / (30 + i / 10))).astype(np.float32)
+    axis = np.zeros(1, dtype=np.float32)
+    monitor = FieldAndPowerMonitor("monitor", {}, wavelengths, axis, axis, axis, None, None, None, T, None)
+    return Simulation("sweep", f"simulation {i}", {"i": i}, [monitor], [])
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseHandler(str(Path(directory) / "overlay.db"))
+        db.add_simulations(make_simulation(i) for i in range(N_SIMULATIONS))
+        monitor_ids = [mon_id for _, _, _, mon_id, _ in db.get_tree_snapshot()]
+
+        start = time.perf_counter()
+        spectra = [db.get_T_data(mon_id) for mon_id in monitor_ids]
+        read = time.perf_counter() - start
+        figure = Figure()
+        canvas = FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        for wavelengths, T in spectra:
+            ax.plot(wavelengths, T)
+        start = time.perf_counter()
+        canvas.draw()
+        drawn = time.perf_counter() - start
+        print(f"line per monitor:  read {read:6.3f} s, draw {drawn:6.3f} s")
+
+        start = time.perf_counter()
+        block = db.get_spectrum_block("sweep")
+        read = time.perf_counter() - start
+        figure = Figure()
+        canvas = FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        ax.add_collection(block.line_collection())
+        ax.autoscale_view()
+        start = time.perf_counter()
+        canvas.draw()
+        drawn = time.perf_counter() - start
+        print(f"LineCollection:    read {read:6.3f} s, draw {drawn:6.3f} s  {block.values.shape}")
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
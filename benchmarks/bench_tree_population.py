@@ -0,0 +1,87 @@
+"""
+Time to populate the database tree on a database with 50 000 simulations. This compares the single joined query
+of DatabaseHandler.get_tree_snapshot() against querying categories, then simulations per category, then monitors
+per simulation, with and without the indexes added by migration 1.
+
+Without indexes every monitor lookup scans the monitors table, so the full tree takes far too long to wait for.
+That case is timed on a sample of simulations and extrapolated.
+
+Run from the repository root:
+    python benchmarks/bench_tree_population.py
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fdtdream.database.db import Base  # noqa: E402
+from fdtdream.database.handler import DatabaseHandler  # noqa: E402
+
+N_SIMULATIONS = 50_000
+N_CATEGORIES = 50
+MONITORS_PER_SIMULATION = 2
+SAMPLE = 500
+
+
+def fill(db: DatabaseHandler) -> None:
+    """Inserts simulations with monitors and structures but no array data, which the tree never reads."""
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql(
+            "INSERT INTO simulations (id, category, name, parameters) VALUES (?, ?, ?, ?)",
+            [(i, f"category {i % N_CATEGORIES}", f"simulation {i}", "{}") for i in range(1, N_SIMULATIONS + 1)]
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO monitors (simulation_id, name, monitor_type, parameters) VALUES (?, ?, ?, ?)",
+            [(i, f"monitor {j}", "field_and_power", "{}")
+             for i in range(1, N_SIMULATIONS + 1) for j in range(MONITORS_PER_SIMULATION)]
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO structures (simulation_id, name) VALUES (?, ?)",
+            [(i, "structure") for i in range(1, N_SIMULATIONS + 1)]
+        )
+
+
+def populate_tree(db: DatabaseHandler, limit: int = None) -> int:
+    """Runs the per-level queries the tree was populated with before, returning the number of simulations visited."""
+    visited = 0
+    for category in db.get_all_categories():
+        for sim_id, _ in db.get_simulations_by_category(category):
+            db.get_monitors_for_simulation(sim_id)
+            visited += 1
+            if limit is not None and visited >= limit:
+                return visited
+    return visited
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        db = DatabaseHandler(str(Path(directory) / "tree.db"))
+        fill(db)
+
+        start = time.perf_counter()
+        rows = db.get_tree_snapshot()
+        snapshot = time.perf_counter() - start
+        print(f"snapshot:         {snapshot:8.2f} s for {len(rows)} rows")
+
+        start = time.perf_counter()
+        visited = populate_tree(db)
+        indexed = time.perf_counter() - start
+        print(f"with indexes:     {indexed:8.2f} s for {visited} simulations")
+
+        with db.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                for index in table.indexes:
+                    index.drop(connection)
+
+        start = time.perf_counter()
+        visited = populate_tree(db, limit=SAMPLE)
+        unindexed = (time.perf_counter() - start) / visited * N_SIMULATIONS
+        print(f"without indexes:  {unindexed:8.2f} s (extrapolated from {visited} simulations)")
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,40 @@
 import uuid
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from PyQt6.QtCore import QObject, QThreadPool, pyqtSlot
+from PyQt6.QtCore import QObject, QThreadPool, QTimer, pyqtSlot
 from PyQt6.QtGui import QStandardItemModel
 from PyQt6.QtWidgets import QMessageBox, QWidget
 
 from ..models import DBObject, DBObjects
 from ..processes import PopulateTreeWorker, CopyWorker, CopyProgressDialog
 from ..signals import dbPanelSignalBus, dbRightClickMenuSignalBus
-from ....fdtdream.database import DatabaseHandler
+from ...shared import SETTINGS
+from ....fdtdream.database import DatabaseHandler, DatabaseWatcher
+from ....fdtdream.database.profiles import PROFILES, profile_for_path
 
 
 class DatabaseController(QObject):
+    POLL_INTERVAL_MS = 1000
+    """How often the imported databases are checked for changes committed by other programs, ie. a running sweep."""
+
+    # region QSettings Namespaces
+    database_ns = "app/database/"
+    profile_ns = database_ns + "profile"
+    """SQLite profile imported databases are opened with, see fdtdream.database.profiles.PROFILES."""
+    # endregion
+
+    DEFAULT_PROFILE = "interactive-read"
+    """Lets the tree be read while a sweep writes to the database. It switches local files to WAL for good."""
+
     _dbHandlers: List[DatabaseHandler]
     """List of the database handlers of the currently imported databases in the application."""
 
+    _watchers: Dict[DatabaseHandler, DatabaseWatcher]
+    """Watchers reporting the changes committed to each imported database, by its handler."""
+
+    _pollTimer: QTimer
+    """Timer polling the watchers."""
+
     _threadPool: QThreadPool
     """Connection to the global thread pool."""
 
@@ -29,12 +49,19 @@ class DatabaseController(QObject):
 
         # Init attributes
         self._dbHandlers = []
+        self._watchers = {}
         self._threadPool = QThreadPool.globalInstance()
         self._populateTreeToken = None
         self._copyInProgress = False
 
         self._connectSignals()
 
+        # Changes are applied to the current tree model as they're committed, rather than rebuilding it.
+        self._pollTimer = QTimer(self)
+        self._pollTimer.setInterval(self.POLL_INTERVAL_MS)
+        self._pollTimer.timeout.connect(self._onPollDatabases)  # type: ignore
+        self._pollTimer.start()
+
     def _connectSignals(self) -> None:
 
         dbPanelSignalBus.importDatabase.connect(self._onImportDatabase)
@@ -59,6 +86,10 @@ class DatabaseController(QObject):
         token = str(uuid.uuid4())
         self._populateTreeToken = token
 
+        # The new model holds everything committed from here on, so the watchers only report later changes.
+        for watcher in self._watchers.values():
+            watcher.reset()
+
         # Start a worker thread and connect it's finished signal to the _onMonitorParamsReady() method.
         worker = PopulateTreeWorker(
             dbHandlers=self._dbHandlers.copy(),
@@ -67,17 +98,33 @@ class DatabaseController(QObject):
         worker.signals.finished.connect(self._onTreeModelReady)
         self._threadPool.start(worker)
 
-    @staticmethod
-    @pyqtSlot(object)
-    def _onTreeModelReady(model: QStandardItemModel) -> None:
+    @pyqtSlot(object, str)
+    def _onTreeModelReady(self, model: QStandardItemModel, token: str) -> None:
         """Recieves the finished tree model from the populateTreeWorker thread."""
 
+        # Resume polling once the latest requested model is shown.
+        if token == self._populateTreeToken:
+            self._populateTreeToken = None
+
         # Emit the nothing selected signal
         dbPanelSignalBus.nothingSelected.emit()
 
         # Emit the model to the tree view.
         dbPanelSignalBus.populateTree.emit(model)
 
+    @pyqtSlot()
+    def _onPollDatabases(self) -> None:
+        """Sends the changes committed to the imported databases since the last poll to the tree view."""
+
+        # Changes committed while a new model is being created are polled once it's shown.
+        if self._populateTreeToken is not None:
+            return
+
+        for dbHandler, watcher in self._watchers.items():
+            changes = watcher.poll()
+            if changes is not None and (changes.rows or changes.removed):
+                dbPanelSignalBus.updateTree.emit(dbHandler, changes)
+
     @pyqtSlot(list)
     def _onImportDatabase(self, database_paths: List[str]) -> None:
         """
@@ -87,11 +134,16 @@ class DatabaseController(QObject):
 
         existingPaths = [dbHandler.path for dbHandler in self._dbHandlers]
 
+        profile = SETTINGS.value(self.profile_ns, self.DEFAULT_PROFILE, type=str)
+        if profile not in PROFILES:
+            profile = self.DEFAULT_PROFILE
+
         for path in database_paths:
 
             # Create a new database handler
             try:
-                dbHandler = DatabaseHandler(path)
+                # Files on network drives are opened with the safe profile rather than converted to WAL.
+                dbHandler = DatabaseHandler(path, profile=profile_for_path(path, profile))
 
             except Exception as e:
                 QMessageBox.warning(
@@ -110,8 +162,9 @@ class DatabaseController(QObject):
                 )
                 return
 
-            # Add to the list of handlers
+            # Add to the list of handlers, and start watching for changes
             self._dbHandlers.append(dbHandler)
+            self._watchers[dbHandler] = dbHandler.watch()
 
             # Add to list of existing paths.
             existingPaths.append(dbHandler.path)
@@ -124,60 +177,54 @@ class DatabaseController(QObject):
     def _onRemoveDatabases(self, databases: DBObjects) -> None:
         for database in databases:
             self._dbHandlers.remove(database["dbHandler"])
+            self._watchers.pop(database["dbHandler"]).close()
         dbPanelSignalBus.populateTreeRequested.emit()
 
-    @staticmethod
     @pyqtSlot(list)
-    def _onDeleteCategories(categories: DBObjects) -> None:
+    def _onDeleteCategories(self, categories: DBObjects) -> None:
         for category in categories:
             category["dbHandler"].delete_category(category["name"])
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
-    @staticmethod
     @pyqtSlot(list)
-    def _onDeleteMonitors(monitors: DBObjects) -> None:
+    def _onDeleteMonitors(self, monitors: DBObjects) -> None:
         for monitor in monitors:
             monitor["dbHandler"].delete_monitor_by_id(monitor["id"])
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
-    @staticmethod
     @pyqtSlot(list)
-    def _onDeleteSimulations(simulations: DBObjects) -> None:
+    def _onDeleteSimulations(self, simulations: DBObjects) -> None:
         for simulation in simulations:
             simulation["dbHandler"].delete_simulation_by_id(simulation["id"])
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
     # endregion
 
     # region Rename methods
-    @staticmethod
     @pyqtSlot(object, str)
-    def _onRenameSimulation(simulation: DBObject, new_name: str) -> None:
+    def _onRenameSimulation(self, simulation: DBObject, new_name: str) -> None:
         """Renames the selected simulation."""
         dbHandler = simulation["dbHandler"]
         dbHandler.rename_simulation(simulation["id"], new_name)
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
-    @staticmethod
-    def _onRenameMonitor(monitor: DBObject, new_name: str) -> None:
+    def _onRenameMonitor(self, monitor: DBObject, new_name: str) -> None:
         """Renames the selected monitor."""
         dbHandler = monitor["dbHandler"]
         dbHandler.rename_monitor(monitor["id"], new_name)
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
-    @staticmethod
     @pyqtSlot(object, str)
-    def _onRenameCategory(category: DBObject, new_name: str) -> None:
+    def _onRenameCategory(self, category: DBObject, new_name: str) -> None:
         dbHandler = category["dbHandler"]
         dbHandler.rename_category(category["name"], new_name)
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
-    @staticmethod
     @pyqtSlot(list, str)
-    def _onChangeCategory(simulations: DBObjects, new_category: str) -> None:
+    def _onChangeCategory(self, simulations: DBObjects, new_category: str) -> None:
         for simulation in simulations:
             simulation["dbHandler"].change_simulation_category(simulation["id"], new_category)
-        dbPanelSignalBus.populateTreeRequested.emit()
+        self._onPollDatabases()
 
     # endregion
 
@@ -222,7 +269,7 @@ class DatabaseController(QObject):
                     msg
                 )
 
-            dbPanelSignalBus.populateTreeRequested.emit()
+            self._onPollDatabases()
 
         worker.signals.progressErrorSummary.connect(show_result)
 
@@ -1,5 +1,6 @@
 from .parameterFetcher import ParameterFetcher
-from .populateTree import PopulateTreeWorker
+from .populateTree import PopulateTreeWorker, createCategoryItem, createSimulationItem
 from .copyToDatabase import CopyWorker, CopyProgressDialog
 
-__all__ = ["ParameterFetcher", "PopulateTreeWorker", "CopyWorker", "CopyProgressDialog"]
+__all__ = ["ParameterFetcher", "PopulateTreeWorker", "createCategoryItem", "createSimulationItem", "CopyWorker",
+           "CopyProgressDialog"]
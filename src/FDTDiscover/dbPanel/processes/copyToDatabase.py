@@ -1,4 +1,5 @@
-from typing import List, Optional
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 from PyQt6.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot, Qt
 from PyQt6.QtGui import QStandardItemModel
@@ -7,7 +8,6 @@ from PyQt6.QtWidgets import QWidget, QProgressDialog
 from ..models import DBObjects, DBObject
 from ...shared import AutoSignalBusMeta, SignalProtocolNone, SignalProtocol
 from ....fdtdream.database import DatabaseHandler
-from ....fdtdream.database import SimulationPydanticModel
 
 
 class CopySignals(QObject, metaclass=AutoSignalBusMeta):
@@ -49,29 +49,39 @@ class CopyWorker(QRunnable):
         self.targetDB = targetDB
         self.signals = CopySignals()
 
-    def _copySimulationsToDatabase(self, simulations: DBObjects, session) -> None:
+    def _copySimulationsToDatabase(self, simulations: DBObjects) -> None:
+        # Group the simulations by source database, skipping the ones already in the target db.
+        selection: Dict[Path, Tuple[DatabaseHandler, List[int]]] = {}
+        skipped = 0
         for simulation in simulations:
-            if self.cancelled:
-                break
-
-            # Check if the target db is the same as the simulations db. If so, skip it.
             if simulation["dbHandler"].path == self.targetDB.path:
-                self.progress += 1
+                skipped += 1
                 continue
+            selection.setdefault(simulation["dbHandler"].path, (simulation["dbHandler"], []))[1].append(
+                simulation["id"]
+            )
 
-            sim_model = simulation["dbHandler"].get_simulation_by_id(simulation["id"])
-            if not sim_model:
+        def onProgress(copied: int) -> None:
+            self.progress = skipped + copied
+            self.signals.progressUpdated.emit(self.progress)
+
+        # Rows are copied with SQL straight from the source files, without loading the simulations.
+        newIds = self.targetDB.copy_simulations(
+            list(selection.values()), progress=onProgress, cancelled=lambda: self.cancelled
+        )
+        if newIds is None:
+            return
+
+        self.progress = len(simulations)
+        for simulation in simulations:
+            if simulation["dbHandler"].path == self.targetDB.path:
+                continue
+            if (simulation["dbHandler"].path, simulation["id"]) not in newIds:
                 self.errors.append(
                     f"DB: {simulation['dbHandler'].filename}: {simulation['name']}"
                 )
-            else:
-                pydantic_model = SimulationPydanticModel.from_model(sim_model)
-                self.targetDB.add_simulation(pydantic_model, session=session)
-
-            self.progress += 1
-            self.signals.progressUpdated.emit(self.progress)
 
-    def _copyCategoriesToDatabase(self, session):
+    def _copyCategoriesToDatabase(self):
         all_sims: DBObjects = []
         for category in self.objects:
             sims = category["dbHandler"].get_simulations_by_category(category["name"])
@@ -88,7 +98,7 @@ class CopyWorker(QRunnable):
             )
 
         self.totalNrSimulations = len(all_sims)
-        self._copySimulationsToDatabase(all_sims, session)
+        self._copySimulationsToDatabase(all_sims)
 
     def cancel(self):
         self.cancelled = True
@@ -96,23 +106,22 @@ class CopyWorker(QRunnable):
     @pyqtSlot()
     def run(self):
         try:
-            with self.targetDB.Session() as session:
-                if self.objectType == "simulation":
-                    self.totalNrSimulations = len(self.objects)
-                    self._copySimulationsToDatabase(self.objects, session)
-                elif self.objectType == "category":
-                    self._copyCategoriesToDatabase(session)
-
-                if self.cancelled:
-                    session.rollback()
-                    self.signals.progressErrorSummary.emit(True, 0, self.totalNrSimulations or 0, [])
-                    return
+            if self.objectType == "simulation":
+                self.totalNrSimulations = len(self.objects)
+                self._copySimulationsToDatabase(self.objects)
+            elif self.objectType == "category":
+                self._copyCategoriesToDatabase()
 
-                session.commit()
+            if self.cancelled:
+                # The copy runs in a single transaction, which is rolled back when cancelled.
+                self.signals.progressErrorSummary.emit(True, 0, self.totalNrSimulations or 0, [])
+                return
 
         except Exception as e:
-            session.rollback()
+            # Nothing is copied when the copy fails, as its transaction is rolled back.
             self.errors.append(str(e))
+            self.signals.progressErrorSummary.emit(False, 0, self.totalNrSimulations or 0, self.errors)
+            return
 
         copied = self.progress - len(self.errors)
         self.signals.progressErrorSummary.emit(False, copied, self.totalNrSimulations or 0, self.errors)
@@ -1,15 +1,63 @@
+from itertools import groupby
+from operator import itemgetter
+
 from PyQt6.QtCore import QObject, QRunnable, pyqtSignal, pyqtSlot, Qt
 from PyQt6.QtGui import QStandardItemModel, QStandardItem
 from ..models import DBObject
-from typing import Tuple, List
-from ....fdtdream.database import DatabaseHandler
+from typing import Dict, Iterable, List, Optional, Tuple
+from ....fdtdream.database import DatabaseHandler, FederatedDatabase
+from ....fdtdream.database.queries import MAX_ATTACHED
 from ...shared import AutoSignalBusMeta, SignalProtocol
 
 
+def createCategoryItem(dbHandler: DatabaseHandler, category: str) -> QStandardItem:
+    """Creates the tree item of a category, without any simulations."""
+
+    # Create a DBObject typed dict.
+    categoryDBObject = DBObject(type="category", name=category, dbHandler=dbHandler, id=None)
+
+    # Create item and assign data.
+    cat_item = QStandardItem(category)
+    cat_item.setEditable(False)
+    cat_item.setData(categoryDBObject, Qt.ItemDataRole.UserRole)
+    return cat_item
+
+
+def createSimulationItem(dbHandler: DatabaseHandler, sim_id: int, sim_name: str,
+                         sim_rows: Iterable[Tuple[str, int, str, Optional[int], Optional[str]]]) -> QStandardItem:
+    """Creates the tree item of a simulation with its monitors, from its rows of the database's tree snapshot."""
+
+    # Create DBOject typed dict
+    simulationDBObject = DBObject(type="simulation", name=sim_name, dbHandler=dbHandler, id=sim_id)
+
+    # Create item and assign data.
+    sim_item = QStandardItem(sim_name)
+    sim_item.setEditable(False)
+    sim_item.setData(simulationDBObject, Qt.ItemDataRole.UserRole)
+
+    # Create an item for each monitor in the simulation
+    for _, _, _, mon_id, mon_name in sim_rows:
+        if mon_id is None:
+            continue
+
+        # Create DBObject typed dict.
+        monitorDBObject = DBObject(type="monitor", name=mon_name, dbHandler=dbHandler, id=mon_id)
+
+        # Create item and assign data.
+        mon_item = QStandardItem(mon_name)
+        mon_item.setEditable(False)
+        mon_item.setData(monitorDBObject, Qt.ItemDataRole.UserRole)
+
+        # Add monitor to the simulation row
+        sim_item.appendRow(mon_item)
+
+    return sim_item
+
+
 class PopulateTreeSignals(QObject, metaclass=AutoSignalBusMeta):
-    _finished = pyqtSignal(object)
-    finished: SignalProtocol[QStandardItemModel]
-    """Signal emitted by a by the PopulateTreeWorker worker thread when it's finished."""
+    _finished = pyqtSignal(object, str)
+    finished: SignalProtocol[QStandardItemModel, str]
+    """Signal emitted by a by the PopulateTreeWorker worker thread when it's finished, with the token of the request."""
 
 
 class PopulateTreeWorker(QRunnable):
@@ -24,6 +72,24 @@ class PopulateTreeWorker(QRunnable):
         self.token = token
         self.signals = PopulateTreeSignals()
 
+    def _fetchSnapshots(self) -> Dict[str, List[Tuple[str, int, str, Optional[int], Optional[str]]]]:
+        """
+        Fetches the tree snapshot of every database, by filename. The databases are federated so the whole tree
+        comes from a single query, unless there are more than can be attached at once or their filenames collide.
+        """
+        filenames = [dbHandler.filename for dbHandler in self.dbHandlers]
+        if len(filenames) > MAX_ATTACHED or len(set(filenames)) < len(filenames):
+            return {dbHandler.filename: dbHandler.get_tree_snapshot() for dbHandler in self.dbHandlers}
+
+        federated = FederatedDatabase(self.dbHandlers)
+        try:
+            snapshot = federated.get_tree_snapshot()
+        finally:
+            federated.close()
+
+        # Drop the filename from the rows, so they match the snapshot of a single database.
+        return {filename: [row[1:] for row in rows] for filename, rows in groupby(snapshot, key=itemgetter(0))}
+
     def _createTreeModel(self) -> QStandardItemModel:
         """Creates a new tree view model from objects in the provided databases."""
 
@@ -38,6 +104,7 @@ class PopulateTreeWorker(QRunnable):
         root = model.invisibleRootItem()
 
         # Fetch all imported database handlers
+        snapshots = self._fetchSnapshots()
         for dbHandler in self.dbHandlers:
 
             # Create a DBObject typed dict.
@@ -48,46 +115,14 @@ class PopulateTreeWorker(QRunnable):
             db_item.setEditable(False)
             db_item.setData(dbHandlerDBObject, Qt.ItemDataRole.UserRole)
 
-            # Fetch all categories in the database
-            categories = dbHandler.get_all_categories()
-            for category in categories:
-
-                # Create a DBObject typed dict.
-                categoryDBObject = DBObject(type="category", name=category, dbHandler=dbHandler, id=None)
-
-                # Create item and assign data.
-                cat_item = QStandardItem(category)
-                cat_item.setEditable(False)
-                cat_item.setData(categoryDBObject, Qt.ItemDataRole.UserRole)
-
-                # Fetch all simulations in the category
-                simulations = dbHandler.get_simulations_by_category(category)
-                for sim_id, sim_name in simulations:
-
-                    # Create DBOject typed dict
-                    simulationDBObject = DBObject(type="simulation", name=sim_name, dbHandler=dbHandler, id=sim_id)
-
-                    # Create item and assign data.
-                    sim_item = QStandardItem(sim_name)
-                    sim_item.setEditable(False)
-                    sim_item.setData(simulationDBObject, Qt.ItemDataRole.UserRole)
-
-                    # Fetch all monitors in the simulation
-                    monitors = dbHandler.get_monitors_for_simulation(sim_id)
-                    for mon_id, mon_name in monitors:
-                        # Create DBObject typed dict.
-                        monitorDBObject = DBObject(type="monitor", name=mon_name, dbHandler=dbHandler, id=mon_id)
-
-                        # Create item and assign data.
-                        mon_item = QStandardItem(mon_name)
-                        mon_item.setEditable(False)
-                        mon_item.setData(monitorDBObject, Qt.ItemDataRole.UserRole)
-
-                        # Add monitor to the simulation row
-                        sim_item.appendRow(mon_item)
+            # Group the hierarchy of the database by category and simulation.
+            snapshot = snapshots.get(dbHandler.filename, [])
+            for category, category_rows in groupby(snapshot, key=itemgetter(0)):
 
-                    # Add simulation to the category row
-                    cat_item.appendRow(sim_item)
+                # Create the category item, with an item for each simulation in the category
+                cat_item = createCategoryItem(dbHandler, category)
+                for (sim_id, sim_name), sim_rows in groupby(category_rows, key=itemgetter(1, 2)):
+                    cat_item.appendRow(createSimulationItem(dbHandler, sim_id, sim_name, sim_rows))
 
                 # Add category to the database row.
                 db_item.appendRow(cat_item)
@@ -101,4 +136,4 @@ class PopulateTreeWorker(QRunnable):
     @pyqtSlot()
     def run(self):
         model = self._createTreeModel()
-        self.signals.finished.emit(model)
+        self.signals.finished.emit(model, self.token)
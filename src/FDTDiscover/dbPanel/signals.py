@@ -7,6 +7,7 @@ from PyQt6.QtGui import QStandardItemModel, QAction
 from PyQt6.QtWidgets import QWidget
 
 from .models import DBObject, DBObjects
+from ...fdtdream.database import DatabaseHandler, TreeChanges
 from ..shared import SignalProtocol, AutoSignalBusMeta, SignalProtocolNone
 
 
@@ -25,6 +26,10 @@ class DBPanelSignalBus(QObject, metaclass=AutoSignalBusMeta):
     _populateTree = pyqtSignal(object)
     populateTree: SignalProtocol[QStandardItemModel]
     """Signal emitted to the tree view widget with the model it should display."""
+
+    _updateTree = pyqtSignal(object, object)
+    updateTree: SignalProtocol[DatabaseHandler, TreeChanges]
+    """Signal emitted to the tree view widget with changes committed to a database, to apply to the current model."""
     # endregion
 
     # region Objects selected signals
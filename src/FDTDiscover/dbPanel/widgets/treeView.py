@@ -1,15 +1,19 @@
 from __future__ import annotations
 
-from typing import List
+from itertools import groupby
+from operator import itemgetter
+from typing import Any, List, Optional
 
 from PyQt6.QtCore import Qt, QModelIndex, QPoint, QItemSelectionModel, pyqtSlot, QTimer
-from PyQt6.QtGui import QAction
+from PyQt6.QtGui import QAction, QStandardItem
 from PyQt6.QtWidgets import (
     QTreeView, QAbstractItemView, QMenu
 )
 
+from ..processes import createCategoryItem, createSimulationItem
 from ..signals import dbPanelSignalBus, dbRightClickMenuSignalBus
 from ...shared import SignalProtocol
+from ....fdtdream.database import DatabaseHandler, TreeChanges
 
 
 class TreeView(QTreeView):
@@ -33,6 +37,7 @@ class TreeView(QTreeView):
 
     def _connectSignals(self):
         dbPanelSignalBus.populateTree.connect(self._onSetModel)
+        dbPanelSignalBus.updateTree.connect(self._onUpdateTree)
         dbRightClickMenuSignalBus.requestContextMenu.connect(self._onContextMenuRequested)
 
     @pyqtSlot(object)
@@ -42,6 +47,73 @@ class TreeView(QTreeView):
         self._connectModelSelectionChanged()
         self._restore_expanded_identifiers(expanded_ids)
 
+    @pyqtSlot(object, object)
+    def _onUpdateTree(self, dbHandler: DatabaseHandler, changes: TreeChanges) -> None:
+        """Applies the changes committed to a database to its branch of the current model, instead of replacing it."""
+        model = self.model()
+        dbItem = self._findDatabaseItem(dbHandler)
+        if not model or dbItem is None:
+            return
+
+        # Index the category and simulation items of the database.
+        categoryItems = {}
+        simulationItems = {}
+        for row in range(dbItem.rowCount()):
+            categoryItem = dbItem.child(row)
+            categoryItems[categoryItem.data(Qt.ItemDataRole.UserRole)["name"]] = categoryItem
+            for simRow in range(categoryItem.rowCount()):
+                simulationItem = categoryItem.child(simRow)
+                simulationItems[simulationItem.data(Qt.ItemDataRole.UserRole)["id"]] = simulationItem
+
+        # Remove deleted simulations and the outdated items of changed ones, remembering which were expanded.
+        expanded = set()
+        for sim_id in {row[1] for row in changes.rows}.union(changes.removed):
+            simulationItem = simulationItems.get(sim_id)
+            if simulationItem is None:
+                continue
+            if self.isExpanded(simulationItem.index()):
+                expanded.add(sim_id)
+            simulationItem.parent().removeRow(simulationItem.row())
+
+        # Insert the new items, keeping categories ordered by name and simulations by id as in a populated tree.
+        for (category, sim_id, sim_name), sim_rows in groupby(changes.rows, key=itemgetter(0, 1, 2)):
+            categoryItem = categoryItems.get(category)
+            if categoryItem is None:
+                categoryItem = createCategoryItem(dbHandler, category)
+                dbItem.insertRow(self._orderedRow(dbItem, "name", category), categoryItem)
+                categoryItems[category] = categoryItem
+
+            simulationItem = createSimulationItem(dbHandler, sim_id, sim_name, sim_rows)
+            categoryItem.insertRow(self._orderedRow(categoryItem, "id", sim_id), simulationItem)
+            if sim_id in expanded:
+                self.setExpanded(simulationItem.index(), True)
+
+        # Remove categories left without simulations.
+        for row in reversed(range(dbItem.rowCount())):
+            if not dbItem.child(row).hasChildren():
+                dbItem.removeRow(row)
+
+    def _findDatabaseItem(self, dbHandler: DatabaseHandler) -> Optional[QStandardItem]:
+        """Returns the top level item of the database, or None if it's not in the current model."""
+        model = self.model()
+        if not model:
+            return None
+        root = model.invisibleRootItem()
+        for row in range(root.rowCount()):
+            item = root.child(row)
+            if item.data(Qt.ItemDataRole.UserRole)["dbHandler"] is dbHandler:
+                return item
+        return None
+
+    @staticmethod
+    def _orderedRow(parent: QStandardItem, key: str, value: Any) -> int:
+        """Returns the row to insert a child at to keep the children ordered by the key, with None first."""
+        for row in range(parent.rowCount()):
+            existing = parent.child(row).data(Qt.ItemDataRole.UserRole)[key]
+            if (existing is not None, existing) > (value is not None, value):
+                return row
+        return parent.rowCount()
+
     def _get_expanded_identifiers(self, index: QModelIndex = QModelIndex()) -> list[tuple]:
         """Recursively collect stable identifiers for expanded items."""
         identifiers = []
@@ -166,7 +166,7 @@ class CanvasController(QObject):
             fields.append((field_name, components, combonent_combinations))
 
         # Fetch available plot types
-        shape = monitor.fields[0].data.shape[:5]
+        shape = monitor.fields[0].shape[:5]
         plot_types = self.analyze_shape(shape)
 
         # Get available quadmesh fields pr. plot type.
@@ -387,10 +387,8 @@ class FieldPlotTab(QWidget):
 
     def reinit_plot_types(self, keep_selection: bool = False) -> None:
 
-        # Fetch the data array from the field and check it's dimensions. If no data, return zero dim coordinate array.
-        data = self.selected_field.data.copy() if self.selected_field else np.empty((0, 0, 0))
-
-        x_dim, y_dim, z_dim = data.shape[:3]
+        # Fetch the dimensions of the field. If no field, use zero dim coordinate arrays.
+        x_dim, y_dim, z_dim = self.selected_field.shape[:3] if self.selected_field else (0, 0, 0)
 
         conditions = {
             "XY Plane": x_dim > 1 and y_dim > 1 and z_dim != 0,
@@ -471,10 +469,8 @@ class FieldPlotTab(QWidget):
             "": (False, False, False)  # In case no plot types are valid
         }
 
-        # Fetch the data array from the field and check it's dimensions. If no data, return single dim coordinate array.
-        data = self.selected_field.data.copy() if self.selected_field else np.empty((1, 1, 1))
-
-        x_dim, y_dim, z_dim = data.shape[:3]
+        # Fetch the dimensions of the field. If no field, use single dim coordinate arrays.
+        x_dim, y_dim, z_dim = self.selected_field.shape[:3] if self.selected_field else (1, 1, 1)
 
         # Reconfigure ranges
         self.x_slider.set_range(0, x_dim-1), self.on_x_coord_change(update_data=False)
@@ -1,4 +1,4 @@
-from typing import Optional, Callable, cast
+from typing import Optional, Callable, Tuple, cast
 
 import numpy as np
 
@@ -9,6 +9,7 @@ from matplotlib.collections import QuadMesh
 
 from .widgets import LabeledDropdown
 from .fieldplot_tab_interface import FieldPlotTabInterface
+from ..fdtdream.database.derived import limits_for_scalar_operation
 
 
 class FieldSettings(QWidget):
@@ -168,6 +169,14 @@ class FieldSettings(QWidget):
 
         # If all values, scale based on all positions.
         elif scale == "All planes":
+
+            # Use the limits precomputed at extraction if the monitor has them stored.
+            limits = self._precomputed_limits()
+            if limits is not None and "Plane" in self._parent.plot_type:
+                self._parent.quadmesh.set_clim(*limits)
+                self._draw_idle()
+                return
+
             idx = (slice(None), slice(None), slice(None), slice(None), idx[-1])
 
         elif scale == "Custom limits":
@@ -182,6 +191,22 @@ class FieldSettings(QWidget):
             self._parent.ax.autoscale()
         self._draw_idle()
 
+    def _precomputed_limits(self) -> Optional[Tuple[float, float]]:
+        """
+        Returns the color limits over all planes for the selected component and scalar operation from the limits
+        stored with the monitor, or None if they are not stored or a composite magnitude is selected.
+        """
+        monitor = self._parent.monitor
+        field = self._parent.selected_field
+        if monitor is None or field is None or "magnitude" in self.component:
+            return None
+
+        limits = monitor.get_derived(f"{field.field_name} limits")
+        if limits is None:
+            return None
+
+        return limits_for_scalar_operation(limits.data, self._parent.component_idx, self.scalar_op)
+
     def _draw_idle(self) -> None:
         """Triggers the FieldPlotTab's draw_idle_timer, promting redrawing of the canvas."""
         self._parent.draw_idle_timer.start(self._parent.CALLBACK_DELAY)
@@ -1,3 +1,6 @@
+from itertools import groupby
+from operator import itemgetter
+
 from PyQt6.QtWidgets import (
     QWidget, QTreeView, QTableWidget, QTableWidgetItem,
     QVBoxLayout, QSplitter, QLabel, QFrame
@@ -94,9 +97,9 @@ class ObjectExplorer(QWidget):
         model = QStandardItemModel()
         root = model.invisibleRootItem()
 
-        # Fetch all categories
-        categories = self.top.db_handler.get_all_categories()
-        for category in categories:
+        # Fetch the whole hierarchy in a single query, and group it by category and simulation.
+        snapshot = self.top.db_handler.get_tree_snapshot()
+        for category, category_rows in groupby(snapshot, key=itemgetter(0)):
 
             # Create item for the category and make it non-editable.
             cat_item = QStandardItem(category)
@@ -104,15 +107,15 @@ class ObjectExplorer(QWidget):
             cat_item.setData(("category", category), Qt.ItemDataRole.UserRole)
 
             # Create item for each simulation. Map the simulation id to each item.
-            simulations = self.top.db_handler.get_simulations_by_category(category)
-            for sim_id, sim_name in simulations:
+            for (sim_id, sim_name), sim_rows in groupby(category_rows, key=itemgetter(1, 2)):
                 sim_item = QStandardItem(sim_name)
                 sim_item.setEditable(False)
                 sim_item.setData(("simulation", sim_id), Qt.ItemDataRole.UserRole)
 
                 # Create item for each monitor in the simulation. Map monitor id to each item.
-                monitors = self.top.db_handler.get_monitors_for_simulation(sim_id)
-                for mon_id, mon_name in monitors:
+                for _, _, _, mon_id, mon_name in sim_rows:
+                    if mon_id is None:
+                        continue
                     monitor_item = QStandardItem(mon_name)
                     monitor_item.setEditable(False)
                     monitor_item.setData(("monitor", mon_id), Qt.ItemDataRole.UserRole)
@@ -123,9 +126,11 @@ class ObjectExplorer(QWidget):
                 # Add simulation item to category branch.
                 cat_item.appendRow(sim_item)
 
-            # Add the category branch to the root and assign the model to the tree.
+            # Add the category branch to the root.
             root.appendRow(cat_item)
-            self.tree.setModel(model)
+
+        # Assign the model to the tree.
+        self.tree.setModel(model)
 
     def _on_selection_changed(self, selected, deselected):
         index = self.tree.currentIndex()
@@ -1,4 +1,8 @@
 from .handler import DatabaseHandler
+from .federated import FederatedDatabase
 from .db import SimulationPydanticModel
+from .watch import DatabaseWatcher, TreeChanges
+from .spectra import SpectrumBlock
 
-__all__ = ["DatabaseHandler", "SimulationPydanticModel"]
\ No newline at end of file
+__all__ = ["DatabaseHandler", "FederatedDatabase", "SimulationPydanticModel", "DatabaseWatcher", "TreeChanges",
+           "SpectrumBlock"]
\ No newline at end of file
@@ -0,0 +1,178 @@
+"""
+Maintenance of FDTDream result databases from the command line.
+
+    python -m fdtdream.database stats results.db
+    python -m fdtdream.database recompress results.db --codec zstd --level 19
+    python -m fdtdream.database downcast results.db
+    python -m fdtdream.database prune results.db --fields H --older-than 30
+    python -m fdtdream.database vacuum results.db
+    python -m fdtdream.database migrate results.db
+    python -m fdtdream.database export results.db --category dimers --output dimers.h5 --format hdf5
+"""
+import argparse
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import List, Optional
+
+from .codecs import available_codecs
+from .export import EXPORT_FORMATS
+from .handler import DatabaseHandler
+from .maintenance import (DOWNCAST_COLUMNS, category_stats, column_stats, downcast, file_stats, prune_fields,
+                          recompress, vacuum)
+from .profiles import PROFILES
+
+
+def _format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024:
+            return f"{size:.1f} {unit}" if unit != "B" else f"{int(size)} B"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def _print_progress(column: str, done: int, total: int) -> None:
+    end = "\n" if done >= total else ""
+    print(f"\r  {column}: {done}/{total} rows", end=end, flush=True)
+
+
+def _stats(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    files = file_stats(db)
+    print(f"Database file: {_format_bytes(files['file'])} ({_format_bytes(files['free'])} unused)")
+    print(f"Blob store:    {_format_bytes(files['blob_store'])}")
+
+    print("\nArray columns:")
+    print(f"  {'column':<28}{'rows':>10}{'in database':>16}{'in blob store':>16}")
+    for name, rows, stored, external in column_stats(db):
+        print(f"  {name:<28}{rows:>10}{_format_bytes(stored):>16}{_format_bytes(external):>16}")
+
+    categories = category_stats(db)
+    if categories:
+        groups = list(next(iter(categories.values())))
+        print("\nCategories:")
+        print(f"  {'category':<28}" + "".join(f"{group:>14}" for group in groups) + f"{'total':>14}")
+        for category, usage in categories.items():
+            print(f"  {str(category):<28}" + "".join(f"{_format_bytes(usage[group]):>14}" for group in groups)
+                  + f"{_format_bytes(sum(usage.values())):>14}")
+
+
+def _recompress(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    print(f"Recompressing with {args.codec}:")
+    changed = recompress(db, args.codec, args.level, args.columns, progress=_print_progress)
+    print(f"Re-encoded {sum(changed.values())} arrays.")
+
+
+def _downcast(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    print("Downcasting to single precision:")
+    changed = downcast(db, args.columns, progress=_print_progress)
+    print(f"Downcast {sum(changed.values())} arrays.")
+
+
+def _prune(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    older_than = timedelta(days=args.older_than) if args.older_than is not None else None
+    count = prune_fields(db, args.fields, older_than, args.category, dry_run=args.dry_run)
+    print(f"{'Would delete' if args.dry_run else 'Deleted'} {count} fields.")
+
+
+def _vacuum(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    before = file_stats(db)["file"]
+    start = time.perf_counter()
+
+    def progress() -> None:
+        print(f"\r  Vacuuming... {time.perf_counter() - start:.0f} s", end="", flush=True)
+
+    vacuum(db, analyze=not args.no_analyze, progress=progress)
+    after = file_stats(db)["file"]
+    print(f"\r  Vacuumed in {time.perf_counter() - start:.1f} s: "
+          f"{_format_bytes(before)} -> {_format_bytes(after)}")
+
+
+def _migrate(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    db.run_migrations()
+    print(f"Migrations completed in {time.perf_counter() - start:.1f} s.")
+
+
+def _export(db: DatabaseHandler, args: argparse.Namespace) -> None:
+    print(f"Exporting '{args.category}' to {args.output}:")
+    fields = False if args.no_fields else args.fields or True
+    count = db.export_category(args.category, args.output, args.format, fields,
+                               progress=lambda done, total: _print_progress("simulations", done, total))
+    print(f"Exported {count} simulations.")
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m fdtdream.database", description=__doc__.split("\n")[1])
+    parser.add_argument("--profile", choices=list(PROFILES), default="safe",
+                        help="SQLite profile used for the connections, see profiles.py (default: safe).")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    stats = commands.add_parser("stats", help="Report the bytes used by each array column and category.")
+    stats.set_defaults(run=_stats)
+
+    recompress_parser = commands.add_parser("recompress", help="Re-encode stored arrays with another codec.")
+    recompress_parser.add_argument("--codec", required=True, choices=available_codecs())
+    recompress_parser.add_argument("--level", type=int, default=None, help="Compression level of the codec.")
+    recompress_parser.add_argument("--columns", nargs="+", metavar="TABLE.COLUMN",
+                                   help="Columns to recompress (default: all array columns).")
+    recompress_parser.set_defaults(run=_recompress)
+
+    downcast_parser = commands.add_parser("downcast", help="Reduce arrays to single precision in place.")
+    downcast_parser.add_argument("--columns", nargs="+", metavar="TABLE.COLUMN", default=list(DOWNCAST_COLUMNS),
+                                 help=f"Columns to downcast (default: {' '.join(DOWNCAST_COLUMNS)}).")
+    downcast_parser.set_defaults(run=_downcast)
+
+    prune = commands.add_parser("prune", help="Delete stored fields of the given types.")
+    prune.add_argument("--fields", nargs="+", required=True, choices=["E", "H", "P"])
+    prune.add_argument("--older-than", type=float, metavar="DAYS",
+                       help="Only prune simulations stored more than this many days ago. Simulations stored before "
+                            "storage times were recorded count as older.")
+    prune.add_argument("--category", help="Only prune simulations in this category.")
+    prune.add_argument("--dry-run", action="store_true", help="Only report how many fields would be deleted.")
+    prune.set_defaults(run=_prune)
+
+    vacuum_parser = commands.add_parser("vacuum", help="Rebuild the file without unused pages, then ANALYZE.")
+    vacuum_parser.add_argument("--no-analyze", action="store_true", help="Skip ANALYZE.")
+    vacuum_parser.set_defaults(run=_vacuum)
+
+    migrate_parser = commands.add_parser("migrate", help="Complete the background migrations of the file.")
+    migrate_parser.set_defaults(run=_migrate)
+
+    export = commands.add_parser("export", help="Write the simulations of a category to a portable file.")
+    export.add_argument("--category", required=True)
+    export.add_argument("--output", required=True, help="Path of the file to write.")
+    export.add_argument("--format", choices=EXPORT_FORMATS, default="npz")
+    export.add_argument("--fields", nargs="+", help="Only export these fields, ie. E (default: all fields).")
+    export.add_argument("--no-fields", action="store_true", help="Only export parameters and spectra.")
+    export.set_defaults(run=_export)
+
+    for command in commands.choices.values():
+        command.add_argument("database", help="Path to the database file.")
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+
+    # Opening a missing file would create an empty database
+    path = Path(args.database)
+    if not path.with_suffix(".db").exists():
+        print(f"Error: No database at '{path.with_suffix('.db')}'.", file=sys.stderr)
+        return 1
+
+    # Background migrations would compete with the command for the database, so they're left to 'migrate'.
+    db = DatabaseHandler(args.database, profile=args.profile, background_migrations=False)
+    try:
+        args.run(db, args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
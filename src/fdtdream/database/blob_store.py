@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Set
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Seconds files are kept by collect_garbage() after they were last written or reused, whether referenced or not.
+# Arrays are written before the rows referring to them are committed, so newer files may belong to a write in
+# progress on another connection.
+GRACE_PERIOD = 3600
+
+
+class BlobStore:
+    """
+    Content-addressed directory of .npy files, used for arrays too large to be stored efficiently inside SQLite.
+
+    Each array is written once under the hex digest of its contents, so identical arrays share a file. Files are
+    written to a temporary file first and renamed into place, so a crash never leaves a partially written array
+    behind under a valid name. Arrays are read back as read-only memory maps.
+    """
+
+    directory: Path
+    threshold: Optional[int]
+
+    def __init__(self, directory: Path, threshold: Optional[int] = None) -> None:
+        """
+        Args:
+            directory (Path): The sidecar directory. It's created when the first array is written.
+            threshold (int): Arrays of at least this many bytes are written to the store. If None, no arrays
+                are written, but arrays already in the store can still be read.
+        """
+        self.directory = Path(directory)
+        self.threshold = threshold
+
+    def accepts(self, array: NDArray) -> bool:
+        """Returns True if the array is large enough to be written to the store."""
+        return self.threshold is not None and array.nbytes >= self.threshold
+
+    @staticmethod
+    def digest(array: NDArray) -> str:
+        """Returns the content hash of an array, including its dtype, shape and memory order."""
+        array = np.asanyarray(array)
+        fortran = array.flags.f_contiguous and not array.flags.c_contiguous
+        contiguous = array.T if fortran else np.ascontiguousarray(array)
+        digest = hashlib.sha256()
+        digest.update(repr(np.lib.format.header_data_from_array_1_0(array)).encode())
+        digest.update(memoryview(contiguous.reshape(-1)).cast("B"))
+        return digest.hexdigest()
+
+    def path(self, digest: str) -> Path:
+        return self.directory / digest[:2] / f"{digest}.npy"
+
+    def put(self, array: NDArray) -> str:
+        """Writes an array to the store if it's not already there, and returns its digest."""
+        digest = self.digest(array)
+        path = self.path(digest)
+        if self._reuse(path):
+            return digest
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return digest
+
+    @staticmethod
+    def _reuse(path: Path) -> bool:
+        """
+        Returns True if the file exists, after marking it as recently written, so garbage collection leaves it
+        alone until the row about to refer to it has been committed.
+        """
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def load(self, digest: str) -> NDArray:
+        """Returns a read-only memory map of the array with the given digest."""
+        path = self.path(digest)
+        if not path.exists():
+            raise FileNotFoundError(f"Array '{digest}' is missing from the blob store at '{self.directory}'.")
+        return np.load(path, mmap_mode="r", allow_pickle=False)
+
+    def digests(self) -> Iterator[str]:
+        """Iterates over the digests of all arrays in the store."""
+        if not self.directory.exists():
+            return
+        for path in self.directory.glob("*/*.npy"):
+            yield path.stem
+
+    def copy_to(self, other: BlobStore, digest: str) -> None:
+        """Copies an array to another store, hard linking the file when both stores are on the same drive."""
+        target = other.path(digest)
+        if self._reuse(target):
+            return
+
+        target.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            os.link(self.path(digest), target)
+            # A hard link shares the modification time of the source file, which may be old.
+            os.utime(target)
+        except OSError:
+            fd, tmp_path = tempfile.mkstemp(dir=target.parent, suffix=".tmp")
+            os.close(fd)
+            try:
+                shutil.copyfile(self.path(digest), tmp_path)
+                os.replace(tmp_path, target)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+    def collect_garbage(self, referenced: Set[str]) -> int:
+        """
+        Removes arrays not in the set of referenced digests, along with temporary files left by interrupted writes.
+        Files written or reused within the GRACE_PERIOD are kept, as a write on another connection may not have
+        committed its reference to them yet. Returns the number of files removed. Files that are still memory
+        mapped and can't be removed are skipped.
+        """
+        if not self.directory.exists():
+            return 0
+
+        removed = 0
+        stale_before = time.time() - GRACE_PERIOD
+        for path in list(self.directory.glob("*/*.npy")) + list(self.directory.glob("*/*.tmp")):
+            if path.suffix == ".npy" and path.stem in referenced:
+                continue
+            try:
+                if path.stat().st_mtime > stale_before:
+                    continue
+            except FileNotFoundError:
+                continue
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+
+        return removed
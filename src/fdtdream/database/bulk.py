@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from sqlalchemy import insert, select
+from sqlalchemy.engine import Connection
+
+from .chunks import split_field
+from .db import (SimulationModel, StructureModel, MonitorModel, FieldModel, FieldChunkModel, DerivedQuantityModel,
+                 GridModel, MeshModel, ParameterModel, FieldAndPowerMonitorPydanticModel, IndexMonitorPydanticModel,
+                 SimulationPydanticModel, StructurePydanticModel, parameter_rows)
+from .derived import compute_derived_quantities
+from .grids import hash_grid
+from .meshes import hash_mesh
+from .spectra import Spectra, store_resampled_spectra
+from ..results.monitors import FieldAndPowerMonitor, IndexMonitor
+from ..results.simulation import Simulation
+
+# Every monitor row is inserted with the same keys, as executemany() requires.
+_MONITOR_DEFAULTS = {
+    "T": None, "power": None, "palette": None, "index_map": None, "index_components": None,
+}
+
+
+def _insert_returning_ids(connection: Connection, table, rows: List[dict]) -> List[int]:
+    """Inserts rows with a single executemany(), returning their new ids in the order of the rows."""
+    if not rows:
+        return []
+    stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    return list(connection.execute(stmt, rows).scalars())
+
+
+def _get_or_create_by_digest(connection: Connection, table, new_rows: Dict[str, dict]) -> Dict[str, int]:
+    """Returns the ids of content-addressed rows by digest, inserting the ones that are not stored yet."""
+    if not new_rows:
+        return {}
+
+    stmt = select(table.c.digest, table.c.id).where(table.c.digest.in_(list(new_rows)))
+    ids = dict(connection.execute(stmt).all())
+    missing = [digest for digest in new_rows if digest not in ids]
+    ids.update(zip(missing, _insert_returning_ids(connection, table, [new_rows[digest] for digest in missing])))
+    return ids
+
+
+def _grid_digest(array: Optional[NDArray], grids: Dict[str, dict]) -> Optional[str]:
+    if array is None:
+        return None
+    array = np.ascontiguousarray(array)
+    digest = hash_grid(array)
+    grids.setdefault(digest, {"digest": digest, "values": array})
+    return digest
+
+
+def insert_simulations(connection: Connection,
+                       simulations: Sequence[Union[Simulation, SimulationPydanticModel]],
+                       chunk_wavelengths: Optional[int] = None, store_derived: bool = False) -> List[int]:
+    """
+    Inserts a batch of simulations with Core executemany() statements, one per table, and returns their ids.
+
+    Grids and meshes are deduplicated against the database and within the batch. Rows that depend on the ids of
+    others are inserted after them, using the ids returned by INSERT ... RETURNING.
+    """
+    sim_ids = _insert_returning_ids(connection, SimulationModel.__table__, [
+        {"category": sim.category, "name": sim.name, "parameters": sim.parameters} for sim in simulations
+    ])
+
+    # Searchable parameters, which the ORM would have added through an attribute event
+    parameters = [
+        {"simulation_id": sim_id, "key": key, "numeric_value": numeric_value, "text_value": text_value}
+        for sim_id, sim in zip(sim_ids, simulations)
+        for key, numeric_value, text_value in parameter_rows(sim.parameters)
+    ]
+    if parameters:
+        connection.execute(insert(ParameterModel.__table__), parameters)
+
+    # Structures, sharing meshes with identical geometry
+    meshes: Dict[str, dict] = {}
+    structures: List[Tuple[int, str, str]] = []
+    for sim_id, sim in zip(sim_ids, simulations):
+        for struct in sim.structures:
+            if isinstance(struct, StructurePydanticModel):
+                vertices, faces = struct.vertices, struct.faces
+            else:
+                vertices, faces = struct.trimesh.vertices, struct.trimesh.faces
+            vertices, faces = np.ascontiguousarray(vertices), np.ascontiguousarray(faces)
+            digest = hash_mesh(vertices, faces)
+            meshes.setdefault(digest, {"digest": digest, "vertices": vertices, "faces": faces, "ref_count": 0})
+            structures.append((sim_id, struct.name, digest))
+
+    mesh_ids = _get_or_create_by_digest(connection, MeshModel.__table__, meshes)
+    if structures:
+        connection.execute(insert(StructureModel.__table__), [
+            {"simulation_id": sim_id, "name": name, "mesh_id": mesh_ids[digest]}
+            for sim_id, name, digest in structures
+        ])
+
+    # Monitors, sharing coordinate and wavelength grids
+    grids: Dict[str, dict] = {}
+    monitors = []
+    monitor_categories = []
+    monitor_rows = []
+    for sim_id, sim in zip(sim_ids, simulations):
+        for mon in sim.monitors:
+            row = dict(_MONITOR_DEFAULTS, simulation_id=sim_id, name=mon.name, monitor_type=mon.monitor_type,
+                       parameters=mon.parameters)
+            for axis in ("wavelengths", "x", "y", "z"):
+                row[f"{axis}_grid_id"] = _grid_digest(getattr(mon, axis), grids)
+
+            if isinstance(mon, (FieldAndPowerMonitor, FieldAndPowerMonitorPydanticModel)):
+                row.update(T=mon.T, power=mon.power)
+            elif isinstance(mon, (IndexMonitor, IndexMonitorPydanticModel)):
+                row.update(palette=mon.palette, index_map=mon.index_map, index_components=mon.components)
+            else:
+                raise ValueError(f"Unsupported monitor type: {type(mon)}")
+
+            monitors.append(mon)
+            monitor_categories.append(sim.category)
+            monitor_rows.append(row)
+
+    grid_ids = _get_or_create_by_digest(connection, GridModel.__table__, grids)
+    for row in monitor_rows:
+        for axis in ("wavelengths", "x", "y", "z"):
+            digest = row[f"{axis}_grid_id"]
+            row[f"{axis}_grid_id"] = grid_ids[digest] if digest is not None else None
+    monitor_ids = _insert_returning_ids(connection, MonitorModel.__table__, monitor_rows)
+
+    # Spectra resampled onto the wavelength grids of their categories
+    store_resampled_spectra(connection, [
+        Spectra(monitor_id, category, mon.wavelengths, mon.T, mon.power)
+        for monitor_id, category, mon in zip(monitor_ids, monitor_categories, monitors)
+        if isinstance(mon, (FieldAndPowerMonitor, FieldAndPowerMonitorPydanticModel))
+    ])
+
+    # Fields, their chunks, and derived quantities
+    fields = []
+    field_rows = []
+    derived_rows = []
+    for monitor_id, mon in zip(monitor_ids, monitors):
+        if not isinstance(mon, (FieldAndPowerMonitor, FieldAndPowerMonitorPydanticModel)):
+            continue
+
+        for field in (mon.E, mon.H, mon.P):
+            if not field:
+                continue
+            fields.append(field)
+            field_rows.append({
+                "monitor_id": monitor_id, "field_name": field.field_name, "components": field.components,
+                "data": field.data if chunk_wavelengths is None else None,
+                "shape": list(field.data.shape) if chunk_wavelengths is not None else None,
+                "chunk_wavelengths": chunk_wavelengths
+            })
+
+        derived = mon.derived if isinstance(mon, FieldAndPowerMonitorPydanticModel) else []
+        if store_derived and not derived:
+            derived = compute_derived_quantities(mon)
+        derived_rows.extend({
+            "monitor_id": monitor_id, "quantity": quantity.quantity, "source_field": quantity.source_field,
+            "components": quantity.components, "data": quantity.data
+        } for quantity in derived)
+
+    field_ids = _insert_returning_ids(connection, FieldModel.__table__, field_rows)
+    if chunk_wavelengths is not None and fields:
+        connection.execute(insert(FieldChunkModel.__table__), [
+            {"field_id": field_id, "wavelength_start": start, "component": component, "data": chunk}
+            for field_id, field in zip(field_ids, fields)
+            for start, component, chunk in split_field(field.data, chunk_wavelengths)
+        ])
+    if derived_rows:
+        connection.execute(insert(DerivedQuantityModel.__table__), derived_rows)
+
+    return sim_ids
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.typing import NDArray
+
+# An index along one axis of a field: a single position, a slice, a sequence of positions, or None for all.
+AxisIndex = Optional[Union[int, slice, Sequence[int], NDArray]]
+
+
+def split_field(data: NDArray, chunk_wavelengths: int) -> Iterator[Tuple[int, int, NDArray]]:
+    """
+    Splits a (Nx, Ny, Nz, Nλ, Nc) field into chunks of at most chunk_wavelengths wavelengths of a single component.
+
+    Yields (wavelength_start, component, chunk) tuples, where each chunk has shape (Nx, Ny, Nz, n).
+    """
+    if chunk_wavelengths < 1:
+        raise ValueError(f"chunk_wavelengths must be a positive integer, got {chunk_wavelengths}.")
+
+    for start in range(0, data.shape[3], chunk_wavelengths):
+        for component in range(data.shape[4]):
+            yield start, component, np.ascontiguousarray(data[:, :, :, start:start + chunk_wavelengths, component])
+
+
+def axis_indices(index: AxisIndex, length: int) -> NDArray[np.intp]:
+    """Returns the positions selected by an axis index as an array, resolving negative positions."""
+    if index is None:
+        return np.arange(length)
+    if isinstance(index, slice):
+        return np.arange(length)[index]
+
+    indices = np.atleast_1d(np.asarray(index, dtype=np.intp))
+    if np.any((indices < -length) | (indices >= length)):
+        raise IndexError(f"Index {index} is out of bounds for an axis of length {length}.")
+    return np.where(indices < 0, indices + length, indices)
+
+
+def chunks_for(wavelengths: NDArray[np.intp], components: NDArray[np.intp],
+               chunk_wavelengths: int) -> Tuple[NDArray[np.intp], NDArray[np.intp]]:
+    """Returns the wavelength starts and components of the chunks needed to read the selected positions."""
+    starts = np.unique(wavelengths // chunk_wavelengths * chunk_wavelengths)
+    return starts, np.unique(components)
+
+
+def assemble_hyperslab(shape: Sequence[int], chunk_wavelengths: int, chunks: Iterable[Tuple[int, int, NDArray]],
+                       wavelengths: AxisIndex = None, components: AxisIndex = None,
+                       x: AxisIndex = None, y: AxisIndex = None, z: AxisIndex = None) -> NDArray:
+    """
+    Assembles a hyperslab of a chunked field from (wavelength_start, component, chunk) tuples.
+
+    The chunks must cover every selected wavelength and component. The result keeps the 5D layout of the field,
+    including axes indexed by a single position, so it can be indexed the same way as the full field.
+    """
+    selected = [axis_indices(index, length) for index, length in zip((x, y, z, wavelengths, components), shape)]
+    xs, ys, zs, wls, comps = selected
+    spatial = np.ix_(xs, ys, zs)
+
+    result = None
+    filled = np.zeros((len(wls), len(comps)), dtype=bool)
+    for start, component, chunk in chunks:
+        in_chunk = (wls >= start) & (wls < start + chunk.shape[3])
+        out_components = np.flatnonzero(comps == component)
+        if not np.any(in_chunk) or out_components.size == 0:
+            continue
+
+        if result is None:
+            result = np.empty(tuple(len(s) for s in selected), dtype=chunk.dtype)
+
+        values = chunk[spatial][..., wls[in_chunk] - start]
+        for out_component in out_components:
+            result[:, :, :, in_chunk, out_component] = values
+            filled[in_chunk, out_component] = True
+
+    if not np.all(filled):
+        raise ValueError("The chunks given don't cover all of the selected wavelengths and components.")
+    if result is None:
+        result = np.empty(tuple(len(s) for s in selected))
+
+    return result
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import io
+import lzma
+import struct
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import blosc
+except ImportError:
+    blosc = None
+
+
+# Blobs written by a codec start with this header: magic, format version, codec id, filter id and filter width.
+# Blobs without it are raw np.save() output from before codecs were introduced, and are still decoded.
+MAGIC = b"FDA"
+VERSION = 1
+HEADER = struct.Struct("<3sBBBB")
+NPY_MAGIC = b"\x93NUMPY"
+# Length of the .npy header dict, stored after the magic and version as uint16 in format 1.0 and uint32 after.
+NPY_HEADER_LENGTH_1 = struct.Struct("<H")
+NPY_HEADER_LENGTH_2 = struct.Struct("<I")
+# The .npy header written by encode_array() is padded so the payload starts at a multiple of this many bytes from
+# the start of the blob, like np.save() does in a file. Blobs themselves are not 64 byte aligned in memory, so this
+# only guarantees that views of uncompressed payloads are aligned for their items, as bytes are 16 byte aligned.
+ARRAY_ALIGN = 64
+
+# Codec id of blobs that only hold a reference to an array in the external blob store of the database.
+EXTERNAL = 255
+
+# Filters applied to the raw array bytes before compression.
+NO_FILTER = 0
+SHUFFLE = 1
+
+REFERENCE_HEADER = HEADER.pack(MAGIC, VERSION, EXTERNAL, NO_FILTER, 0)
+
+
+class Codec:
+    """A named compression method for array payloads, identified in the blob header by a single byte id."""
+
+    name: str
+    id: int
+    default_level: Optional[int]
+
+    def __init__(self, name: str, codec_id: int,
+                 compress: Callable[[bytes, int, Optional[int]], bytes],
+                 decompress: Callable[[bytes], bytes],
+                 default_level: Optional[int] = None,
+                 available: bool = True) -> None:
+        self.name = name
+        self.id = codec_id
+        self.default_level = default_level
+        self.available = available
+        self._compress = compress
+        self._decompress = decompress
+
+    def compress(self, data: bytes, itemsize: int, level: Optional[int] = None) -> bytes:
+        self._check_available()
+        return self._compress(data, itemsize, self.default_level if level is None else level)
+
+    def decompress(self, data: bytes) -> bytes:
+        self._check_available()
+        return self._decompress(data)
+
+    def _check_available(self) -> None:
+        if not self.available:
+            raise ValueError(f"The '{self.name}' codec requires an optional package that is not installed.")
+
+
+CODECS: Dict[str, Codec] = {}
+_CODECS_BY_ID: Dict[int, Codec] = {}
+
+
+def register_codec(codec: Codec) -> None:
+    """Registers a codec so it can be selected by name for columns and decoded by id when reading blobs."""
+    if codec.id in _CODECS_BY_ID and _CODECS_BY_ID[codec.id].name != codec.name:
+        raise ValueError(f"Codec id {codec.id} is already used by the '{_CODECS_BY_ID[codec.id].name}' codec.")
+    CODECS[codec.name] = codec
+    _CODECS_BY_ID[codec.id] = codec
+
+
+def get_codec(name: str) -> Codec:
+    if name not in CODECS:
+        raise ValueError(f"Unknown codec '{name}'. Available codecs are {list(CODECS)}.")
+    return CODECS[name]
+
+
+def available_codecs() -> list[str]:
+    """Returns the names of the codecs that can be used with the packages currently installed."""
+    return [name for name, codec in CODECS.items() if codec.available]
+
+
+# region Built-in codecs
+register_codec(Codec("none", 0, lambda data, itemsize, level: data, lambda data: data))
+
+register_codec(Codec("zlib", 1, lambda data, itemsize, level: zlib.compress(data, level), zlib.decompress,
+                     default_level=1))
+
+register_codec(Codec("lzma", 2, lambda data, itemsize, level: lzma.compress(data, preset=level), lzma.decompress,
+                     default_level=1))
+
+register_codec(Codec(
+    "zstd", 3,
+    lambda data, itemsize, level: zstandard.ZstdCompressor(level=level).compress(data),
+    lambda data: zstandard.ZstdDecompressor().decompress(data),
+    default_level=3,
+    available=zstandard is not None
+))
+
+# Blosc shuffles internally, so it's given the item size of the data and never combined with the shuffle filter.
+register_codec(Codec(
+    "blosc", 4,
+    lambda data, itemsize, level: blosc.compress(data, typesize=itemsize, clevel=level, shuffle=blosc.SHUFFLE),
+    lambda data: blosc.decompress(data),
+    default_level=5,
+    available=blosc is not None
+))
+# endregion
+
+
+def _shuffle_width(dtype: np.dtype) -> int:
+    """Returns the width in bytes of the scalars making up each item, ie. 4 for both float32 and complex64."""
+    return dtype.itemsize // 2 if dtype.kind == "c" else dtype.itemsize
+
+
+def shuffle(data: NDArray, width: int) -> bytes:
+    """
+    Groups the bytes of each scalar in a contiguous array by significance, which makes numeric data far more
+    compressible.
+    """
+    return data.reshape(-1).view(np.uint8).reshape(-1, width).T.tobytes()
+
+
+def unshuffle(data: bytes, width: int) -> NDArray[np.uint8]:
+    """Reverses shuffle(), returning the original bytes as a writable uint8 array."""
+    return np.frombuffer(data, dtype=np.uint8).reshape(width, -1).T.copy().reshape(-1)
+
+
+def encode_array(array: NDArray, codec: str = "zlib", level: Optional[int] = None,
+                 shuffle_data: Optional[bool] = None) -> bytes:
+    """
+    Encodes an array into a blob with a codec header, the .npy header of the array and the compressed payload.
+
+    The array memory is handed to the codec as a buffer, without an intermediate bytes copy, so an uncompressed
+    array is copied once, straight into the blob.
+
+    Args:
+        array (NDArray): The array to encode. Object arrays are not supported.
+        codec (str): Name of the codec used to compress the payload.
+        level (int): Compression level. Uses the codec's default if None.
+        shuffle_data (bool): Whether to byte-shuffle the payload before compressing. If None, numeric arrays with
+            multibyte items are shuffled unless the codec shuffles internally.
+    """
+    array = np.asanyarray(array)
+    selected = get_codec(codec)
+
+    if shuffle_data is None:
+        shuffle_data = selected.name not in ("none", "blosc") and array.dtype.kind in "iufc"
+    width = _shuffle_width(array.dtype) if shuffle_data else 0
+
+    header = HEADER.pack(MAGIC, VERSION, selected.id, SHUFFLE if width > 1 else NO_FILTER, width)
+    prefix = header + _npy_header(array, len(header))
+
+    # Fortran ordered arrays are written as they are laid out in memory, like np.save() does.
+    contiguous = array.T if array.flags.f_contiguous and not array.flags.c_contiguous else np.ascontiguousarray(array)
+    if width > 1:
+        payload = shuffle(contiguous, width)
+    else:
+        payload = memoryview(contiguous.reshape(-1)).cast("B")
+
+    # join() copies each part straight into the blob, where concatenation would copy the payload twice.
+    return b"".join((prefix, selected.compress(payload, array.dtype.itemsize, level)))
+
+
+def _npy_header(array: NDArray, offset: int = 0) -> bytes:
+    """
+    Returns the format 1.0 .npy header of the array, padded so the data following it starts at a multiple of
+    ARRAY_ALIGN bytes from the start of the blob, given the offset the header is written at.
+    """
+    header = np.lib.format.header_data_from_array_1_0(array)
+    text = "{" + "".join(f"'{key}': {value!r}, " for key, value in sorted(header.items())) + "}"
+
+    # The header text is padded with spaces and ends with a newline.
+    start = offset + len(NPY_MAGIC) + 2 + NPY_HEADER_LENGTH_1.size
+    text += " " * (-(start + len(text) + 1) % ARRAY_ALIGN) + "\n"
+    return NPY_MAGIC + bytes((1, 0)) + NPY_HEADER_LENGTH_1.pack(len(text)) + text.encode("latin1")
+
+
+def _read_npy_header(blob: bytes, offset: int = 0) -> Tuple[Tuple[int, ...], bool, np.dtype, int]:
+    """
+    Parses the .npy header starting at the offset of the blob, and returns the shape, memory order and dtype of the
+    array along with the offset of its data. Only the header itself is copied.
+    """
+    major = blob[offset + len(NPY_MAGIC)]
+    if major == 1:
+        (length,), start = NPY_HEADER_LENGTH_1.unpack_from(blob, offset + 8), offset + 10
+    else:
+        (length,), start = NPY_HEADER_LENGTH_2.unpack_from(blob, offset + 8), offset + 12
+
+    with io.BytesIO(blob[offset:start + length]) as buf:
+        np.lib.format.read_magic(buf)
+        if major == 1:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(buf)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(buf)
+    return shape, fortran_order, dtype, start + length
+
+
+def encode_reference(array: NDArray, digest: str) -> bytes:
+    """
+    Encodes a reference to an array written to an external blob store. The .npy header of the array is kept, so
+    its shape and dtype can be read without opening the external file.
+    """
+    return REFERENCE_HEADER + _npy_header(np.asanyarray(array), len(REFERENCE_HEADER)) + digest.encode()
+
+
+def read_reference(blob: bytes) -> Optional[str]:
+    """Returns the digest of the externally stored array a blob refers to, or None if the blob holds the array."""
+    if blob[:HEADER.size] != REFERENCE_HEADER:
+        return None
+
+    *_, digest_start = _read_npy_header(blob, HEADER.size)
+    return bytes(blob[digest_start:]).decode()
+
+
+def _view(buffer, dtype: np.dtype, shape: Tuple[int, ...], fortran_order: bool, offset: int = 0) -> NDArray:
+    """Returns a read-only array viewing the buffer from the offset, without copying it."""
+    count = int(np.prod(shape, dtype=np.int64))
+    array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+    array.flags.writeable = False
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def decode_array(blob: bytes) -> NDArray:
+    """
+    Decodes a blob written by encode_array() or by np.save().
+
+    The array is returned as a read-only view of the blob, or of the decompressed payload, so decoding copies
+    nothing beyond what the codec and the shuffle filter produce. Use np.array(array) for a writable copy.
+    """
+    if blob[:len(NPY_MAGIC)] == NPY_MAGIC:
+        shape, fortran_order, dtype, payload_start = _read_npy_header(blob)
+        return _view(blob, dtype, shape, fortran_order, payload_start)
+
+    magic, version, codec_id, filter_id, width = HEADER.unpack_from(blob)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError("Blob is neither a .npy array nor an array encoded by a supported codec version.")
+    if codec_id == EXTERNAL:
+        raise ValueError("Blob refers to an array in an external blob store, and can't be decoded on its own.")
+    if codec_id not in _CODECS_BY_ID:
+        raise ValueError(f"Blob was encoded with an unknown codec id {codec_id}.")
+
+    shape, fortran_order, dtype, payload_start = _read_npy_header(blob, HEADER.size)
+    codec = _CODECS_BY_ID[codec_id]
+    if codec.name == "none" and filter_id == NO_FILTER:
+        return _view(blob, dtype, shape, fortran_order, payload_start)
+
+    payload = codec.decompress(memoryview(blob)[payload_start:])
+    if filter_id == SHUFFLE:
+        payload = unshuffle(payload, width)
+    return _view(payload, dtype, shape, fortran_order)
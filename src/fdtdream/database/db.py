@@ -1,22 +1,31 @@
 from __future__ import annotations
 
-import io
+from datetime import datetime, timezone
 from typing import List, Dict, Optional, Union, Tuple
 
 import matplotlib.patches as mpatches
 import matplotlib.path as mpath
 import numpy as np
+import shapely
 import shapely.geometry as geom
-import shapely.ops as ops
 from matplotlib.patches import PathPatch
 from numpy.typing import NDArray
 from pydantic import BaseModel, ConfigDict
 from shapely import MultiPolygon, Polygon
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
-from sqlalchemy.orm import relationship, declarative_base
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, JSON, Index, UniqueConstraint, event, inspect, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship, declarative_base, object_session, deferred, Session
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.types import TypeDecorator, LargeBinary
 from trimesh import Trimesh
 
+from .blob_store import BlobStore
+from .chunks import AxisIndex, split_field, axis_indices, chunks_for, assemble_hyperslab
+from .codecs import encode_array, decode_array, get_codec, encode_reference, read_reference
+from .outlines import PROJECTION, coordinates_digest, decode_patches, encode_patches, projected_faces
+from ..results.monitors import expand_material_map
+
 
 # region Pydantic models
 class CustomBaseModel(BaseModel):
@@ -37,6 +46,22 @@ class FieldPydanticModel(CustomBaseModel):
         )
 
 
+class DerivedQuantityPydanticModel(CustomBaseModel):
+    quantity: str
+    source_field: str
+    components: str
+    data: np.ndarray
+
+    @classmethod
+    def from_model(cls, model: DerivedQuantityModel) -> DerivedQuantityPydanticModel:
+        return cls(
+            quantity=model.quantity,
+            source_field=model.source_field,
+            components=model.components,
+            data=model.data
+        )
+
+
 class FieldAndPowerMonitorPydanticModel(CustomBaseModel):
     name: str
     monitor_type: str = "field_and_power"
@@ -50,6 +75,7 @@ class FieldAndPowerMonitorPydanticModel(CustomBaseModel):
     E: Optional[FieldPydanticModel]
     H: Optional[FieldPydanticModel]
     P: Optional[FieldPydanticModel]
+    derived: List[DerivedQuantityPydanticModel] = []
 
     @classmethod
     def from_model(cls, model: FieldAndPowerMonitorModel) -> FieldAndPowerMonitorPydanticModel:
@@ -68,7 +94,35 @@ class FieldAndPowerMonitorPydanticModel(CustomBaseModel):
             power=model.power,
             E=fields.get("E", None),  # type: ignore
             H=fields.get("H", None),  # type: ignore
-            P=fields.get("P", None)  # type: ignore
+            P=fields.get("P", None),  # type: ignore
+            derived=[DerivedQuantityPydanticModel.from_model(d) for d in model.derived]
+        )
+
+
+class IndexMonitorPydanticModel(CustomBaseModel):
+    name: str
+    monitor_type: str = "index"
+    parameters: Dict
+    wavelengths: Optional[np.ndarray]
+    x: Optional[np.ndarray]
+    y: Optional[np.ndarray]
+    z: Optional[np.ndarray]
+    palette: np.ndarray
+    index_map: np.ndarray
+    components: str
+
+    @classmethod
+    def from_model(cls, model: IndexMonitorModel) -> IndexMonitorPydanticModel:
+        return cls(
+            name=model.name,
+            parameters=model.parameters,
+            wavelengths=model.wavelengths,
+            x=model.x,
+            y=model.y,
+            z=model.z,
+            palette=model.palette,
+            index_map=model.index_map,
+            components=model.index_components
         )
 
 
@@ -91,50 +145,164 @@ class SimulationPydanticModel(CustomBaseModel):
     name: str
     parameters: Dict
     structures: List[StructurePydanticModel]
-    monitors: List[FieldAndPowerMonitorPydanticModel]
+    monitors: List[Union[FieldAndPowerMonitorPydanticModel, IndexMonitorPydanticModel]]
 
     @classmethod
     def from_model(cls, model: SimulationModel) -> SimulationPydanticModel:
+        monitor_models = {
+            "field_and_power": FieldAndPowerMonitorPydanticModel,
+            "index": IndexMonitorPydanticModel
+        }
         return cls(
             category=model.category,
             name=model.name,
             parameters=model.parameters or {},
             structures=[StructurePydanticModel.from_model(s) for s in model.structures],
-            monitors=[FieldAndPowerMonitorPydanticModel.from_model(m) for m in model.monitors
-                      if m.monitor_type == "field_and_power"]
+            monitors=[monitor_models[m.monitor_type].from_model(m) for m in model.monitors
+                      if m.monitor_type in monitor_models]
         )
 # endregion
 
 
+# Codec of the field, field chunk and derived quantity columns. Fields are large and noisy, so general purpose
+# compression costs several times the write and read time for a third off their size at best. They are stored
+# uncompressed, and can be recompressed once a database is no longer written to, see maintenance.recompress().
+FIELD_CODEC = "none"
+
+
 class NumpyArrayType(TypeDecorator):
+    """
+    Stores NumPy arrays as blobs compressed with the codec chosen for the column.
+
+    Arrays smaller than min_size bytes are stored uncompressed, as compressing them saves next to nothing.
+    Blobs written before codecs were introduced (plain np.save() output) are still read.
+
+    For columns marked external, arrays large enough for the blob store of the database are written to it as
+    .npy files, and only a reference is stored in the column. Those arrays are read back as read-only memory maps.
+    The blob store is attached to the engine's dialect by the DatabaseHandler.
+    """
     impl = LargeBinary
     cache_ok = True  # Required for SQLAlchemy 1.4+
 
+    def __init__(self, codec: str = "zlib", level: Optional[int] = None, min_size: int = 1024,
+                 external: bool = False) -> None:
+        super().__init__()
+        get_codec(codec)  # Fail early on unknown codecs
+        self.codec = codec
+        self.level = level
+        self.min_size = min_size
+        self.external = external
+
     def process_bind_param(self, value: Optional[np.ndarray], dialect):
         if value is None:
             return None
-        with io.BytesIO() as buf:
-            # Save both array data + metadata
-            np.save(buf, value, allow_pickle=False)  # type: ignore
-            return buf.getvalue()
+        value = np.asarray(value)
+
+        blob_store: Optional[BlobStore] = getattr(dialect, "blob_store", None)
+        if self.external and blob_store is not None and blob_store.accepts(value):
+            return encode_reference(value, blob_store.put(value))
+
+        codec = self.codec if value.nbytes >= self.min_size else "none"
+        return encode_array(value, codec, self.level)
 
     def process_result_value(self, value: Optional[bytes], dialect):
         if value is None:
             return None
-        with io.BytesIO(value) as buf:
-            return np.load(buf, allow_pickle=False)
+
+        digest = read_reference(value)
+        if digest is not None:
+            blob_store: Optional[BlobStore] = getattr(dialect, "blob_store", None)
+            if blob_store is None:
+                raise ValueError("Array is stored in an external blob store, but none is attached to the database.")
+            return blob_store.load(digest)
+
+        return decode_array(value)
 
 
 Base = declarative_base()
 
 
+def _load_deferred(instance, key: str):
+    """
+    Returns the deferred column mapped as key. Instances bound to a session load it through the session as usual,
+    while detached instances fetch it with a short-lived session on the engine they were loaded from, and keep it.
+    """
+    engine = instance.__dict__.get("_engine")
+    if key in instance.__dict__ or engine is None or object_session(instance) is not None:
+        return getattr(instance, key)
+
+    mapper = inspect(type(instance))
+    criteria = [pk == value for pk, value in zip(mapper.primary_key, inspect(instance).identity)]
+    with Session(engine) as session:
+        value = session.execute(select(getattr(type(instance), key)).where(*criteria)).scalar_one_or_none()
+    set_committed_value(instance, key, value)
+    return value
+
+
+def _deferred_array(key: str) -> hybrid_property:
+    """
+    Public attribute of the deferred array column mapped as key, loaded with _load_deferred(). On the class it's the
+    column, for queries, but loader options like undefer() must be given the mapped attribute.
+    """
+    def fget(self):
+        return _load_deferred(self, key)
+
+    def fset(self, value) -> None:
+        setattr(self, key, value)
+
+    def expr(cls):
+        return getattr(cls, key)
+
+    # Columns selected through the attribute are labelled with the name of its getter.
+    fget.__name__ = key.lstrip("_")
+    return hybrid_property(fget, fset, expr=expr)
+
+
+@event.listens_for(Base, "load", propagate=True)
+def _remember_engine(target, context) -> None:
+    """Lets deferred array columns of loaded instances be fetched after the loading session is closed."""
+    # Session.merge() loads instances without a query context
+    engine = context.session.bind if context is not None else None
+    if engine is not None:
+        target.__dict__["_engine"] = engine
+
+
+def add_missing_columns(engine) -> None:
+    """
+    Adds columns declared on the models but missing from tables in an existing database file.
+    Base.metadata.create_all() only creates missing tables, not missing columns.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {column_type}')
+
+
 class SimulationModel(Base):
     __tablename__ = 'simulations'
+    __table_args__ = (
+        # Covers listing the simulations of a category without touching the table itself.
+        Index("ix_simulations_category_id_name", "category", "id", "name"),
+    )
 
     id: int = Column(Integer, primary_key=True)
     category: str = Column(String)
     name: str = Column(String)
     parameters: dict = Column(JSON, nullable=True)
+    # ISO 8601 timestamp of when the simulation was stored, kept when copied. None for simulations stored before
+    # it was recorded.
+    created_at: str = Column(String, nullable=True, default=lambda: datetime.now(timezone.utc).isoformat())
+
+    # Identity kept when copied to other databases, and the change counter of the database when last inserted or
+    # updated. Both are set by triggers, see migrations.py.
+    uuid: str = Column(String, nullable=True, index=True)
+    row_version: int = Column(Integer, nullable=True, index=True)
 
     _monitors = relationship(
         "MonitorModel",
@@ -148,6 +316,11 @@ class SimulationModel(Base):
         cascade="all, delete-orphan",
         passive_deletes=True
     )
+    _parameter_rows = relationship(
+        "ParameterModel",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
 
     @property
     def monitors(self) -> List[MonitorModel]:
@@ -158,23 +331,136 @@ class SimulationModel(Base):
         return self._structures
 
 
+class ParameterModel(Base):
+    """
+    One simulation parameter per row, mirroring the parameters JSON column of the simulations table so
+    simulations can be searched by parameter values in SQL. Kept in sync whenever the parameters are assigned.
+    """
+    __tablename__ = "parameters"
+    __table_args__ = (
+        Index("ix_parameters_key_numeric_value", "key", "numeric_value"),
+        Index("ix_parameters_key_text_value", "key", "text_value"),
+        Index("ix_parameters_simulation_id", "simulation_id"),
+    )
+
+    id: int = Column(Integer, primary_key=True)
+    simulation_id: int = Column(Integer, ForeignKey("simulations.id", ondelete="CASCADE"), nullable=False)
+    key: str = Column(String, nullable=False)
+    numeric_value: float = Column(Float, nullable=True)  # None if the value is not a number
+    text_value: str = Column(String, nullable=True)
+
+
+def parameter_rows(parameters: Optional[dict]) -> List[Tuple[str, Optional[float], str]]:
+    """
+    Returns the (key, numeric_value, text_value) rows of a parameters dictionary. Values that are numbers, or
+    strings holding a number, get a numeric value. Internal entries like '__info__' are left out.
+    """
+    rows = []
+    for key, value in (parameters or {}).items():
+        if key.startswith("__") or value is None or isinstance(value, (dict, list)):
+            continue
+        try:
+            numeric_value = float(value)
+        except (TypeError, ValueError):
+            numeric_value = None
+        rows.append((key, numeric_value, str(value)))
+    return rows
+
+
+@event.listens_for(SimulationModel.parameters, "set")
+def _sync_parameter_rows(target: SimulationModel, value, oldvalue, initiator) -> None:
+    """Rebuilds the parameter rows of a simulation when its parameters are assigned and searchable values change."""
+    rows = parameter_rows(value)
+    if isinstance(oldvalue, dict) and rows == parameter_rows(oldvalue):
+        return
+    target._parameter_rows = [ParameterModel(key=key, numeric_value=numeric_value, text_value=text_value)
+                              for key, numeric_value, text_value in rows]
+
+
+class MeshModel(Base):
+    """
+    Vertices and faces shared by every structure with byte-identical geometry, keyed by a hash of both arrays.
+    The reference count is kept up to date by triggers on the structures table (see migrations.py), which also
+    delete meshes no longer referenced, including when structures are removed by cascading deletes.
+    """
+    __tablename__ = "meshes"
+
+    id: int = Column(Integer, primary_key=True)
+    digest: str = Column(String, unique=True, nullable=False)  # Content hash of the vertices and faces
+    _vertices = deferred(Column("vertices", NumpyArrayType, nullable=False))
+    _faces = deferred(Column("faces", NumpyArrayType, nullable=False))
+    vertices = _deferred_array("_vertices")
+    faces = _deferred_array("_faces")
+    ref_count: int = Column(Integer, nullable=False, default=0)
+
+
+class StructureOutlineModel(Base):
+    """
+    Cached outline of a mesh in one plane, as drawn over monitor data: its projection onto the plane, or its
+    intersections with the planes at a monitor's coordinates. The patches are stored as the concatenated vertices
+    and codes of their paths, with the number of vertices of each, zero for coordinates that miss the mesh. Outlines
+    are deleted along with their mesh.
+    """
+    __tablename__ = "structure_outlines"
+    __table_args__ = (
+        UniqueConstraint("mesh_id", "plane", "coordinates_digest"),
+    )
+
+    id: int = Column(Integer, primary_key=True)
+    mesh_id: int = Column(Integer, ForeignKey("meshes.id", ondelete="CASCADE"), nullable=False)
+    plane: str = Column(String, nullable=False)
+    # Content hash of the intersected coordinates, or outlines.PROJECTION for the projection.
+    coordinates_digest: str = Column(String, nullable=False)
+    vertices: NDArray = Column(NumpyArrayType, nullable=False)
+    codes: NDArray = Column(NumpyArrayType, nullable=False)
+    counts: NDArray = Column(NumpyArrayType, nullable=False)
+
+
+# Axes of the vertices kept when projecting onto each plane.
+PLANE_INDICES = {
+    "XY Plane": (0, 1),
+    "XZ Plane": (0, 2),
+    "YZ Plane": (1, 2)
+}
+
+
 class StructureModel(Base):
     # region Class Body
     __tablename__ = "structures"
+    __table_args__ = (
+        Index("ix_structures_simulation_id_id_name", "simulation_id", "id", "name"),
+    )
 
     id: int = Column(Integer, primary_key=True)
     simulation_id: int = Column(Integer, ForeignKey("simulations.id", ondelete="CASCADE"))
     name: str = Column(String)
-    vertices: NDArray = Column(NumpyArrayType)
-    faces: NDArray = Column(NumpyArrayType)
+    mesh_id: int = Column(Integer, ForeignKey("meshes.id"), nullable=True)
+
+    # Identity kept when copied to other databases, and the change counter of the database when last inserted or
+    # updated. Both are set by triggers, see migrations.py.
+    uuid: str = Column(String, nullable=True, index=True)
+    row_version: int = Column(Integer, nullable=True, index=True)
+
+    # Geometry of structures stored before meshes were deduplicated into the meshes table
+    _vertices = deferred(Column("vertices", NumpyArrayType))
+    _faces = deferred(Column("faces", NumpyArrayType))
 
     _simulation = relationship("SimulationModel", back_populates="_structures")
+    _mesh = relationship("MeshModel", lazy="joined")
     # endregion
 
     @property
     def simulation(self) -> SimulationModel:
         return self._simulation
 
+    @property
+    def vertices(self) -> NDArray:
+        return _load_deferred(self, "_vertices") if self.mesh_id is None else self._mesh.vertices
+
+    @property
+    def faces(self) -> NDArray:
+        return _load_deferred(self, "_faces") if self.mesh_id is None else self._mesh.faces
+
     def get_trimesh(self) -> Trimesh:
         """Reconstructs a trimesh object from the array of vertices and the array of face connections."""
         mesh = Trimesh(self.vertices, self.faces)
@@ -237,36 +523,73 @@ class StructureModel(Base):
 
     def get_projections_and_intersections(self, x: NDArray, y: NDArray, z: NDArray
     ) -> Optional[Tuple[Dict[str, Optional[PathPatch]], Dict[str, List[Optional[PathPatch]]]]]:
-
-        # Fetch the mesh
-        mesh = self.get_trimesh()
-
-        # Map plane names to indices
-        plane_indices = {
-            "XY Plane": (0, 1),
-            "XZ Plane": (0, 2),
-            "YZ Plane": (1, 2)
-        }
-
-        # region Handle 2D projections
+        """
+        Returns the outline of the structure projected onto each plane, and its intersections with the planes at
+        each of the monitor coordinates, as patches to draw over the monitor data.
+
+        Outlines are cached in the structure_outlines table by mesh, plane and coordinates, so they're computed
+        the first time a mesh is plotted over a monitor grid, and read back as patches after that. Structures with
+        identical geometry share their cached outlines.
+        """
+        engine = self.__dict__.get("_engine")
+        if engine is None or self.mesh_id is None:
+            mesh = self.get_trimesh()
+            return self._compute_projections(mesh), self._compute_intersections(mesh, x, y, z)
+
+        slice_coords = {"XY Plane": z, "XZ Plane": y, "YZ Plane": x}
+        keys = {plane: coordinates_digest(coords) for plane, coords in slice_coords.items()}
+        with Session(engine) as session:
+            stmt = select(StructureOutlineModel).where(StructureOutlineModel.mesh_id == self.mesh_id)
+            cached = {(row.plane, row.coordinates_digest): decode_patches(row.vertices, row.codes, row.counts)
+                      for row in session.execute(stmt).scalars()}
+
+        # The mesh is only fetched and rebuilt for outlines missing from the cache.
+        mesh = None
+        new_outlines = {}
+        projections = {plane: cached[(plane, PROJECTION)][0]
+                       for plane in PLANE_INDICES if (plane, PROJECTION) in cached}
+        if len(projections) < len(PLANE_INDICES):
+            mesh = self.get_trimesh()
+            projections = self._compute_projections(mesh)
+            new_outlines.update({(plane, PROJECTION): [patch] for plane, patch in projections.items()})
+
+        intersections = {plane: cached.get((plane, key)) for plane, key in keys.items()}
+        if any(patches is None for patches in intersections.values()):
+            if mesh is None:
+                mesh = self.get_trimesh()
+            intersections = self._compute_intersections(mesh, x, y, z)
+            new_outlines.update({(plane, key): intersections[plane] for plane, key in keys.items()
+                                 if (plane, key) not in cached})
+
+        if new_outlines:
+            self._store_outlines(engine, new_outlines)
+        return projections, intersections
+
+    def _store_outlines(self, engine, outlines: Dict[Tuple[str, str], List[Optional[PathPatch]]]) -> None:
+        """Adds computed outlines to the cache. The cache is left as it is if the database can't be written to."""
+        rows = []
+        for (plane, key), patches in outlines.items():
+            vertices, codes, counts = encode_patches(patches)
+            rows.append(StructureOutlineModel(mesh_id=self.mesh_id, plane=plane, coordinates_digest=key,
+                                              vertices=vertices, codes=codes, counts=counts))
+        try:
+            with Session(engine) as session:
+                session.add_all(rows)
+                session.commit()
+        except (OperationalError, IntegrityError):  # Read-only, locked, or cached by another process meanwhile
+            pass
+
+    def _compute_projections(self, mesh: Trimesh) -> Dict[str, Optional[PathPatch]]:
+        """Returns the union of the faces of the mesh projected onto each plane."""
         projections = {}
+        for plane, indices in PLANE_INDICES.items():
+            polygons = projected_faces(mesh.vertices, mesh.faces, indices)
+            projections[plane] = self._polygon_to_pathpatch(shapely.union_all(polygons)) if len(polygons) else None
+        return projections
 
-        for plane, indices in plane_indices.items():
-            polys = []
-            for face in mesh.faces:
-                points_2d = mesh.vertices[face][:, indices]
-                polygon = geom.Polygon(points_2d)
-                if polygon.is_valid and not polygon.is_empty and polygon.minimum_clearance > 1e-4:
-                    polys.append(polygon)
-
-            if polys:
-                total_shape = ops.unary_union(polys)
-                patch = self._polygon_to_pathpatch(total_shape)
-            else:
-                patch = None
-
-            projections[plane] = patch
-        # endregion
+    def _compute_intersections(self, mesh: Trimesh, x: NDArray, y: NDArray, z: NDArray
+                               ) -> Dict[str, List[Optional[PathPatch]]]:
+        """Returns the cross-sections of the mesh with the planes at each of the coordinates."""
 
         # region Handle 2D intersections
         intersection_slices: Dict[str, List[Optional[PathPatch]]] = {
@@ -289,7 +612,7 @@ class StructureModel(Base):
 
         dummy_origin = (0, 0, 0)
 
-        for plane, indices in plane_indices.items():
+        for plane in PLANE_INDICES:
 
             coords = slice_coords[plane]
             normal = plane_normals[plane]
@@ -354,11 +677,54 @@ class StructureModel(Base):
                 intersection_slices[plane].append(patch)
         # endregion
 
-        return projections, intersection_slices
+        return intersection_slices
+
+
+class GridModel(Base):
+    """A coordinate or wavelength array, shared by every monitor recorded on the same grid."""
+    __tablename__ = 'grids'
+
+    id: int = Column(Integer, primary_key=True)
+    digest: str = Column(String, unique=True, nullable=False)  # Content hash of the array
+    values: NDArray = Column(NumpyArrayType(codec="lzma"), nullable=False)
+
+
+class SchemaVersionModel(Base):
+    """Versioned migrations applied to the database file, see migrations.py."""
+    __tablename__ = "schema_version"
+
+    version: int = Column(Integer, primary_key=True)
+    description: str = Column(String, nullable=False)
+    applied_at: str = Column(String, nullable=False)  # ISO 8601 timestamp
+    # Position reached by a batched migration, kept while it's in progress so an interrupted migration resumes from
+    # it. None once the migration has completed.
+    cursor: int = Column(Integer, nullable=True)
+
+
+class DatabaseStateModel(Base):
+    """Single row identifying the database file, and counting the changes made to it for incremental merges."""
+    __tablename__ = "database_state"
+
+    id: int = Column(Integer, primary_key=True)
+    uuid: str = Column(String, nullable=False)
+    row_version: int = Column(Integer, nullable=False, default=0)
+
+
+class MergeWatermarkModel(Base):
+    """The row version of each source database up to which it has been merged, see DatabaseHandler.merge_from()."""
+    __tablename__ = "merge_watermarks"
+
+    source_uuid: str = Column(String, primary_key=True)
+    source_filename: str = Column(String)
+    watermark: int = Column(Integer, nullable=False)
+    merged_at: str = Column(String, nullable=False)  # ISO 8601 timestamp
 
 
 class MonitorModel(Base):
     __tablename__ = 'monitors'
+    __table_args__ = (
+        Index("ix_monitors_simulation_id_id_name", "simulation_id", "id", "name"),
+    )
 
     id: int = Column(Integer, primary_key=True)
     simulation_id: int = Column(Integer, ForeignKey("simulations.id", ondelete="CASCADE"))
@@ -366,19 +732,31 @@ class MonitorModel(Base):
     monitor_type: str = Column(String)  # discriminator
     parameters: dict = Column(JSON, nullable=False)
 
-    # Optional FieldAndPowerMonitor fields
-    wavelengths: NDArray = Column(NumpyArrayType, nullable=True)
-    x: NDArray = Column(NumpyArrayType, nullable=True)
-    y: NDArray = Column(NumpyArrayType, nullable=True)
-    z: NDArray = Column(NumpyArrayType, nullable=True)
-    T: NDArray = Column(NumpyArrayType, nullable=True)
-    power: NDArray = Column(NumpyArrayType, nullable=True)
+    # Identity kept when copied to other databases, and the change counter of the database when last inserted or
+    # updated. Both are set by triggers, see migrations.py.
+    uuid: str = Column(String, nullable=True, index=True)
+    row_version: int = Column(Integer, nullable=True, index=True)
+
+    # Optional FieldAndPowerMonitor fields. The coordinate axes reference rows in the shared grids table.
+    wavelengths_grid_id: int = Column(Integer, ForeignKey("grids.id"), nullable=True)
+    x_grid_id: int = Column(Integer, ForeignKey("grids.id"), nullable=True)
+    y_grid_id: int = Column(Integer, ForeignKey("grids.id"), nullable=True)
+    z_grid_id: int = Column(Integer, ForeignKey("grids.id"), nullable=True)
+    T: NDArray = Column(NumpyArrayType(codec="lzma"), nullable=True)
+    power: NDArray = Column(NumpyArrayType(codec="lzma"), nullable=True)
 
     __mapper_args__ = {
         "polymorphic_on": monitor_type,
-        "polymorphic_identity": "base_monitor"
+        "polymorphic_identity": "base_monitor",
+        "with_polymorphic": "*"  # Load the columns of all monitor types when querying the base model
     }
 
+    # Inline coordinate arrays of monitors stored before the grids table was introduced.
+    _wavelengths: NDArray = Column("wavelengths", NumpyArrayType, nullable=True)
+    _x: NDArray = Column("x", NumpyArrayType, nullable=True)
+    _y: NDArray = Column("y", NumpyArrayType, nullable=True)
+    _z: NDArray = Column("z", NumpyArrayType, nullable=True)
+
     _simulation = relationship("SimulationModel", back_populates="_monitors")
     _fields = relationship(
         "FieldModel",
@@ -386,6 +764,12 @@ class MonitorModel(Base):
         cascade="all, delete-orphan",
         passive_deletes=True
     )
+    _derived = relationship(
+        "DerivedQuantityModel",
+        back_populates="_monitor",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
 
     @property
     def simulation(self) -> SimulationModel:
@@ -395,6 +779,58 @@ class MonitorModel(Base):
     def fields(self) -> List[FieldModel]:
         return self._fields
 
+    @property
+    def derived(self) -> List[DerivedQuantityModel]:
+        return self._derived
+
+    @property
+    def wavelengths(self) -> Optional[NDArray]:
+        return self._get_axis("wavelengths")
+
+    @property
+    def x(self) -> Optional[NDArray]:
+        return self._get_axis("x")
+
+    @property
+    def y(self) -> Optional[NDArray]:
+        return self._get_axis("y")
+
+    @property
+    def z(self) -> Optional[NDArray]:
+        return self._get_axis("z")
+
+    def _get_axis(self, axis: str) -> Optional[NDArray]:
+        """Returns the array of an axis, either from the grid cache of the owning database or stored inline."""
+        grid_id = getattr(self, f"{axis}_grid_id")
+        if grid_id is None:
+            return getattr(self, f"_{axis}")
+
+        cache = self.__dict__.get("_grid_cache")
+        if cache is not None:
+            return cache.get(grid_id)
+
+        # Monitors not loaded through a DatabaseHandler session fetch the grid through their own session, or with a
+        # short-lived session on the engine they were loaded from if they are detached.
+        session = object_session(self)
+        if session is not None:
+            return session.get(GridModel, grid_id).values
+        engine = self.__dict__.get("_engine")
+        if engine is None:
+            raise ValueError(f"The {axis} grid is not cached, and the monitor is not bound to a session.")
+        with Session(engine) as session:
+            return session.get(GridModel, grid_id).values
+
+    def get_derived(self, quantity: str) -> Optional[DerivedQuantityModel]:
+        """Returns the precomputed quantity with the given name, or None if it hasn't been stored."""
+        return next((d for d in self._derived if d.quantity == quantity), None)
+
+
+@event.listens_for(MonitorModel, "load", propagate=True)
+def _attach_grid_cache(target: MonitorModel, context) -> None:
+    """Gives loaded monitors access to the grid cache of the database handler that loaded them."""
+    # Session.merge() loads instances without a query context
+    target.__dict__["_grid_cache"] = context.session.info.get("grid_cache") if context is not None else None
+
 
 class FieldAndPowerMonitorModel(MonitorModel):
     __mapper_args__ = {
@@ -402,17 +838,198 @@ class FieldAndPowerMonitorModel(MonitorModel):
     }
 
 
+class IndexMonitorModel(MonitorModel):
+    """
+    Refractive index recorded by an index monitor, stored as a palette of the unique materials with their complex
+    index per wavelength and component, and a map of which palette entry each point uses.
+    """
+    __mapper_args__ = {
+        "polymorphic_identity": "index"
+    }
+
+    _palette = deferred(Column("palette", NumpyArrayType, nullable=True))  # (Npalette, Nλ, Nc) complex n + ik
+    _index_map = deferred(Column("index_map", NumpyArrayType, nullable=True))  # (Nx, Ny, Nz) uint8/uint16
+    palette = _deferred_array("_palette")
+    index_map = _deferred_array("_index_map")
+    index_components: str = Column(String, nullable=True)
+
+    def get_index(self) -> NDArray:
+        """Returns the full (Nx, Ny, Nz, Nλ, Nc) complex refractive index array."""
+        return expand_material_map(self.palette, self.index_map)
+
+
 class FieldModel(Base):
+    """
+    A recorded field of shape (Nx, Ny, Nz, Nλ, Nc).
+
+    Fields are either stored as a single array in the data column, or split into chunks of a few wavelengths of a
+    single component in the field_chunks table, so a single wavelength can be read without decoding the rest.
+    The data property returns the full array either way, while read() returns only the requested hyperslab.
+    """
     __tablename__ = 'fields'
+    __table_args__ = (
+        Index("ix_fields_monitor_id", "monitor_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     monitor_id = Column(Integer, ForeignKey("monitors.id", ondelete="CASCADE"))
     field_name = Column(String)
     components = Column(String)
-    data = Column(NumpyArrayType)  # NumPy data stored as binary
+    _data = deferred(Column("data", NumpyArrayType(codec=FIELD_CODEC, external=True)))  # In the blob store if large
+    _shape = Column("shape", JSON, nullable=True)  # Shape of chunked fields
+    chunk_wavelengths = Column(Integer, nullable=True)  # Wavelengths per chunk, None if stored in the data column
 
     _monitor = relationship("MonitorModel", back_populates="_fields")
+    _chunks = relationship(
+        "FieldChunkModel",
+        back_populates="_field",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="(FieldChunkModel.wavelength_start, FieldChunkModel.component)"
+    )
+
+    @classmethod
+    def from_array(cls, field_name: str, components: str, data: NDArray, chunk_wavelengths: Optional[int] = None,
+                   **kwargs) -> FieldModel:
+        """Creates a field, split into chunks of chunk_wavelengths wavelengths unless it's None."""
+        if chunk_wavelengths is None:
+            return cls(field_name=field_name, components=components, data=data, **kwargs)
+
+        return cls(
+            field_name=field_name,
+            components=components,
+            _shape=list(data.shape),
+            chunk_wavelengths=chunk_wavelengths,
+            _chunks=[FieldChunkModel(wavelength_start=start, component=component, data=chunk)
+                     for start, component, chunk in split_field(data, chunk_wavelengths)],
+            **kwargs
+        )
 
     @property
     def monitor(self) -> MonitorModel:
         return self._monitor
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """The shape of the full field, available without assembling chunked fields."""
+        if self.chunk_wavelengths is None:
+            return _load_deferred(self, "_data").shape
+        return tuple(self._shape)
+
+    @property
+    def data(self) -> NDArray:
+        if self.chunk_wavelengths is None:
+            return _load_deferred(self, "_data")
+
+        # Chunked fields are assembled once per instance, as viewers access the full field on every redraw. The
+        # array is read-only, like the arrays of fields stored in the data column.
+        assembled = self.__dict__.get("_assembled")
+        if assembled is None:
+            assembled = self.read()
+            assembled.flags.writeable = False
+            self.__dict__["_assembled"] = assembled
+        return assembled
+
+    @data.setter
+    def data(self, value: NDArray) -> None:
+        if self.chunk_wavelengths is not None:
+            # The chunks are replaced by the data column, and deleted by the delete-orphan cascade on flush.
+            self._chunks = []
+        self._data = value
+        self._shape = None
+        self.chunk_wavelengths = None
+        self.__dict__.pop("_assembled", None)
+
+    def read(self, wavelengths: AxisIndex = None, components: AxisIndex = None,
+             x: AxisIndex = None, y: AxisIndex = None, z: AxisIndex = None) -> NDArray:
+        """
+        Returns a hyperslab of the field, keeping its 5D layout. Each axis can be indexed by a position, a slice or a
+        sequence of positions, and is read in full if None.
+
+        Only the chunks holding the requested wavelengths and components are decoded. If the chunks are not loaded
+        already, only those chunks are fetched from the database. Chunked fields already assembled by accessing
+        data are sliced instead.
+        """
+        full = _load_deferred(self, "_data") if self.chunk_wavelengths is None else self.__dict__.get("_assembled")
+        if full is not None:
+            return assemble_hyperslab(
+                full.shape, full.shape[3], ((0, component, full[..., component]) for component in range(full.shape[4])),
+                wavelengths, components, x, y, z
+            )
+
+        shape = self.shape
+        if "_chunks" in self.__dict__:
+            chunks = ((chunk.wavelength_start, chunk.component, chunk.data) for chunk in self._chunks)
+        else:
+            starts, comps = chunks_for(axis_indices(wavelengths, shape[3]), axis_indices(components, shape[4]),
+                                       self.chunk_wavelengths)
+            stmt = (
+                select(FieldChunkModel.wavelength_start, FieldChunkModel.component, FieldChunkModel.data)
+                .where(FieldChunkModel.field_id == self.id,
+                       FieldChunkModel.wavelength_start.in_(starts.tolist()),
+                       FieldChunkModel.component.in_(comps.tolist()))
+            )
+
+            # Detached fields fetch their chunks with a short-lived session on the engine they were loaded from.
+            session = object_session(self)
+            if session is not None:
+                chunks = session.execute(stmt).tuples().all()
+            elif "_engine" in self.__dict__:
+                with Session(self.__dict__["_engine"]) as session:
+                    chunks = session.execute(stmt).tuples().all()
+            else:
+                raise ValueError("The chunks of the field are not loaded, and the field is not bound to a session.")
+
+        return assemble_hyperslab(shape, self.chunk_wavelengths, chunks, wavelengths, components, x, y, z)
+
+
+class FieldChunkModel(Base):
+    """A block of consecutive wavelengths of a single component of a chunked field."""
+    __tablename__ = 'field_chunks'
+    __table_args__ = (UniqueConstraint("field_id", "wavelength_start", "component"),)
+
+    id = Column(Integer, primary_key=True)
+    field_id = Column(Integer, ForeignKey("fields.id", ondelete="CASCADE"), nullable=False)
+    wavelength_start = Column(Integer, nullable=False)
+    component = Column(Integer, nullable=False)
+    _data = deferred(Column("data", NumpyArrayType(codec=FIELD_CODEC, external=True)))  # (Nx, Ny, Nz, n)
+    data = _deferred_array("_data")
+
+    _field = relationship("FieldModel", back_populates="_chunks")
+
+
+
+class DerivedQuantityModel(Base):
+    """Small arrays precomputed from a monitor's raw fields, so viewers don't have to process the full field."""
+    __tablename__ = 'derived_quantities'
+    __table_args__ = (
+        Index("ix_derived_quantities_monitor_id", "monitor_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    monitor_id = Column(Integer, ForeignKey("monitors.id", ondelete="CASCADE"))
+    quantity = Column(String)  # ie. '|E|^2', 'E limits' or 'P flux'
+    source_field = Column(String)
+    components = Column(String)
+    _data = deferred(Column("data", NumpyArrayType(codec=FIELD_CODEC, external=True)))
+    data = _deferred_array("_data")
+
+    _monitor = relationship("MonitorModel", back_populates="_derived")
+
+    @property
+    def monitor(self) -> MonitorModel:
+        return self._monitor
+
+
+class ResampledSpectrumModel(Base):
+    """
+    The T and power spectra of a monitor resampled onto a wavelength grid shared by its category, so the spectra of
+    a whole category can be read as one (Nruns, Nλ) block to overlay them, see spectra.py. Stored uncompressed, as
+    they are decoded as views of the fetched rows that way. Rows are deleted along with their monitor.
+    """
+    __tablename__ = "resampled_spectra"
+
+    monitor_id: int = Column(Integer, ForeignKey("monitors.id", ondelete="CASCADE"), primary_key=True)
+    grid_id: int = Column(Integer, ForeignKey("grids.id"), nullable=False)
+    T: NDArray = Column(NumpyArrayType(codec="none"), nullable=True)
+    power: NDArray = Column(NumpyArrayType(codec="none"), nullable=True)
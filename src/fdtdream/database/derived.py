@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.integrate import trapezoid
+
+from .db import DerivedQuantityPydanticModel, FieldAndPowerMonitorPydanticModel
+from ..results.monitors import FieldAndPowerMonitor
+
+# Scalar operations that can be recovered from the stored component limits, mapped to the
+# index of the (Re, Im, |Abs|) operation they're derived from.
+SCALAR_OPERATIONS = {"Re": 0, "-Re": 0, "Im": 1, "-Im": 1, "|Abs|": 2, "|Abs|^2": 2}
+
+
+def intensity(data: NDArray) -> NDArray[np.float32]:
+    """
+    Returns the squared magnitude of a field, summed over all of its components.
+
+    The result keeps the 5D layout of the raw field (Nx, Ny, Nz, Nλ, 1) so it can be indexed the same way.
+    """
+    squared = data.real ** 2 + data.imag ** 2 if np.iscomplexobj(data) else data ** 2
+    return np.ascontiguousarray(np.sum(squared, axis=-1, keepdims=True, dtype=np.float32))
+
+
+def component_limits(data: NDArray) -> NDArray[np.float32]:
+    """
+    Returns the per-wavelength minimum and maximum of each field component over all spatial positions.
+
+    The returned array has shape (Nλ, Nc, 3, 2), where the third axis holds the Re, Im and |Abs| operations,
+    and the last axis holds the (min, max) pair.
+    """
+    spatial_axes = (0, 1, 2)
+    operations = (data.real, data.imag if np.iscomplexobj(data) else np.zeros_like(data), np.abs(data))
+
+    limits = np.empty((data.shape[3], data.shape[4], 3, 2), dtype=np.float32)
+    for i, values in enumerate(operations):
+        limits[:, :, i, 0] = np.min(values, axis=spatial_axes)
+        limits[:, :, i, 1] = np.max(values, axis=spatial_axes)
+
+    return limits
+
+
+def limits_for_scalar_operation(limits: NDArray, component_idx: int, scalar_operation: str
+                                ) -> Optional[Tuple[float, float]]:
+    """
+    Returns the (min, max) colour limits over all wavelengths for a single component and scalar operation,
+    using limits produced by component_limits(). Returns None if the scalar operation is not supported.
+    """
+    if scalar_operation not in SCALAR_OPERATIONS:
+        return None
+
+    operation_limits = limits[:, component_idx, SCALAR_OPERATIONS[scalar_operation]]
+    vmin, vmax = float(np.min(operation_limits[:, 0])), float(np.max(operation_limits[:, 1]))
+
+    if scalar_operation.startswith("-"):
+        vmin, vmax = -vmax, -vmin
+    elif scalar_operation == "|Abs|^2":
+        vmin, vmax = vmin ** 2, vmax ** 2
+
+    return vmin, vmax
+
+
+def integrated_flux(data: NDArray, x: NDArray, y: NDArray, z: NDArray) -> NDArray[np.float64]:
+    """
+    Integrates the real part of each Poynting vector component over the spatial extent of the monitor.
+
+    Coordinates are expected in nanometers and are converted to meters before integrating, so for source
+    normalized data the result is the power through the monitor per wavelength. Axes with a single point are
+    collapsed without integrating. The returned array has shape (Nλ, Nc).
+    """
+    flux = data.real.astype(np.float64)
+    for axis, coordinates in reversed(list(enumerate((x, y, z)))):
+        if coordinates is not None and len(coordinates) > 1:
+            flux = trapezoid(flux, x=np.asarray(coordinates, dtype=np.float64) * 1e-9, axis=axis)
+        else:
+            flux = np.take(flux, 0, axis=axis)
+
+    return np.ascontiguousarray(flux)
+
+
+def compute_derived_quantities(monitor: Union[FieldAndPowerMonitor, FieldAndPowerMonitorPydanticModel]
+                               ) -> List[DerivedQuantityPydanticModel]:
+    """
+    Computes the precomputed quantities stored alongside the raw fields of a field and power monitor.
+
+    These are the total intensities |E|^2 and |H|^2, the per-wavelength limits of each component of every
+    recorded field, and the spatially integrated Poynting flux.
+    """
+    derived = []
+
+    for field in (monitor.E, monitor.H, monitor.P):
+        if field is None:
+            continue
+
+        data = field.data
+        name = field.field_name
+
+        if name in ("E", "H"):
+            derived.append(DerivedQuantityPydanticModel(
+                quantity=f"|{name}|^2", source_field=name, components=field.components, data=intensity(data)
+            ))
+
+        derived.append(DerivedQuantityPydanticModel(
+            quantity=f"{name} limits", source_field=name, components=field.components, data=component_limits(data)
+        ))
+
+        if name == "P":
+            derived.append(DerivedQuantityPydanticModel(
+                quantity="P flux", source_field=name, components=field.components,
+                data=integrated_flux(data, monitor.x, monitor.y, monitor.z)
+            ))
+
+    return derived
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from sqlalchemy import or_, select
+
+from .db import FieldModel, MonitorModel, SimulationModel, parameter_rows
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+if TYPE_CHECKING:
+    from .handler import DatabaseHandler
+
+EXPORT_FORMATS = ("npz", "hdf5", "parquet")
+
+# Spectra stacked along the run axis for every monitor that recorded them.
+SPECTRA = ("wavelengths", "T", "power")
+
+
+def _parameter_columns(parameters: Sequence[Optional[dict]]) -> Dict[str, NDArray]:
+    """
+    Returns a column per parameter key over all runs, as floats if every value of the key is a number and as
+    strings otherwise. Runs without the parameter get NaN or an empty string.
+    """
+    values: Dict[str, Dict[int, Tuple[Optional[float], str]]] = {}
+    for index, run_parameters in enumerate(parameters):
+        for key, numeric_value, text_value in parameter_rows(run_parameters):
+            values.setdefault(key, {})[index] = (numeric_value, text_value)
+
+    columns = {}
+    for key, entries in values.items():
+        if all(numeric_value is not None for numeric_value, _ in entries.values()):
+            column = np.full(len(parameters), np.nan)
+            for index, (numeric_value, _) in entries.items():
+                column[index] = numeric_value
+        else:
+            column = np.array([entries[index][1] if index in entries else "" for index in range(len(parameters))])
+        columns[f"parameters/{key}"] = column
+    return columns
+
+
+class _NpzWriter:
+    """
+    Writes each array as its own .npy entry of a zip archive, readable with np.load(). Entries can't grow once
+    written, so the spectra are appended to a temporary file as the runs are written, and stacked into their
+    entries a row at a time at the end.
+    """
+
+    def __init__(self, path: Path, columns: Dict[str, NDArray], spectra: List[str], fields: List[str]) -> None:
+        self.file = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        self.runs = len(columns["runs/id"])
+        self.buffer = tempfile.TemporaryFile()
+        # The offset and length in the temporary file of the values of each run, by spectrum and run index.
+        self.spectra: Dict[str, Dict[int, Tuple[int, int]]] = {name: {} for name in spectra}
+        for name, column in columns.items():
+            self._write(name, column)
+
+    def _write(self, name: str, array: NDArray) -> None:
+        with self.file.open(f"{name}.npy", "w", force_zip64=True) as entry:
+            np.lib.format.write_array(entry, np.asanyarray(array), allow_pickle=False)
+
+    def write_run(self, index: int, spectra: Dict[str, NDArray], fields: Dict[str, NDArray]) -> None:
+        for name, values in spectra.items():
+            values = np.ascontiguousarray(values, dtype=np.float64).reshape(-1)
+            self.spectra[name][index] = (self.buffer.tell(), len(values))
+            self.buffer.write(values.tobytes())
+        for name, data in fields.items():
+            self._write(f"fields/{index}/{name}", data)
+
+    def _write_spectrum(self, name: str, rows: Dict[int, Tuple[int, int]]) -> None:
+        """Writes a (runs, Nλ) entry padded with NaN from the values in the temporary file, one run at a time."""
+        width = max((length for _, length in rows.values()), default=0)
+        header = {"descr": np.lib.format.dtype_to_descr(np.dtype(np.float64)), "fortran_order": False,
+                  "shape": (self.runs, width)}
+        with self.file.open(f"{name}.npy", "w", force_zip64=True) as entry:
+            np.lib.format.write_array_header_1_0(entry, header)
+            for index in range(self.runs):
+                row = np.full(width, np.nan)
+                if index in rows:
+                    offset, length = rows[index]
+                    self.buffer.seek(offset)
+                    row[:length] = np.frombuffer(self.buffer.read(length * row.itemsize), dtype=np.float64)
+                entry.write(row.tobytes())
+
+    def close(self) -> None:
+        try:
+            for name, rows in self.spectra.items():
+                self._write_spectrum(name, rows)
+        finally:
+            self.buffer.close()
+            self.file.close()
+
+
+class _Hdf5Writer:
+    """Writes spectra to chunked (runs, Nλ) datasets filled row by row, and fields to compressed datasets."""
+
+    def __init__(self, path: Path, columns: Dict[str, NDArray], spectra: List[str], fields: List[str]) -> None:
+        if h5py is None:
+            raise ValueError("Exporting to hdf5 requires the optional 'h5py' package, which is not installed.")
+
+        self.file = h5py.File(path, "w")
+        self.runs = len(columns["runs/id"])
+        for name, column in columns.items():
+            if column.dtype.kind == "U":
+                self.file.create_dataset(name, data=column.astype(object), dtype=h5py.string_dtype())
+            else:
+                self.file.create_dataset(name, data=column)
+
+    def write_run(self, index: int, spectra: Dict[str, NDArray], fields: Dict[str, NDArray]) -> None:
+        for name, values in spectra.items():
+            dataset = self.file.get(name)
+            if dataset is None:
+                # Runs may record more wavelengths than the first one, so the wavelength axis can grow.
+                dataset = self.file.create_dataset(
+                    name, shape=(self.runs, len(values)), maxshape=(self.runs, None), dtype=np.float64,
+                    chunks=(1, max(len(values), 1)), fillvalue=np.nan, compression="gzip"
+                )
+            elif dataset.shape[1] < len(values):
+                dataset.resize(len(values), axis=1)
+            dataset[index, :len(values)] = values
+
+        for name, data in fields.items():
+            self.file.create_dataset(f"fields/{index}/{name}", data=data, chunks=True, compression="gzip")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _ParquetWriter:
+    """
+    Writes a row group per run. Spectra are list columns, and as Parquet has no complex type, each field is
+    written as list columns of its flattened real and imaginary parts along with its shape.
+    """
+
+    def __init__(self, path: Path, columns: Dict[str, NDArray], spectra: List[str], fields: List[str]) -> None:
+        if pa is None:
+            raise ValueError("Exporting to parquet requires the optional 'pyarrow' package, which is not installed.")
+
+        self.columns, self.spectra, self.fields = columns, spectra, fields
+        values = pa.list_(pa.float64())
+        schema = [(name, pa.string() if column.dtype.kind == "U" else pa.from_numpy_dtype(column.dtype))
+                  for name, column in columns.items()]
+        schema += [(name, values) for name in spectra]
+        for name in fields:
+            schema += [(f"fields/{name}/real", values), (f"fields/{name}/imag", values),
+                       (f"fields/{name}/shape", pa.list_(pa.int64()))]
+        self.schema = pa.schema(schema)
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    @staticmethod
+    def _list(values: Optional[NDArray], type_) -> pa.Array:
+        """Returns a single list holding the flattened values, or a null list if they are None."""
+        if values is None:
+            return pa.array([None], type=pa.list_(type_))
+        flat = pa.array(np.ravel(values), type=type_)
+        return pa.ListArray.from_arrays(pa.array([0, len(flat)], type=pa.int32()), flat)
+
+    def write_run(self, index: int, spectra: Dict[str, NDArray], fields: Dict[str, NDArray]) -> None:
+        row = {name: pa.array([column[index].item()], type=self.schema.field(name).type)
+               for name, column in self.columns.items()}
+        for name in self.spectra:
+            row[name] = self._list(spectra.get(name), pa.float64())
+        for name in self.fields:
+            data = fields.get(name)
+            row[f"fields/{name}/real"] = self._list(None if data is None else data.real, pa.float64())
+            row[f"fields/{name}/imag"] = self._list(None if data is None else data.imag, pa.float64())
+            row[f"fields/{name}/shape"] = self._list(None if data is None else np.array(data.shape), pa.int64())
+        self.writer.write_table(pa.Table.from_pydict(row, schema=self.schema))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+_WRITERS = {"npz": _NpzWriter, "hdf5": _Hdf5Writer, "parquet": _ParquetWriter}
+
+
+def export_category(db: DatabaseHandler, category: str, path: Union[str, Path], format: str = "npz",
+                    fields: Union[bool, Sequence[str]] = True,
+                    progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """
+    Exports the simulations of a category to a file, loading and writing one simulation at a time. See
+    DatabaseHandler.export_category() for the layout of the file.
+
+    Returns:
+        The number of simulations exported.
+    """
+    if format not in _WRITERS:
+        raise ValueError(f"Unknown export format '{format}'. Formats are {list(EXPORT_FORMATS)}.")
+
+    # Columns and names are collected up front without touching any arrays, as Parquet needs the schema before
+    # the first row.
+    in_category = SimulationModel.category == category
+    with db.Session() as session:
+        runs = session.execute(
+            select(SimulationModel.id, SimulationModel.name, SimulationModel.uuid, SimulationModel.created_at,
+                   SimulationModel.parameters)
+            .where(in_category)
+            .order_by(SimulationModel.id)
+        ).all()
+        monitor_names = session.execute(
+            select(MonitorModel.name).distinct()
+            .join(SimulationModel, MonitorModel.simulation_id == SimulationModel.id)
+            .where(in_category, or_(MonitorModel.T.is_not(None), MonitorModel.power.is_not(None)))
+            .order_by(MonitorModel.name)
+        ).scalars().all()
+        field_names = []
+        if fields:
+            stmt = (
+                select(MonitorModel.name, FieldModel.field_name).distinct()
+                .join(FieldModel, FieldModel.monitor_id == MonitorModel.id)
+                .join(SimulationModel, MonitorModel.simulation_id == SimulationModel.id)
+                .where(in_category)
+                .order_by(MonitorModel.name, FieldModel.field_name)
+            )
+            field_names = [f"{monitor}/{field}" for monitor, field in session.execute(stmt)
+                           if fields is True or field in fields]
+
+    if not runs:
+        raise ValueError(f"There are no simulations in category '{category}'.")
+
+    columns = {
+        "runs/id": np.array([run.id for run in runs], dtype=np.int64),
+        "runs/name": np.array([run.name or "" for run in runs]),
+        "runs/uuid": np.array([run.uuid or "" for run in runs]),
+        "runs/created_at": np.array([run.created_at or "" for run in runs]),
+        **_parameter_columns([run.parameters for run in runs]),
+    }
+    spectrum_names = [f"monitors/{monitor}/{spectrum}" for monitor in monitor_names for spectrum in SPECTRA]
+
+    writer = _WRITERS[format](Path(path), columns, spectrum_names, field_names)
+    try:
+        for index, run in enumerate(runs):
+            simulation = db.get_simulation_by_id(run.id, with_fields=fields)
+            spectra, field_data = {}, {}
+            for monitor in simulation.monitors:
+                if monitor.T is not None or monitor.power is not None:
+                    for spectrum in SPECTRA:
+                        values = getattr(monitor, spectrum)
+                        if values is not None:
+                            spectra[f"monitors/{monitor.name}/{spectrum}"] = values
+                for field in monitor.fields:
+                    if f"{monitor.name}/{field.field_name}" in field_names:
+                        field_data[f"{monitor.name}/{field.field_name}"] = field.data
+
+            writer.write_run(index, spectra, field_data)
+            # Released before the next simulation is loaded, rather than when the names are reassigned.
+            del simulation, spectra, field_data
+
+            if progress is not None:
+                progress(index + 1, len(runs))
+    finally:
+        writer.close()
+    return len(runs)
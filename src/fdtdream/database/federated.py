@@ -0,0 +1,203 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from numpy.typing import NDArray
+from sqlalchemy import Table, create_engine, event, func, literal, select, union, union_all
+from sqlalchemy.engine import Engine
+
+from .handler import DatabaseHandler
+from .queries import MAX_ATTACHED, attached_tables, read_only_uri, simulation_filters
+
+
+class FederatedDatabase:
+    """
+    Read-only view of several database files, attached to a single SQLite connection so that queries spanning
+    all of them run as one UNION statement inside SQLite rather than as a loop over handlers in Python.
+
+    Rows returned are tagged with the filename of the database they come from. The handlers stay available
+    through handler() for loading full simulations and monitors, or for making changes.
+    """
+
+    handlers: Dict[str, DatabaseHandler]
+    engine: Engine
+
+    def __init__(self, handlers: Sequence[DatabaseHandler]) -> None:
+        """
+        Args:
+            handlers (Sequence[DatabaseHandler]): Handlers of the databases to federate. Opening them first ensures
+                every file has been migrated to the current schema. At most MAX_ATTACHED files can be federated.
+        """
+        if len(handlers) > MAX_ATTACHED:
+            raise ValueError(f"At most {MAX_ATTACHED} databases can be federated, got {len(handlers)}.")
+
+        filenames = [handler.filename for handler in handlers]
+        duplicates = {name for name in filenames if filenames.count(name) > 1}
+        if duplicates:
+            raise ValueError(f"Databases to federate must have unique filenames, got duplicates {duplicates}.")
+
+        self.handlers = {handler.filename: handler for handler in handlers}
+
+        # Each attached file gets a schema alias, and a copy of the tables qualified with that schema.
+        self._aliases = {filename: f"db{i}" for i, filename in enumerate(self.handlers)}
+        self._tables = {filename: attached_tables(alias) for filename, alias in self._aliases.items()}
+
+        # The main database is an empty in-memory one, and every file is attached read-only.
+        self.engine = create_engine(
+            "sqlite://", creator=lambda: sqlite3.connect(":memory:", uri=True, check_same_thread=False)
+        )
+        event.listen(self.engine, "connect", self._attach_all)
+
+    def _attach_all(self, dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for filename, alias in self._aliases.items():
+                cursor.execute(f"ATTACH DATABASE ? AS {alias}", (read_only_uri(self.handlers[filename].path),))
+        finally:
+            cursor.close()
+
+    def handler(self, filename: str) -> DatabaseHandler:
+        return self.handlers[filename]
+
+    def _union_all(self, build) -> Any:
+        """Returns a UNION ALL of the statement build(filename, tables) makes for every federated database."""
+        return union_all(*(build(filename, tables) for filename, tables in self._tables.items()))
+
+    def _execute(self, stmt) -> List[Tuple]:
+        with self.engine.connect() as connection:
+            return [tuple(row) for row in connection.execute(stmt)]
+
+    def _first(self, stmt) -> Optional[Tuple]:
+        rows = self._execute(stmt.limit(1))
+        return rows[0] if rows else None
+
+    def get_all_categories(self) -> List[str]:
+        """Returns the distinct category names across all databases."""
+        stmt = union(*(select(tables["simulations"].c.category) for tables in self._tables.values()))
+        return [row[0] for row in self._execute(stmt.order_by("category"))]
+
+    def get_simulations_by_category(self, category: str) -> List[Tuple[str, int, str]]:
+        """Returns (filename, sim_id, sim_name) for the simulations in the category, in all databases."""
+        stmt = self._union_all(lambda filename, tables: (
+            select(literal(filename).label("db"), tables["simulations"].c.id, tables["simulations"].c.name)
+            .where(tables["simulations"].c.category == category)
+        ))
+        return self._execute(stmt)
+
+    def get_tree_snapshot(self) -> List[Tuple[str, str, int, str, Optional[int], Optional[str]]]:
+        """
+        Returns the hierarchy of all databases as (filename, category, sim_id, sim_name, mon_id, mon_name) rows,
+        like DatabaseHandler.get_tree_snapshot() prefixed with the filename.
+        """
+        def build(filename: str, tables: Dict[str, Table]):
+            simulations, monitors = tables["simulations"], tables["monitors"]
+            return (
+                select(literal(filename).label("db"), simulations.c.category.label("category"),
+                       simulations.c.id.label("sim_id"), simulations.c.name.label("sim_name"),
+                       monitors.c.id.label("mon_id"), monitors.c.name.label("mon_name"))
+                .outerjoin(monitors, monitors.c.simulation_id == simulations.c.id)
+            )
+
+        return self._execute(self._union_all(build).order_by("db", "category", "sim_id", "mon_id"))
+
+    # region Reads from a single database
+    # Ids are only unique within a database, so these take the filename along with the id, and query the tables of
+    # that database alone. They return the same as the DatabaseHandler methods of the same names.
+
+    def get_simulation_name(self, filename: str, sim_id: int) -> Optional[str]:
+        simulations = self._tables[filename]["simulations"]
+        row = self._first(select(simulations.c.name).where(simulations.c.id == sim_id))
+        return row[0] if row else None
+
+    def get_monitor_name(self, filename: str, monitor_id: int) -> Optional[str]:
+        monitors = self._tables[filename]["monitors"]
+        row = self._first(select(monitors.c.name).where(monitors.c.id == monitor_id))
+        return row[0] if row else None
+
+    def get_simulation_parameters(self, filename: str, sim_id: int) -> dict[str, str]:
+        simulations = self._tables[filename]["simulations"]
+        row = self._first(select(simulations.c.parameters).where(simulations.c.id == sim_id))
+        return (row[0] if row else None) or {}
+
+    def get_monitor_parameters(self, filename: str, monitor_id: int) -> dict[str, str]:
+        monitors = self._tables[filename]["monitors"]
+        row = self._first(select(monitors.c.parameters).where(monitors.c.id == monitor_id))
+        return (row[0] if row else None) or {}
+
+    def get_monitors_for_simulation(self, filename: str, simulation_id: int) -> List[Tuple[int, str]]:
+        monitors = self._tables[filename]["monitors"]
+        return self._execute(select(monitors.c.id, monitors.c.name).where(monitors.c.simulation_id == simulation_id))
+
+    def get_structures_for_simulation(self, filename: str, simulation_id: int) -> List[Tuple[int, str]]:
+        structures = self._tables[filename]["structures"]
+        return self._execute(
+            select(structures.c.id, structures.c.name).where(structures.c.simulation_id == simulation_id)
+        )
+
+    def _get_spectrum(self, filename: str, monitor_id: int, spectrum: str) -> Optional[Tuple[NDArray, NDArray]]:
+        """Returns the wavelengths and a spectrum of a monitor, from its shared grid or stored inline."""
+        monitors, grids = self._tables[filename]["monitors"], self._tables[filename]["grids"]
+        row = self._first(
+            select(grids.c["values"], monitors.c.wavelengths, monitors.c[spectrum])
+            .outerjoin(grids, grids.c.id == monitors.c.wavelengths_grid_id)
+            .where(monitors.c.id == monitor_id)
+        )
+        if row is None:
+            return None
+
+        grid, wavelengths, values = row
+        wavelengths = grid if grid is not None else wavelengths
+        if wavelengths is None or values is None:
+            return None
+        return wavelengths, values
+
+    def get_T_data(self, filename: str, monitor_id: int) -> Optional[Tuple[NDArray, NDArray]]:
+        return self._get_spectrum(filename, monitor_id, "T")
+
+    def get_power_data(self, filename: str, monitor_id: int) -> Optional[Tuple[NDArray, NDArray]]:
+        return self._get_spectrum(filename, monitor_id, "power")
+    # endregion
+
+    def find(self, category: Optional[str] = None, **conditions) -> List[Tuple[str, int]]:
+        """
+        Returns (filename, sim_id) for the simulations matching the parameter conditions in all databases.
+        The conditions are given as for DatabaseHandler.find().
+        """
+        stmt = self._union_all(lambda filename, tables: (
+            select(literal(filename).label("db"), tables["simulations"].c.id.label("sim_id"))
+            .where(*simulation_filters(tables["simulations"], tables["parameters"], category, conditions))
+        ))
+        return self._execute(stmt.order_by("db", "sim_id"))
+
+    def count_by_category(self) -> List[Tuple[str, int, int]]:
+        """Returns (category, number of simulations, number of databases holding it), aggregated in SQLite."""
+        rows = self._union_all(lambda filename, tables: (
+            select(literal(filename).label("db"), tables["simulations"].c.category.label("category"))
+        )).subquery()
+        stmt = (
+            select(rows.c.category, func.count(), func.count(rows.c.db.distinct()))
+            .group_by(rows.c.category)
+            .order_by(rows.c.category)
+        )
+        return self._execute(stmt)
+
+    def find_shared_simulations(self) -> List[Tuple[str, str, str]]:
+        """
+        Returns (category, sim_name, filenames) for simulations stored under the same category and name in more
+        than one database, ie. to spot runs that were copied or merged twice. Filenames are comma separated.
+        """
+        rows = self._union_all(lambda filename, tables: (
+            select(literal(filename).label("db"), tables["simulations"].c.category.label("category"),
+                   tables["simulations"].c.name.label("name"))
+        )).subquery()
+        stmt = (
+            select(rows.c.category, rows.c.name, func.group_concat(rows.c.db.distinct()))
+            .group_by(rows.c.category, rows.c.name)
+            .having(func.count(rows.c.db.distinct()) > 1)
+            .order_by(rows.c.category, rows.c.name)
+        )
+        return self._execute(stmt)
+
+    def close(self) -> None:
+        self.engine.dispose()
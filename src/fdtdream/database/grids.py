@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from numpy.typing import NDArray
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from .db import GridModel
+
+
+def hash_grid(array: NDArray) -> str:
+    """Returns a content hash of an array, including its dtype and shape."""
+    array = np.ascontiguousarray(array)
+    digest = hashlib.sha1()
+    digest.update(f"{array.dtype.str}{array.shape}".encode())
+    digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+class GridCache:
+    """
+    Thread-safe LRU cache of decoded coordinate grids, keyed by their id in the grids table.
+
+    Grids are immutable once written, so cached arrays never go stale. Arrays handed out are read-only,
+    as they are shared between every monitor recorded on the same grid.
+    """
+
+    engine: Engine
+    maxsize: int
+
+    def __init__(self, engine: Engine, maxsize: int = 1024) -> None:
+        self.engine = engine
+        self.maxsize = maxsize
+        self._grids: OrderedDict[int, NDArray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, grid_id: Optional[int]) -> Optional[NDArray]:
+        """Returns the decoded grid with the given id, fetching it from the database if it's not cached."""
+        if grid_id is None:
+            return None
+
+        with self._lock:
+            grid = self._grids.get(grid_id)
+            if grid is not None:
+                self._grids.move_to_end(grid_id)
+                return grid
+
+        with Session(self.engine) as session:
+            grid = session.execute(select(GridModel.values).where(GridModel.id == grid_id)).scalar_one_or_none()
+
+        if grid is not None:
+            self._put(grid_id, grid)
+
+        return grid
+
+    def get_or_create_id(self, session: Session, array: Optional[NDArray]) -> Optional[int]:
+        """
+        Returns the id of the grid matching the array, inserting it through the session if it's not stored yet.
+        """
+        if array is None:
+            return None
+
+        array = np.ascontiguousarray(array)
+        digest = hash_grid(array)
+
+        grid_id = session.execute(select(GridModel.id).where(GridModel.digest == digest)).scalar_one_or_none()
+        if grid_id is None:
+            grid = GridModel(digest=digest, values=array)
+            session.add(grid)
+            session.flush()
+            grid_id = grid.id
+
+        return grid_id
+
+    def clear(self) -> None:
+        with self._lock:
+            self._grids.clear()
+
+    def _put(self, grid_id: int, grid: NDArray) -> None:
+        grid.flags.writeable = False
+        with self._lock:
+            self._grids[grid_id] = grid
+            self._grids.move_to_end(grid_id)
+            while len(self._grids) > self.maxsize:
+                self._grids.popitem(last=False)
@@ -1,40 +1,144 @@
 import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
 from typing import Optional, Union
 
-from sqlalchemy import create_engine, select, delete, event
-from sqlalchemy.orm import sessionmaker, selectinload
+from numpy.typing import NDArray
+from sqlalchemy import create_engine, select, delete, event, func, type_coerce, union, LargeBinary
+from sqlalchemy.orm import sessionmaker, selectinload, joinedload, undefer
+from sqlalchemy.pool import QueuePool
 
 from .db import (Base, SimulationModel, MonitorModel, StructureModel, FieldModel, FieldAndPowerMonitorModel,
-                 FieldAndPowerMonitorPydanticModel, StructurePydanticModel, SimulationPydanticModel)
-from ..results.monitors import FieldAndPowerMonitor
+                 FieldAndPowerMonitorPydanticModel, StructurePydanticModel, SimulationPydanticModel, FieldChunkModel,
+                 DerivedQuantityModel, FieldPydanticModel, IndexMonitorModel, IndexMonitorPydanticModel,
+                 NumpyArrayType, ParameterModel, MeshModel, DatabaseStateModel, MergeWatermarkModel)
+from .blob_store import BlobStore
+from .bulk import insert_simulations
+from .chunks import AxisIndex
+from .codecs import REFERENCE_HEADER, read_reference
+from .derived import compute_derived_quantities
+from .export import export_category
+from .grids import GridCache
+from .meshes import get_or_create_mesh_id
+from .migrations import is_up_to_date, migrate, pending_background_migrations, run_background_migrations
+from .profiles import apply_profile, get_profile
+from .queries import MAX_ATTACHED, attached_tables, read_only_uri, simulation_filters
+from .retry import retry_on_busy
+from .spectra import Spectra, SpectrumBlock, spectrum_block, store_resampled_spectra
+from .transfer import copy_simulations
+from .watch import DatabaseWatcher
+from ..results.monitors import FieldAndPowerMonitor, IndexMonitor
 from ..results.simulation import Simulation
 
 
 class DatabaseHandler:
     path: Path
     filename: str
-
-    def __init__(self, db_path: str):
+    grids: GridCache
+    blob_store: BlobStore
+    field_chunk_wavelengths: Optional[int]
+    profile: str
+    read_only: bool
+
+    def __init__(self, db_path: str, profile: str = "safe", blob_threshold: Optional[int] = None,
+                 field_chunk_wavelengths: Optional[int] = 1, background_migrations: bool = True,
+                 read_only: bool = False):
+        """
+        Args:
+            db_path (str): Path to the database file. The .db suffix is added if missing.
+            profile (str): Name of the SQLite profile applied to every connection, one of "safe", "bulk-write"
+                and "interactive-read". See profiles.PROFILES for the settings of each.
+            blob_threshold (int): Field arrays of at least this many bytes are written as memory-mappable .npy
+                files to a '<name>.blobs' directory next to the database, instead of into the database itself.
+                If None, all arrays are stored in the database, but arrays already in the directory are still read.
+            field_chunk_wavelengths (int): Number of wavelengths per chunk when storing new fields, so viewers can read
+                a single wavelength without decoding the whole field. If None, fields are stored as single arrays.
+            background_migrations (bool): Run the steps of background migrations, which fill derived tables of
+                existing files, in a background thread. If False, they are left for a later handler or for
+                run_migrations().
+            read_only (bool): Open the file read-only, ie. to view a sweep while a simulation script is writing to
+                it. Every connection is opened with mode=ro and made query_only, so nothing this handler does can
+                write to the file. The file must exist and have been migrated by a writable handler.
+        """
         path = Path(db_path)
         if path.suffix != ".db":
             path = path.with_suffix(".db")
         self.path = path.resolve()
         self.filename = self.path.name
+        self.field_chunk_wavelengths = field_chunk_wavelengths
+        get_profile(profile)  # Fail early on unknown profiles
+        self.profile = profile
+        self.read_only = read_only
+
+        if read_only:
+            if not self.path.exists():
+                raise FileNotFoundError(f"No database at '{self.path}' to open read-only.")
+            # The path is passed as a URI by the creator, as SQLAlchemy URLs can't hold every file name as one.
+            self.engine = create_engine(
+                "sqlite://", poolclass=QueuePool, echo=False, future=True,
+                creator=lambda: sqlite3.connect(read_only_uri(self.path), uri=True, check_same_thread=False)
+            )
+        else:
+            uri = f"sqlite:///{self.path}"
+            self.engine = create_engine(uri, echo=False, future=True)
 
-        uri = f"sqlite:///{self.path}"
-        self.engine = create_engine(uri, echo=False, future=True)
-
-        # ✅ Enable foreign key support for SQLite
+        # ✅ Enable foreign key support and the profile's settings on every pooled connection
         event.listen(
             self.engine,
             "connect",
-            lambda dbapi_connection, connection_record: dbapi_connection.execute("PRAGMA foreign_keys=ON")
+            lambda dbapi_connection, connection_record: apply_profile(dbapi_connection, self.profile, read_only)
         )
 
-        self.Session = sessionmaker(bind=self.engine, future=True)
-        Base.metadata.create_all(self.engine)
+        # The blob store is handed to NumpyArrayType columns through the dialect, as they only see the dialect.
+        self.blob_store = BlobStore(self.path.with_suffix(".blobs"), blob_threshold)
+        self.engine.dialect.blob_store = self.blob_store
+
+        # Decoded coordinate grids are shared between all monitors loaded through this handler's sessions.
+        self.grids = GridCache(self.engine)
+
+        self.Session = sessionmaker(bind=self.engine, future=True, info={"grid_cache": self.grids})
+        if read_only:
+            if not is_up_to_date(self.engine):
+                self.engine.dispose()
+                raise ValueError(f"'{self.filename}' has not been migrated to the current schema. "
+                                 f"Open it writable once to upgrade it.")
+        else:
+            migrate(self.engine)
+
+        # Derived tables of existing files are filled in the background, a batch per transaction, so the database
+        # can be used meanwhile.
+        self._stop_migrations = threading.Event()
+        self._migration_thread = None
+        if background_migrations and not read_only and pending_background_migrations(self.engine):
+            self._migration_thread = threading.Thread(
+                target=run_background_migrations, args=(self.engine, self._stop_migrations),
+                name=f"Migrations of {self.filename}", daemon=True
+            )
+            self._migration_thread.start()
+
+    def run_migrations(self) -> bool:
+        """
+        Runs the steps of pending background migrations in this thread, waiting for the background thread first if
+        it's running. Returns True if all completed.
+        """
+        self.wait_for_migrations()
+        return run_background_migrations(self.engine)
+
+    def wait_for_migrations(self, timeout: Optional[float] = None) -> bool:
+        """Waits for the background migrations to finish, and returns True if they have."""
+        if self._migration_thread is not None:
+            self._migration_thread.join(timeout)
+            return not self._migration_thread.is_alive()
+        return True
+
+    def stop_migrations(self) -> None:
+        """Stops the background migrations after their current batch. They resume when the file is opened again."""
+        self._stop_migrations.set()
+        self.wait_for_migrations()
 
     def same_file(self, other_path: str) -> bool:
         path = Path(other_path)
@@ -49,6 +153,7 @@ class DatabaseHandler:
             stmt = select(SimulationModel.category).distinct()
             return session.execute(stmt).scalars().all()
 
+    @retry_on_busy
     def delete_category(self, category_name: str) -> None:
         """
         Deletes all simulations with the specified category from the database.
@@ -91,6 +196,7 @@ class DatabaseHandler:
             stmt = select(FieldAndPowerMonitorModel.power).where(FieldAndPowerMonitorModel.id == monitor_id)
             return session.execute(stmt).scalar_one_or_none() is not None
 
+    @retry_on_busy
     def change_simulation_category(self, sim_id: int, new_category: str) -> bool:
         """
         Changes the category of the simulation with the given ID.
@@ -135,6 +241,7 @@ class DatabaseHandler:
             result = session.execute(stmt).scalar_one_or_none()
             return result.get("__info__", None) if result else None
 
+    @retry_on_busy
     def update_simulation_info(self, sim_id: int, new_info: str) -> bool:
         with self.Session() as session:
             sim = session.get(SimulationModel, sim_id)
@@ -155,6 +262,7 @@ class DatabaseHandler:
             result = session.execute(stmt).scalar_one_or_none()
             return result.get("__info__", None) if result else None
 
+    @retry_on_busy
     def update_simulation_parameters(self, sim_id: int, params: dict[str, str]) -> bool:
         with self.Session() as session:
             sim = session.get(SimulationModel, sim_id)
@@ -168,18 +276,23 @@ class DatabaseHandler:
     def get_T_data(self, monitor_id: int):
         """
         Returns the transmission (T) data array for the monitor, or None if not found or empty.
+
+        The arrays are read-only views of the stored data. Use np.array() for writable copies.
         """
         with self.Session() as session:
             stmt = select(
-                FieldAndPowerMonitorModel.wavelengths,
-                FieldAndPowerMonitorModel.T,
+                FieldAndPowerMonitorModel.wavelengths_grid_id,
+                FieldAndPowerMonitorModel._wavelengths,
+                FieldAndPowerMonitorModel.T
             ).where(FieldAndPowerMonitorModel.id == monitor_id)
 
             result = session.execute(stmt).first()
             if result is None:
                 return None
 
-            wavelengths, T = result
+            grid_id, wavelengths, T = result
+            if grid_id is not None:
+                wavelengths = self.grids.get(grid_id)
             if wavelengths is None or T is None:
                 return None
 
@@ -188,10 +301,13 @@ class DatabaseHandler:
     def get_power_data(self, monitor_id: int):
         """
         Returns the power data array for the monitor, or None if not found or empty.
+
+        The arrays are read-only views of the stored data. Use np.array() for writable copies.
         """
         with self.Session() as session:
             stmt = select(
-                FieldAndPowerMonitorModel.wavelengths,
+                FieldAndPowerMonitorModel.wavelengths_grid_id,
+                FieldAndPowerMonitorModel._wavelengths,
                 FieldAndPowerMonitorModel.power
             ).where(FieldAndPowerMonitorModel.id == monitor_id)
 
@@ -199,12 +315,15 @@ class DatabaseHandler:
             if result is None:
                 return None
 
-            wavelengths, power = result
+            grid_id, wavelengths, power = result
+            if grid_id is not None:
+                wavelengths = self.grids.get(grid_id)
             if wavelengths is None or power is None:
                 return None
 
             return wavelengths, power
 
+    @retry_on_busy
     def update_monitor_parameters(self, monitor_id: int, params: dict[str, str]) -> bool:
         with self.Session() as session:
             mon = session.get(MonitorModel, monitor_id)
@@ -215,6 +334,7 @@ class DatabaseHandler:
             session.commit()
             return True
 
+    @retry_on_busy
     def update_monitor_info(self, monitor_id: int, new_info: str) -> bool:
         with self.Session() as session:
             mon = session.get(MonitorModel, monitor_id)
@@ -229,6 +349,7 @@ class DatabaseHandler:
             session.commit()
             return True
 
+    @retry_on_busy
     def delete_monitor_by_id(self, monitor_id: int) -> None:
         with self.Session() as session:
             monitor = session.get(MonitorModel, monitor_id)
@@ -246,6 +367,7 @@ class DatabaseHandler:
 
                 session.commit()
 
+    @retry_on_busy
     def delete_simulation_by_id(self, simulation_id: int) -> None:
         """
         Deletes the simulation with the specified ID from the database.
@@ -259,6 +381,7 @@ class DatabaseHandler:
                 session.delete(simulation)
                 session.commit()
 
+    @retry_on_busy
     def rename_monitor(self, monitor_id: int, new_name: str) -> bool:
         """
         Renames a monitor with the given ID.
@@ -306,6 +429,7 @@ class DatabaseHandler:
             stmt = select(MonitorModel.name).where(MonitorModel.id == monitor_id)
             return session.execute(stmt).scalar_one_or_none()
 
+    @retry_on_busy
     def rename_simulation(self, sim_id: int, new_name: str) -> bool:
         """
         Renames a simulation with the given ID.
@@ -325,6 +449,7 @@ class DatabaseHandler:
             session.commit()
             return True
 
+    @retry_on_busy
     def rename_category(self, old_name: str, new_name: str) -> None:
         """
         Renames a category by updating all simulations that belong to the old category name.
@@ -345,6 +470,44 @@ class DatabaseHandler:
             )
             return session.execute(stmt).all()
 
+    def find(self, category: Optional[str] = None, **conditions) -> List[int]:
+        """
+        Returns the ids of simulations matching all the given parameter conditions, using a single query.
+
+        Each keyword names a simulation parameter, with the condition as its value:
+            a number:           The parameter equals the number, ie. period=400.
+            a (min, max) tuple: The parameter is a number within the inclusive range. Either end can be None,
+                                ie. radius=(80, 120) or radius=(None, 120).
+            a string:           The parameter equals the text, ie. material="Au".
+            a list or set:      The parameter equals any of the values, ie. period=[400, 450].
+        Parameters with names that aren't valid keywords can be passed by unpacking a dict, ie. **{"gap size": 20}.
+
+        Example:
+            db.find(category="dimers", radius=(80, 120), period=400)
+        """
+        stmt = (
+            select(SimulationModel.id)
+            .where(*simulation_filters(SimulationModel.__table__, ParameterModel.__table__, category, conditions))
+            .order_by(SimulationModel.id)
+        )
+        with self.Session() as session:
+            return list(session.execute(stmt).scalars())
+
+    def get_tree_snapshot(self) -> List[Tuple[str, int, str, Optional[int], Optional[str]]]:
+        """
+        Returns the whole category/simulation/monitor hierarchy as (category, sim_id, sim_name, mon_id, mon_name)
+        rows from a single joined query, ordered by category, simulation id and monitor id. Simulations without
+        monitors are included once, with mon_id and mon_name set to None.
+        """
+        with self.Session() as session:
+            stmt = (
+                select(SimulationModel.category, SimulationModel.id, SimulationModel.name,
+                       MonitorModel.id, MonitorModel.name)
+                .outerjoin(MonitorModel, MonitorModel.simulation_id == SimulationModel.id)
+                .order_by(SimulationModel.category, SimulationModel.id, MonitorModel.id)
+            )
+            return [tuple(row) for row in session.execute(stmt)]
+
     # Just (id, name) for monitors in a simulation
     def get_monitors_for_simulation(self, simulation_id: int) -> List[Tuple[int, str]]:
         with self.Session() as session:
@@ -362,35 +525,98 @@ class DatabaseHandler:
 
     # Full ORM load when needed
 
-    def get_simulation_by_id(self, sim_id: int) -> Optional[SimulationModel]:
+    def get_simulation_by_id(self, sim_id: int, with_fields: Union[bool, Sequence[str]] = False,
+                             with_structures: bool = False) -> Optional[SimulationModel]:
+        """
+        Returns a simulation with its monitors, fields and structures. Array data that is not loaded up front is
+        fetched from the database the first time it's accessed.
+
+        Args:
+            sim_id (int): The ID of the simulation.
+            with_fields (bool | Sequence[str]): Fields to load the data of up front, ie. ("E",), or True for all.
+            with_structures (bool): Whether to load the vertices and faces of the structures up front.
+        """
         with self.Session() as session:
             stmt = (
                 select(SimulationModel)
                 .options(
-                    selectinload(SimulationModel._structures),
+                    self._structure_loader(SimulationModel._structures, with_structures),
                     selectinload(SimulationModel._monitors)
-                    .selectinload(MonitorModel._fields)
+                    .selectinload(MonitorModel._fields),
+                    self._derived_loader(selectinload(SimulationModel._monitors), with_fields)
                 )
                 .where(SimulationModel.id == sim_id)
             )
             result = session.execute(stmt).unique().scalar_one_or_none()
+            if result is not None:
+                self._load_field_data(session, [f for m in result.monitors for f in m.fields], with_fields)
             return result
 
-    def get_monitor_by_id(self, monitor_id: int) -> Optional[MonitorModel]:
+    def get_monitor_by_id(self, monitor_id: int, with_fields: Union[bool, Sequence[str]] = False,
+                          with_structures: bool = False) -> Optional[MonitorModel]:
+        """
+        Returns a monitor with its fields and the structures of its simulation. Array data that is not loaded up
+        front is fetched from the database the first time it's accessed.
+
+        Args:
+            monitor_id (int): The ID of the monitor.
+            with_fields (bool | Sequence[str]): Fields to load the data of up front, ie. ("E",), or True for all.
+            with_structures (bool): Whether to load the vertices and faces of the structures up front.
+        """
         with self.Session() as session:
             stmt = (
                 select(MonitorModel)
                 .options(
                     selectinload(MonitorModel._fields),
-                    selectinload(MonitorModel._simulation)
-                    .selectinload(SimulationModel._structures)
+                    self._derived_loader(None, with_fields),
+                    self._structure_loader(MonitorModel._simulation, with_structures,
+                                           nested=SimulationModel._structures)
                 )
                 .where(MonitorModel.id == monitor_id)
             )
             result = session.execute(stmt).unique().scalar_one_or_none()
+            if result is not None:
+                self._load_field_data(session, result.fields, with_fields)
             return result
 
+    @staticmethod
+    def _derived_loader(parent_loader, with_fields: Union[bool, Sequence[str]]):
+        """Returns a loader option for derived quantities, undeferring their data if all fields are requested."""
+        if parent_loader is None:
+            loader = selectinload(MonitorModel._derived)
+        else:
+            loader = parent_loader.selectinload(MonitorModel._derived)
+        if with_fields is True:
+            loader = loader.undefer(DerivedQuantityModel._data)
+        return loader
 
+    @staticmethod
+    def _structure_loader(relationship, with_structures: bool, nested=None):
+        """Returns a loader option for structures, undeferring their vertices and faces if requested."""
+        loader = selectinload(relationship)
+        if nested is not None:
+            loader = loader.selectinload(nested)
+        if with_structures:
+            loader = loader.options(
+                undefer(StructureModel._vertices), undefer(StructureModel._faces),
+                joinedload(StructureModel._mesh).options(undefer(MeshModel._vertices), undefer(MeshModel._faces))
+            )
+        return loader
+
+    @staticmethod
+    def _load_field_data(session, fields: List[FieldModel], with_fields: Union[bool, Sequence[str]]) -> None:
+        """Loads the data of the selected fields, including their chunks, into the already loaded field instances."""
+        ids = [field.id for field in fields if with_fields is True or
+               (with_fields and field.field_name in with_fields)]
+        if not ids:
+            return
+
+        stmt = (
+            select(FieldModel)
+            .options(undefer(FieldModel._data), selectinload(FieldModel._chunks).undefer(FieldChunkModel._data))
+            .where(FieldModel.id.in_(ids))
+        )
+        session.execute(stmt).scalars().all()
 
     def get_structure_by_id(self, structure_id: int) -> Optional[StructureModel]:
         with self.Session() as session:
@@ -408,21 +634,420 @@ class DatabaseHandler:
             result = session.execute(stmt).scalar_one_or_none()
             return result or {}
 
-    def add_simulation(self, sim: Union[Simulation, SimulationPydanticModel], session=None):
+    def get_spectrum_block(self, category: str, quantity: str = "T",
+                           monitor_name: Optional[str] = None) -> Optional[SpectrumBlock]:
+        """
+        Returns the T or power spectra of a category resampled onto a wavelength grid shared by the category, as an
+        (Nruns, Nλ) block read with a single query. block.line_collection() draws them all as one artist, which is
+        far faster to overlay than a line per monitor.
+
+        Spectra are resampled when monitors are stored or copied in. Monitors stored before that, whose spectra the
+        background migration has not resampled yet, are left out.
+
+        Args:
+            category (str): The category to read.
+            quantity (str): "T" or "power".
+            monitor_name (str): Only read the monitors with this name.
+
+        Returns:
+            The block, or None if no monitor in the category recorded the quantity.
+        """
+        with self.engine.connect() as connection:
+            return spectrum_block(connection, category, quantity, monitor_name)
+
+    def get_derived_quantity(self, monitor_id: int, quantity: str) -> Optional[NDArray]:
+        """
+        Returns the precomputed array stored for the monitor under the given quantity name
+        (ie. '|E|^2', 'E limits' or 'P flux'), or None if it hasn't been stored.
+        """
+        with self.Session() as session:
+            stmt = select(DerivedQuantityModel.data).where(
+                DerivedQuantityModel.monitor_id == monitor_id,
+                DerivedQuantityModel.quantity == quantity
+            )
+            return session.execute(stmt).scalars().first()
+
+    @retry_on_busy
+    def add_derived_quantities(self, monitor_id: int) -> bool:
+        """
+        Computes and stores the derived quantities of an existing monitor from its raw fields,
+        replacing any that were stored before.
+
+        Args:
+            monitor_id (int): The ID of the monitor.
+
+        Returns:
+            bool: True if the quantities were stored, False if the monitor was not found.
+        """
+        with self.Session() as session:
+            mon = session.get(MonitorModel, monitor_id)
+            if not mon:
+                return False
+
+            fields = {f.field_name: FieldPydanticModel.from_model(f) for f in mon.fields}
+            derived = compute_derived_quantities(FieldAndPowerMonitorPydanticModel(
+                name=mon.name, parameters=mon.parameters, wavelengths=mon.wavelengths, x=mon.x, y=mon.y, z=mon.z,
+                T=None, power=None, E=fields.get("E"), H=fields.get("H"), P=fields.get("P")
+            ))
+
+            mon.derived.clear()
+            for quantity in derived:
+                mon.derived.append(DerivedQuantityModel(
+                    quantity=quantity.quantity,
+                    source_field=quantity.source_field,
+                    components=quantity.components,
+                    data=quantity.data
+                ))
+
+            session.commit()
+            return True
+
+    def add_simulation(self, sim: Union[Simulation, SimulationPydanticModel], session=None,
+                       store_derived: bool = False):
+        """
+        Adds a simulation with all of its structures and monitors to the database.
+
+        If store_derived is True, derived quantities (|E|^2, |H|^2, per-wavelength component limits and the
+        integrated Poynting flux) are computed from the raw fields and stored alongside them.
+        """
         if session:
-            manage_context = False
+            self._add_simulation_to_session(sim, session, store_derived)
         else:
-            session = self.Session()
-            manage_context = True
+            # Only a transaction of our own can be started over if the database is locked.
+            self._add_simulation_in_own_session(sim, store_derived)
 
-        if manage_context:
-            with session as s:
-                self._add_simulation_to_session(sim, s)
-        else:
-            self._add_simulation_to_session(sim, session)
+    @retry_on_busy
+    def _add_simulation_in_own_session(self, sim, store_derived: bool) -> None:
+        with self.Session() as session:
+            self._add_simulation_to_session(sim, session, store_derived)
 
-    @staticmethod
-    def _add_simulation_to_session(sim, session):
+    def add_simulations(self, simulations: Iterable[Union[Simulation, SimulationPydanticModel]],
+                        batch_size: int = 100, store_derived: bool = False) -> List[int]:
+        """
+        Adds many simulations, ie. when merging databases or importing archives, and returns their ids.
+
+        The simulations are consumed lazily, batch_size at a time, so a generator is never materialised in full.
+        Each batch is written in a single transaction with one executemany() statement per table, bypassing the
+        per-object overhead of the ORM. If a batch fails, the batches before it stay committed. A batch that finds
+        the database locked by another connection is retried on its own.
+        """
+        @retry_on_busy
+        def add_batch(batch) -> List[int]:
+            with self.engine.begin() as connection:
+                return insert_simulations(connection, batch, self.field_chunk_wavelengths, store_derived)
+
+        ids = []
+        iterator = iter(simulations)
+        while batch := list(islice(iterator, batch_size)):
+            ids.extend(add_batch(batch))
+        return ids
+
+    @retry_on_busy
+    def copy_simulations(self, selection: Sequence[Tuple["DatabaseHandler", Sequence[int]]], batch_size: int = 100,
+                         progress: Optional[Callable[[int], None]] = None,
+                         cancelled: Optional[Callable[[], bool]] = None,
+                         replace: bool = False) -> Optional[Dict[Tuple[Path, int], int]]:
+        """
+        Copies simulations from other databases into this one. The source files are attached to the connection and
+        the rows are copied with INSERT ... SELECT statements, so arrays are moved as stored without being loaded,
+        decoded or re-encoded. Arrays in the blob store of a source are copied to the blob store of this database.
+        Only the small T and power spectra are decoded, to resample them onto the grids of the categories here.
+
+        At most MAX_ATTACHED sources can be attached at once, and they can't be detached inside a transaction, so
+        the sources are copied from in groups of MAX_ATTACHED, each in a single transaction. If a group is cancelled
+        or fails, the simulations copied by the groups before it are deleted again, so the copy either completes or
+        leaves this database as it was.
+
+        Args:
+            selection: Pairs of a source handler and the ids of the simulations to copy from it.
+            batch_size (int): Number of simulations copied per statement.
+            progress (Callable[[int], None]): Called after each batch with the number of simulations copied so far.
+            cancelled (Callable[[], bool]): Checked before each batch. If it returns True, the copy is rolled back
+                and nothing is copied.
+            replace (bool): Replace simulations in this database that were copied from the same simulation before,
+                as identified by their uuid, instead of adding another copy. Replaced simulations can't be restored
+                once their group is committed, so at most MAX_ATTACHED sources can be copied from with replace.
+
+        Returns:
+            The new id of every copied simulation by the path of its source and its id there, or None if the copy
+            was cancelled. Ids missing from their source are left out.
+        """
+        if replace and len(selection) > MAX_ATTACHED:
+            raise ValueError(f"At most {MAX_ATTACHED} databases can be copied from with replace, got {len(selection)}.")
+        for source, _ in selection:
+            if source.path == self.path:
+                raise ValueError(f"Can't copy simulations from '{self.filename}' into itself.")
+
+        new_ids = {}
+        written_blobs = []
+        copied = 0
+
+        def onProgress(group_copied: int) -> None:
+            if progress is not None:
+                progress(copied + group_copied)
+
+        try:
+            for start in range(0, len(selection), MAX_ATTACHED):
+                group = selection[start:start + MAX_ATTACHED]
+                ids = self._copy_group(group, batch_size, onProgress, cancelled, replace, written_blobs)
+                if ids is None:
+                    break
+                new_ids.update(ids)
+                copied += sum(len(sim_ids) for _, sim_ids in group)
+            else:
+                return new_ids
+        except BaseException:
+            self._undo_copy(new_ids.values(), written_blobs)
+            raise
+
+        self._undo_copy(new_ids.values(), written_blobs)
+        return None
+
+    def _copy_group(self, group: Sequence[Tuple["DatabaseHandler", Sequence[int]]], batch_size: int,
+                    progress: Callable[[int], None], cancelled: Optional[Callable[[], bool]], replace: bool,
+                    written_blobs: List[str]) -> Optional[Dict[Tuple[Path, int], int]]:
+        """
+        Copies simulations from up to MAX_ATTACHED sources in a single transaction, see copy_simulations(). Digests
+        written to the blob store are appended to written_blobs. Returns None if the copy was cancelled.
+        """
+        new_ids = {}
+        copied = 0
+        was_cancelled = False
+        attached = 0
+        with self.engine.connect() as connection:
+            try:
+                # Databases can't be attached inside a transaction. The plain path is used, as not every SQLite build
+                # accepts URI filenames on a connection that was not opened with one. The sources are only read from.
+                for i, (source, _) in enumerate(group):
+                    connection.exec_driver_sql(f"ATTACH DATABASE ? AS source{i}", (str(source.path),))
+                    attached += 1
+                connection.commit()
+
+                with connection.begin() as transaction:
+                    # Take the write lock up front, so the id offsets computed for each batch stay valid.
+                    connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+                    for i, (source, sim_ids) in enumerate(group):
+                        tables = attached_tables(f"source{i}")
+                        sim_ids = list(sim_ids)
+                        for start in range(0, len(sim_ids), batch_size):
+                            if cancelled is not None and cancelled():
+                                was_cancelled = True
+                                break
+
+                            batch = sim_ids[start:start + batch_size]
+                            ids, digests = copy_simulations(connection, tables, batch, replace)
+                            new_ids.update({(source.path, old): new for old, new in ids.items()})
+                            for digest in digests:
+                                if not self.blob_store.path(digest).exists():
+                                    source.blob_store.copy_to(self.blob_store, digest)
+                                    written_blobs.append(digest)
+
+                            copied += len(batch)
+                            progress(copied)
+
+                        if was_cancelled:
+                            break
+
+                    if was_cancelled:
+                        transaction.rollback()
+            finally:
+                # Detach the sources that were attached, as the connection is returned to the pool.
+                for i in range(attached):
+                    connection.exec_driver_sql(f"DETACH DATABASE source{i}")
+                connection.commit()
+
+        return None if was_cancelled else new_ids
+
+    def _undo_copy(self, sim_ids: Iterable[int], written_blobs: Iterable[str]) -> None:
+        """Deletes the simulations committed by a copy that was cancelled or failed, and the arrays it wrote."""
+        sim_ids = list(sim_ids)
+        if sim_ids:
+            with self.Session() as session:
+                session.execute(delete(SimulationModel).where(SimulationModel.id.in_(sim_ids)))
+                session.commit()
+        self._remove_blobs(written_blobs)
+
+    @property
+    def uuid(self) -> str:
+        """Identity of the database, which merge watermarks are recorded under in the databases merged into."""
+        with self.Session() as session:
+            return session.execute(select(DatabaseStateModel.uuid)).scalar_one()
+
+    def get_merge_watermark(self, source: "DatabaseHandler") -> int:
+        """Returns the row version of the source up to which it has been merged into this database, or 0."""
+        with self.Session() as session:
+            stmt = select(MergeWatermarkModel.watermark).where(MergeWatermarkModel.source_uuid == source.uuid)
+            return session.execute(stmt).scalar_one_or_none() or 0
+
+    def merge_from(self, other: "DatabaseHandler", since: Optional[int] = None, batch_size: int = 100,
+                   progress: Optional[Callable[[int], None]] = None,
+                   cancelled: Optional[Callable[[], bool]] = None) -> Optional[Dict[Tuple[Path, int], int]]:
+        """
+        Copies the simulations added or changed in another database since it was last merged into this one, ie. to
+        consolidate the databases written by several machines. Simulations are changed when they, one of their
+        monitors or one of their structures are updated. Simulations merged before are replaced by their new
+        version. Deleting simulations in the other database does not delete them here.
+
+        Rows are stamped with the change counter of their database by triggers, and the counter of the other
+        database is recorded as the watermark to merge from next time once the merge has completed. A merge
+        interrupted before that is repeated in full by the next one.
+
+        Args:
+            other (DatabaseHandler): The database to merge from.
+            since (int): Merge the rows changed after this row version of the other database, instead of after the
+                recorded watermark. 0 merges everything.
+            batch_size, progress, cancelled: As for copy_simulations().
+
+        Returns:
+            The new id of every merged simulation by the path of the other database and its id there, or None if the
+            merge was cancelled.
+        """
+        with other.engine.connect() as connection:
+            source_uuid, watermark = connection.execute(
+                select(DatabaseStateModel.uuid, DatabaseStateModel.row_version)
+            ).one()
+            if since is None:
+                since = self.get_merge_watermark(other)
+
+            changed = union(
+                select(SimulationModel.id).where(SimulationModel.row_version > since),
+                select(MonitorModel.simulation_id).where(MonitorModel.row_version > since),
+                select(StructureModel.simulation_id).where(StructureModel.row_version > since),
+            )
+            sim_ids = sorted(sim_id for sim_id in connection.execute(changed).scalars() if sim_id is not None)
+
+        new_ids = self.copy_simulations([(other, sim_ids)], batch_size, progress, cancelled, replace=True)
+        if new_ids is None:
+            return None
+
+        self._record_merge_watermark(source_uuid, other.filename, watermark)
+        return new_ids
+
+    @retry_on_busy
+    def _record_merge_watermark(self, source_uuid: str, source_filename: str, watermark: int) -> None:
+        with self.Session() as session:
+            session.merge(MergeWatermarkModel(
+                source_uuid=source_uuid,
+                source_filename=source_filename,
+                watermark=watermark,
+                merged_at=datetime.now(timezone.utc).isoformat()
+            ))
+            session.commit()
+
+    def watch(self) -> DatabaseWatcher:
+        """
+        Returns a watcher reporting the changes other connections commit to the database from now on, ie. the
+        simulations a running sweep adds, so a view of the database can be updated rather than rebuilt.
+        """
+        return DatabaseWatcher(self)
+
+    def export_category(self, category: str, path: Union[str, Path], format: str = "npz",
+                        fields: Union[bool, Sequence[str]] = True,
+                        progress: Optional[Callable[[int, int], None]] = None) -> int:
+        """
+        Exports the simulations of a category to a portable file, to share results without the database. The
+        simulations are loaded and written one at a time, so the category never has to fit in memory.
+
+        Each simulation is a run, in order of id, and the file holds:
+            runs/id, runs/name, runs/uuid, runs/created_at:
+                One value per run.
+            parameters/<key>:
+                One value per run, as floats if every value of the parameter is a number and as strings otherwise.
+                Runs without the parameter get NaN or an empty string.
+            monitors/<monitor>/wavelengths, monitors/<monitor>/T, monitors/<monitor>/power:
+                (runs, Nλ) arrays padded with NaN, for the monitors that recorded spectra.
+            fields/<run>/<monitor>/<field>:
+                The (Nx, Ny, Nz, Nλ, Nc) field recorded in each run, ie. fields/0/monitor/E.
+        In npz and hdf5 files these are arrays or datasets with those names. Parquet files have a row per run and
+        a column per name, with spectra as lists. Fields are the list columns fields/<monitor>/<field>/real, /imag
+        and /shape, as Parquet has no complex type.
+
+        Args:
+            category (str): The category to export.
+            path (str | Path): The file to write. Overwritten if it exists.
+            format (str): "npz", "hdf5" (requires h5py) or "parquet" (requires pyarrow).
+            fields (bool | Sequence[str]): Fields to export, ie. ("E",), True for all, or False for none.
+            progress (Callable[[int, int], None]): Called after each simulation with the number exported so far and
+                the total.
+
+        Returns:
+            The number of simulations exported.
+        """
+        return export_category(self, category, path, format, fields, progress)
+
+    def _remove_blobs(self, digests: Iterable[str]) -> None:
+        """Removes arrays written to the blob store by a copy that was rolled back."""
+        for digest in digests:
+            try:
+                self.blob_store.path(digest).unlink()
+            except OSError:
+                pass
+
+    def get_index_data(self, monitor_id: int) -> Optional[Tuple[NDArray, NDArray, NDArray, str]]:
+        """
+        Returns the compact refractive index data of an index monitor as a tuple of
+        (wavelengths, palette, index_map, components), or None if the monitor has no index data.
+
+        The palette has shape (Npalette, Nλ, Nc) and holds the complex index n + ik of each unique material,
+        while the index map has shape (Nx, Ny, Nz) and holds the palette entry of each point. The arrays are
+        read-only views of the stored data. Use np.array() for writable copies.
+        """
+        with self.Session() as session:
+            stmt = select(
+                IndexMonitorModel.wavelengths_grid_id,
+                IndexMonitorModel.palette,
+                IndexMonitorModel.index_map,
+                IndexMonitorModel.index_components
+            ).where(IndexMonitorModel.id == monitor_id)
+
+            result = session.execute(stmt).first()
+            if result is None or result.palette is None:
+                return None
+
+            return self.grids.get(result.wavelengths_grid_id), result.palette, result.index_map, result.index_components
+
+    def read_field(self, field_id: int, wavelengths: AxisIndex = None, components: AxisIndex = None,
+                   x: AxisIndex = None, y: AxisIndex = None, z: AxisIndex = None) -> Optional[NDArray]:
+        """
+        Returns a hyperslab of a field, decoding only the chunks holding the requested wavelengths and components.
+        The 5D (Nx, Ny, Nz, Nλ, Nc) layout is kept, so reading a single wavelength returns an array with Nλ = 1.
+        """
+        with self.Session() as session:
+            field = session.get(FieldModel, field_id)
+            if field is None:
+                return None
+            return field.read(wavelengths, components, x, y, z)
+
+    def get_grid(self, grid_id: int) -> Optional[NDArray]:
+        """
+        Returns the shared coordinate or wavelength array with the given grid id. Monitors with equal grid ids
+        were recorded on identical axes, so comparing ids is enough to compare their axes.
+        """
+        return self.grids.get(grid_id)
+
+    def referenced_blobs(self) -> set[str]:
+        """Returns the digests of all arrays in the blob store that are referenced from the database."""
+        digests = set()
+        with self.Session() as session:
+            for table in Base.metadata.sorted_tables:
+                for column in table.columns:
+                    if not (isinstance(column.type, NumpyArrayType) and column.type.external):
+                        continue
+                    raw = type_coerce(column, LargeBinary)
+                    stmt = select(raw).where(func.substr(raw, 1, len(REFERENCE_HEADER)) == REFERENCE_HEADER)
+                    digests.update(read_reference(blob) for blob in session.execute(stmt).scalars())
+        return digests
+
+    def collect_blob_garbage(self) -> int:
+        """
+        Removes arrays from the blob store that are no longer referenced, ie. after simulations have been deleted.
+        Arrays written within the blob store's grace period are kept, so it's safe while other connections write.
+        Returns the number of files removed.
+        """
+        return self.blob_store.collect_garbage(self.referenced_blobs())
+
+    def _add_simulation_to_session(self, sim, session, store_derived: bool = False):
 
         # 1. Create SimulationModel
         sim_model = SimulationModel(
@@ -434,25 +1059,21 @@ class DatabaseHandler:
         session.add(sim_model)
         session.flush()  # get sim_model.id before adding children
 
-        # 2. Add structures
+        # 2. Add structures, sharing meshes with identical geometry
         for struct in sim.structures:
             if isinstance(struct, StructurePydanticModel):
-                structure_model = StructureModel(
-                    simulation_id=sim_model.id,
-                    name=struct.name,
-                    vertices=struct.vertices,
-                    faces=struct.faces
-                )
+                vertices, faces = struct.vertices, struct.faces
             else:
-                structure_model = StructureModel(
-                    simulation_id=sim_model.id,
-                    name=struct.name,
-                    vertices=struct.trimesh.vertices,
-                    faces=struct.trimesh.faces
-                )
+                vertices, faces = struct.trimesh.vertices, struct.trimesh.faces
+            structure_model = StructureModel(
+                simulation_id=sim_model.id,
+                name=struct.name,
+                mesh_id=get_or_create_mesh_id(session, vertices, faces)
+            )
             session.add(structure_model)
 
         # 3. Add monitors
+        spectra = []
         for mon in sim.monitors:
             if isinstance(mon, (FieldAndPowerMonitor, FieldAndPowerMonitorPydanticModel)):
                 mon_model = FieldAndPowerMonitorModel(
@@ -460,28 +1081,66 @@ class DatabaseHandler:
                     name=mon.name,
                     monitor_type=mon.monitor_type,
                     parameters=mon.parameters,
-                    wavelengths=mon.wavelengths,
-                    x=mon.x,
-                    y=mon.y,
-                    z=mon.z,
+                    wavelengths_grid_id=self.grids.get_or_create_id(session, mon.wavelengths),
+                    x_grid_id=self.grids.get_or_create_id(session, mon.x),
+                    y_grid_id=self.grids.get_or_create_id(session, mon.y),
+                    z_grid_id=self.grids.get_or_create_id(session, mon.z),
                     T=mon.T if mon.T is not None else None,
                     power=mon.power if mon.power is not None else None,
                 )
                 session.add(mon_model)
+                spectra.append((mon_model, mon))
 
                 # Add associated E, H, P fields if present
                 for field_obj in (mon.E, mon.H, mon.P):
                     if field_obj:
-                        field_model = FieldModel(
+                        field_model = FieldModel.from_array(
                             _monitor=mon_model,
                             field_name=field_obj.field_name,
                             components=field_obj.components,
-                            data=field_obj.data
+                            data=field_obj.data,
+                            chunk_wavelengths=self.field_chunk_wavelengths
                         )
                         session.add(field_model)
 
+                # Add derived quantities, either copied along with the monitor or computed from the fields.
+                derived = mon.derived if isinstance(mon, FieldAndPowerMonitorPydanticModel) else []
+                if store_derived and not derived:
+                    derived = compute_derived_quantities(mon)
+
+                for quantity in derived:
+                    session.add(DerivedQuantityModel(
+                        _monitor=mon_model,
+                        quantity=quantity.quantity,
+                        source_field=quantity.source_field,
+                        components=quantity.components,
+                        data=quantity.data
+                    ))
+
+            elif isinstance(mon, (IndexMonitor, IndexMonitorPydanticModel)):
+                mon_model = IndexMonitorModel(
+                    simulation_id=sim_model.id,
+                    name=mon.name,
+                    monitor_type=mon.monitor_type,
+                    parameters=mon.parameters,
+                    wavelengths_grid_id=self.grids.get_or_create_id(session, mon.wavelengths),
+                    x_grid_id=self.grids.get_or_create_id(session, mon.x),
+                    y_grid_id=self.grids.get_or_create_id(session, mon.y),
+                    z_grid_id=self.grids.get_or_create_id(session, mon.z),
+                    palette=mon.palette,
+                    index_map=mon.index_map,
+                    index_components=mon.components
+                )
+                session.add(mon_model)
+
             else:
                 raise ValueError(f"Unsupported monitor type: {type(mon)}")
 
+        # 4. Resample the spectra onto the wavelength grid of the category
+        session.flush()  # get the monitor ids
+        store_resampled_spectra(session.connection(), [
+            Spectra(mon_model.id, sim.category, mon.wavelengths, mon.T, mon.power) for mon_model, mon in spectra
+        ])
+
         session.commit()
 
@@ -0,0 +1,397 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Column, LargeBinary, and_, bindparam, delete, func, or_, select, type_coerce, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import ColumnElement
+
+from .codecs import (REFERENCE_HEADER, available_codecs, decode_array, encode_array, encode_reference, get_codec,
+                     read_reference)
+from .db import (Base, FieldChunkModel, FieldModel, GridModel, MeshModel, MonitorModel, NumpyArrayType,
+                 ResampledSpectrumModel, SimulationModel, StructureModel, DerivedQuantityModel)
+from .handler import DatabaseHandler
+
+# Called with the number of rows processed so far and the total number of rows.
+Progress = Callable[[int, int], None]
+
+# Precision each dtype is reduced to by downcast().
+DOWNCAST_DTYPES = {
+    np.dtype(np.complex128): np.dtype(np.complex64),
+    np.dtype(np.float64): np.dtype(np.float32),
+}
+
+# Array columns downcast by default. Coordinates, meshes and transmission data are small and keep their precision.
+DOWNCAST_COLUMNS = ("fields.data", "field_chunks.data", "derived_quantities.data")
+
+# Tables whose rows are looked up by a hash of their arrays, which changing the arrays would invalidate.
+CONTENT_ADDRESSED_TABLES = (GridModel.__tablename__, MeshModel.__tablename__)
+
+
+def array_columns(names: Optional[Iterable[str]] = None) -> List[Column]:
+    """
+    Returns the array columns of the database, or the ones given as 'table.column' names.
+
+    Raises:
+        ValueError: If a name is not an array column.
+    """
+    columns = {f"{table.name}.{column.name}": column
+               for table in Base.metadata.sorted_tables
+               for column in table.columns if isinstance(column.type, NumpyArrayType)}
+    if names is None:
+        return list(columns.values())
+
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise ValueError(f"Unknown array columns {unknown}. Array columns are {sorted(columns)}.")
+    return [columns[name] for name in names]
+
+
+def _is_reference(raw) -> ColumnElement[bool]:
+    return func.substr(raw, 1, len(REFERENCE_HEADER)) == REFERENCE_HEADER
+
+
+def _external_bytes(db: DatabaseHandler, blobs: Iterable[bytes]) -> int:
+    """Returns the size of the distinct blob store files referred to by the blobs."""
+    total = 0
+    for digest in {read_reference(blob) for blob in blobs}:
+        path = db.blob_store.path(digest)
+        total += path.stat().st_size if path.exists() else 0
+    return total
+
+
+# region Statistics
+def file_stats(db: DatabaseHandler) -> Dict[str, int]:
+    """Returns the size of the database file, its unused pages, and the size of its blob store."""
+    with db.engine.connect() as connection:
+        page_size = connection.exec_driver_sql("PRAGMA page_size").scalar()
+        page_count = connection.exec_driver_sql("PRAGMA page_count").scalar()
+        freelist_count = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+    blob_store = sum(db.blob_store.path(digest).stat().st_size for digest in db.blob_store.digests())
+    return {"file": page_size * page_count, "free": page_size * freelist_count, "blob_store": blob_store}
+
+
+def column_stats(db: DatabaseHandler) -> List[Tuple[str, int, int, int]]:
+    """
+    Returns the byte usage of every array column as (table.column, non-null rows, bytes stored in the database,
+    bytes of the blob store files referred to), sorted by total size.
+    """
+    stats = []
+    with db.engine.connect() as connection:
+        for column in array_columns():
+            raw = type_coerce(column, LargeBinary)
+            rows, stored = connection.execute(
+                select(func.count(raw), func.coalesce(func.sum(func.length(raw)), 0))
+            ).one()
+            external = 0
+            if column.type.external:
+                external = _external_bytes(db, connection.execute(select(raw).where(_is_reference(raw))).scalars())
+            stats.append((f"{column.table.name}.{column.name}", rows, stored, external))
+
+    return sorted(stats, key=lambda row: row[2] + row[3], reverse=True)
+
+
+def _sum_by_category(db: DatabaseHandler, connection: Connection, column: Column, joined,
+                     weight=None) -> Dict[str, int]:
+    """
+    Sums the bytes of an array column by simulation category. The joined selectable must join the table of the
+    column to the simulations table. Shared rows are split between their users by dividing by the weight.
+    """
+    raw = type_coerce(column, LargeBinary)
+    size = func.length(raw) if weight is None else func.length(raw) * 1.0 / weight
+    stmt = select(SimulationModel.category, func.coalesce(func.sum(size), 0)).select_from(joined)
+    sums = defaultdict(int)
+    for category, total in connection.execute(stmt.group_by(SimulationModel.category)):
+        sums[category] += int(total)
+
+    if column.type.external:
+        references = defaultdict(list)
+        stmt = select(SimulationModel.category, raw).select_from(joined).where(_is_reference(raw))
+        for category, blob in connection.execute(stmt):
+            references[category].append(blob)
+        for category, blobs in references.items():
+            sums[category] += _external_bytes(db, blobs)
+
+    return sums
+
+
+def category_stats(db: DatabaseHandler) -> Dict[str, Dict[str, int]]:
+    """
+    Returns the bytes used by each category, split into fields, derived quantities, monitor data (transmission,
+    power and index data), resampled spectra, structures and coordinates. Meshes and coordinate grids shared by
+    several structures or monitors are split evenly between them.
+    """
+    fields, chunks, monitors = FieldModel.__table__, FieldChunkModel.__table__, MonitorModel.__table__
+    simulations, structures = SimulationModel.__table__, StructureModel.__table__
+    derived, meshes = DerivedQuantityModel.__table__, MeshModel.__table__
+    resampled = ResampledSpectrumModel.__table__
+
+    to_simulations = monitors.join(simulations, simulations.c.id == monitors.c.simulation_id)
+    groups = {
+        "fields": [
+            (fields.c.data, fields.join(to_simulations, monitors.c.id == fields.c.monitor_id), None),
+            (chunks.c.data, chunks.join(fields, fields.c.id == chunks.c.field_id)
+             .join(to_simulations, monitors.c.id == fields.c.monitor_id), None),
+        ],
+        "derived": [
+            (derived.c.data, derived.join(to_simulations, monitors.c.id == derived.c.monitor_id), None),
+        ],
+        "monitor data": [
+            (monitors.c[name], to_simulations, None) for name in ("T", "power", "palette", "index_map")
+        ],
+        "resampled": [
+            (resampled.c[name], resampled.join(to_simulations, monitors.c.id == resampled.c.monitor_id), None)
+            for name in ("T", "power")
+        ],
+        "structures": [
+            (structures.c[name], structures.join(simulations, simulations.c.id == structures.c.simulation_id), None)
+            for name in ("vertices", "faces")
+        ] + [
+            (meshes.c[name], meshes.join(structures, structures.c.mesh_id == meshes.c.id)
+             .join(simulations, simulations.c.id == structures.c.simulation_id), meshes.c.ref_count)
+            for name in ("vertices", "faces")
+        ],
+        "coordinates": [
+            (monitors.c[name], to_simulations, None) for name in ("wavelengths", "x", "y", "z")
+        ],
+    }
+
+    stats: Dict[str, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(groups, 0))
+    with db.engine.connect() as connection:
+        for group, sources in groups.items():
+            for column, joined, weight in sources:
+                for category, total in _sum_by_category(db, connection, column, joined, weight).items():
+                    stats[category][group] += total
+
+        # Grids are referenced from four columns of the monitors and from the resampled spectra, so they are split
+        # in Python.
+        grid_sizes = dict(connection.execute(
+            select(GridModel.id, func.length(type_coerce(GridModel.__table__.c["values"], LargeBinary)))
+        ).all())
+        uses = defaultdict(list)
+        grid_columns = [monitors.c[f"{axis}_grid_id"] for axis in ("wavelengths", "x", "y", "z")]
+        grid_uses = connection.execute(
+            select(SimulationModel.category, *grid_columns).select_from(to_simulations)
+        ).all() + connection.execute(
+            select(SimulationModel.category, resampled.c.grid_id)
+            .select_from(resampled.join(to_simulations, monitors.c.id == resampled.c.monitor_id))
+        ).all()
+        for category, *grid_ids in grid_uses:
+            for grid_id in grid_ids:
+                if grid_id is not None:
+                    uses[grid_id].append(category)
+        for grid_id, categories in uses.items():
+            for category in categories:
+                stats[category]["coordinates"] += grid_sizes.get(grid_id, 0) // len(categories)
+
+    return dict(sorted(stats.items()))
+# endregion
+
+
+# region Rewriting arrays
+def _column_progress(progress: Optional[Callable[[str, int, int], None]], name: str) -> Optional[Progress]:
+    if progress is None:
+        return None
+    return lambda done, total: progress(name, done, total)
+
+
+def _rewrite_column(db: DatabaseHandler, column: Column, rewrite: Callable[[bytes], Optional[bytes]],
+                    batch_size: int = 200, progress: Optional[Progress] = None) -> int:
+    """
+    Passes every blob of a column through rewrite(), storing the blobs it returns in place of the old ones. Rows
+    are processed in order of their primary key, each batch in its own transaction, so an interrupted run keeps the
+    work done. Returns the number of rows changed.
+    """
+    table = column.table
+    key, = table.primary_key.columns  # Not always named id, ie. resampled spectra are keyed by their monitor
+    raw = type_coerce(column, LargeBinary)
+    stmt = (
+        update(table)
+        .where(key == bindparam("_id"))
+        .values({column.name: bindparam("_blob", type_=LargeBinary)})
+    )
+
+    with db.engine.connect() as connection:
+        total = connection.execute(select(func.count(raw))).scalar()
+
+    done = changed = 0
+    last_id = 0
+    while True:
+        with db.engine.begin() as connection:
+            rows = connection.execute(
+                select(key, raw).where(key > last_id, raw.is_not(None))
+                .order_by(key).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            updates = []
+            for row_id, blob in rows:
+                new_blob = rewrite(blob)
+                if new_blob is not None and new_blob != blob:
+                    updates.append({"_id": row_id, "_blob": new_blob})
+            if updates:
+                connection.execute(stmt, updates)
+
+        changed += len(updates)
+        done += len(rows)
+        last_id = rows[-1][0]
+        if progress is not None:
+            progress(done, total)
+
+    return changed
+
+
+def recompress(db: DatabaseHandler, codec: str, level: Optional[int] = None, columns: Optional[Sequence[str]] = None,
+               progress: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, int]:
+    """
+    Re-encodes the arrays stored in the database with another codec, ie. to trade write speed for size once a
+    database is no longer written to. Arrays in the blob store are left as they are. Arrays written later still
+    use the codec of their column.
+
+    Args:
+        db (DatabaseHandler): The database.
+        codec (str): Name of the codec, see codecs.available_codecs().
+        level (int): Compression level. Uses the codec's default if None.
+        columns (Sequence[str]): The 'table.column' names of the columns to recompress. All array columns if None.
+        progress (Callable[[str, int, int], None]): Called with the column name, the rows processed and the total.
+
+    Returns:
+        Dict[str, int]: The number of rows changed in each column.
+    """
+    if codec not in available_codecs():
+        get_codec(codec)  # Unknown codecs raise with the list of codecs
+        raise ValueError(f"The '{codec}' codec requires an optional package that is not installed.")
+
+    results = {}
+    for column in array_columns(columns):
+        name = f"{column.table.name}.{column.name}"
+
+        def rewrite(blob: bytes) -> Optional[bytes]:
+            if read_reference(blob) is not None:
+                return None
+            array = decode_array(blob)
+            return encode_array(array, codec if array.nbytes >= column.type.min_size else "none", level)
+
+        results[name] = _rewrite_column(db, column, rewrite, progress=_column_progress(progress, name))
+    return results
+
+
+def downcast(db: DatabaseHandler, columns: Sequence[str] = DOWNCAST_COLUMNS,
+             progress: Optional[Callable[[str, int, int], None]] = None) -> Dict[str, int]:
+    """
+    Reduces the precision of stored arrays in place, complex128 to complex64 and float64 to float32, halving their
+    size. Arrays in the blob store are written to it again with the new precision, and the old files are removed
+    once no longer referenced.
+
+    Args:
+        db (DatabaseHandler): The database.
+        columns (Sequence[str]): The 'table.column' names of the columns to downcast. Columns of content addressed
+            tables (grids and meshes) can't be downcast, as their digests would no longer match their contents.
+        progress (Callable[[str, int, int], None]): Called with the column name, the rows processed and the total.
+
+    Returns:
+        Dict[str, int]: The number of rows changed in each column.
+    """
+    selected = array_columns(columns)
+    for column in selected:
+        if column.table.name in CONTENT_ADDRESSED_TABLES:
+            raise ValueError(f"Arrays of the content addressed '{column.table.name}' table can't be downcast.")
+
+    results = {}
+    for column in selected:
+        name = f"{column.table.name}.{column.name}"
+
+        def rewrite(blob: bytes) -> Optional[bytes]:
+            digest = read_reference(blob)
+            array = db.blob_store.load(digest) if digest is not None else decode_array(blob)
+            dtype = DOWNCAST_DTYPES.get(array.dtype.newbyteorder("="))
+            if dtype is None:
+                return None
+
+            array = array.astype(dtype)
+            if digest is not None:
+                return encode_reference(array, db.blob_store.put(array))
+            return encode_array(array, column.type.codec if array.nbytes >= column.type.min_size else "none",
+                                column.type.level)
+
+        results[name] = _rewrite_column(db, column, rewrite, progress=_column_progress(progress, name))
+
+    db.collect_blob_garbage()
+    return results
+# endregion
+
+
+def prune_fields(db: DatabaseHandler, field_names: Sequence[str], older_than: Optional[timedelta] = None,
+                 category: Optional[str] = None, dry_run: bool = False) -> int:
+    """
+    Deletes the stored fields with the given names, ie. all H fields, along with their chunks and the quantities
+    derived from them. Arrays no longer referenced are removed from the blob store. The monitors of the deleted
+    fields count as changed, so merging this database into another one prunes them there as well.
+
+    Args:
+        db (DatabaseHandler): The database.
+        field_names (Sequence[str]): Names of the fields to delete, out of "E", "H" and "P".
+        older_than (timedelta): Only delete fields of simulations stored longer ago than this. Simulations stored
+            before storage times were recorded have none, and count as older than any age.
+        category (str): Only delete fields of simulations in this category.
+        dry_run (bool): Only count the fields that would be deleted.
+
+    Returns:
+        int: The number of fields deleted, or that would be deleted in a dry run.
+    """
+    simulations = select(SimulationModel.id)
+    if category is not None:
+        simulations = simulations.where(SimulationModel.category == category)
+    if older_than is not None:
+        cutoff = (datetime.now(timezone.utc) - older_than).isoformat()
+        simulations = simulations.where(or_(SimulationModel.created_at.is_(None),
+                                            SimulationModel.created_at < cutoff))
+
+    monitors = select(MonitorModel.id).where(MonitorModel.simulation_id.in_(simulations))
+    condition = and_(FieldModel.field_name.in_(field_names), FieldModel.monitor_id.in_(monitors))
+
+    with db.engine.begin() as connection:
+        if dry_run:
+            return connection.execute(select(func.count(FieldModel.id)).where(condition)).scalar()
+
+        # Touching the monitors has the triggers stamp them with a new row version, for merge_from() to pick up.
+        connection.execute(
+            update(MonitorModel)
+            .where(MonitorModel.id.in_(select(FieldModel.monitor_id).where(condition)))
+            .values(name=MonitorModel.name)
+        )
+        connection.execute(delete(DerivedQuantityModel).where(DerivedQuantityModel.source_field.in_(field_names),
+                                                              DerivedQuantityModel.monitor_id.in_(monitors)))
+        deleted = connection.execute(delete(FieldModel).where(condition)).rowcount
+
+    db.collect_blob_garbage()
+    return deleted
+
+
+def vacuum(db: DatabaseHandler, analyze: bool = True, progress: Optional[Callable[[], None]] = None) -> None:
+    """
+    Rebuilds the database file without unused pages, ie. after pruning or downcasting, and refreshes the
+    statistics of the query planner. VACUUM needs free disk space of up to twice the size of the file.
+
+    Args:
+        db (DatabaseHandler): The database.
+        analyze (bool): Run ANALYZE after VACUUM.
+        progress (Callable[[], None]): Called periodically while SQLite works, as VACUUM can take a long time on
+            large files and does not report how far along it is.
+    """
+    with db.engine.connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+        if progress is not None:
+            dbapi_connection.set_progress_handler(lambda: progress() or 0, 1_000_000)
+        try:
+            connection.exec_driver_sql("VACUUM")
+            if analyze:
+                connection.exec_driver_sql("ANALYZE")
+            connection.commit()
+        finally:
+            dbapi_connection.set_progress_handler(None, 0)
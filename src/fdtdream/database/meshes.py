@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import hashlib
+
+import numpy as np
+from numpy.typing import NDArray
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import MeshModel
+
+
+def hash_mesh(vertices: NDArray, faces: NDArray) -> str:
+    """Returns a content hash of a mesh, including the dtype and shape of both arrays."""
+    digest = hashlib.sha256()
+    for array in (vertices, faces):
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def get_or_create_mesh_id(session: Session, vertices: NDArray, faces: NDArray) -> int:
+    """
+    Returns the id of the mesh matching the vertices and faces, inserting it through the session if it's not
+    stored yet. Reference counts are maintained by the database when structures point to the mesh.
+    """
+    vertices, faces = np.ascontiguousarray(vertices), np.ascontiguousarray(faces)
+    digest = hash_mesh(vertices, faces)
+
+    mesh_id = session.execute(select(MeshModel.id).where(MeshModel.digest == digest)).scalar_one_or_none()
+    if mesh_id is None:
+        mesh = MeshModel(digest=digest, vertices=vertices, faces=faces, ref_count=0)
+        session.add(mesh)
+        session.flush()
+        mesh_id = mesh.id
+
+    return mesh_id
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+
+import numpy as np
+from sqlalchemy import delete, func, insert, inspect, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .db import (Base, DatabaseStateModel, DerivedQuantityModel, FieldChunkModel, FieldModel, MonitorModel,
+                 ParameterModel, SchemaVersionModel, SimulationModel, StructureModel, add_missing_columns,
+                 parameter_rows)
+from .derived import component_limits
+from .meshes import get_or_create_mesh_id
+from .retry import retry_on_busy
+from .spectra import store_resampled_spectra, unresampled_spectra
+
+
+class Migration:
+    """
+    A numbered change to the schema of existing database files, applied once and in order.
+
+    The apply function makes the change in a single transaction. Changes that rewrite many rows are made by the
+    step function instead, which is called repeatedly with a cursor, each call in its own transaction. It processes
+    the next batch of rows after the cursor and returns the new cursor, or None when no rows are left. The cursor is
+    stored with the version, so an interrupted migration resumes from the last committed batch.
+
+    Background migrations only fill tables derived from data already stored, which nothing else depends on. Their
+    steps run in a background thread of the DatabaseHandler, so opening a large file is not held up by them, and
+    the database stays readable between batches.
+    """
+
+    version: int
+    description: str
+    background: bool
+
+    def __init__(self, version: int, description: str, apply: Optional[Callable[[Connection], None]] = None,
+                 step: Optional[Callable[[Connection, int], Optional[int]]] = None, background: bool = False) -> None:
+        if background and step is None:
+            raise ValueError("Background migrations need a step function.")
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.step = step
+        self.background = background
+
+
+def _create_indexes(connection: Connection) -> None:
+    """Creates the indexes declared on the models that are missing from the file."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def _clear_parameter_table(connection: Connection) -> None:
+    connection.execute(delete(ParameterModel))
+
+
+def _fill_parameter_table(connection: Connection, cursor: int) -> Optional[int]:
+    """Fills the parameters table from the parameters JSON column of simulations stored before it existed."""
+    batch = connection.execute(
+        select(SimulationModel.id, SimulationModel.parameters)
+        .where(SimulationModel.id > cursor).order_by(SimulationModel.id).limit(1000)
+    ).all()
+    if not batch:
+        return None
+
+    rows = [{"simulation_id": sim_id, "key": key, "numeric_value": numeric_value, "text_value": text_value}
+            for sim_id, parameters in batch for key, numeric_value, text_value in parameter_rows(parameters)]
+    if rows:
+        connection.execute(insert(ParameterModel), rows)
+    return batch[-1].id
+
+
+# Keep meshes.ref_count equal to the number of structures using each mesh, and delete meshes no longer used.
+# Triggers also fire for structures removed by ON DELETE CASCADE, which the ORM never sees.
+MESH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS structures_mesh_insert AFTER INSERT ON structures WHEN NEW.mesh_id IS NOT NULL
+    BEGIN
+        UPDATE meshes SET ref_count = ref_count + 1 WHERE id = NEW.mesh_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS structures_mesh_delete AFTER DELETE ON structures WHEN OLD.mesh_id IS NOT NULL
+    BEGIN
+        UPDATE meshes SET ref_count = ref_count - 1 WHERE id = OLD.mesh_id;
+        DELETE FROM meshes WHERE id = OLD.mesh_id AND ref_count <= 0;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS structures_mesh_update AFTER UPDATE OF mesh_id ON structures
+    WHEN OLD.mesh_id IS NOT NEW.mesh_id
+    BEGIN
+        UPDATE meshes SET ref_count = ref_count + 1 WHERE id = NEW.mesh_id;
+        UPDATE meshes SET ref_count = ref_count - 1 WHERE id = OLD.mesh_id;
+        DELETE FROM meshes WHERE id = OLD.mesh_id AND ref_count <= 0;
+    END
+    """,
+]
+
+
+def _create_mesh_triggers(connection: Connection) -> None:
+    for trigger in MESH_TRIGGERS:
+        connection.exec_driver_sql(trigger)
+
+
+def _deduplicate_meshes(connection: Connection, cursor: int) -> Optional[int]:
+    """Moves the inline geometry of structures stored before meshes were deduplicated into the meshes table."""
+    structures = StructureModel.__table__
+    with Session(bind=connection) as session:
+        batch = session.execute(
+            select(structures.c.id, structures.c.vertices, structures.c.faces)
+            .where(structures.c.id > cursor, structures.c.mesh_id.is_(None), structures.c.vertices.is_not(None))
+            .order_by(structures.c.id).limit(500)
+        ).all()
+        if not batch:
+            return None
+
+        for structure_id, vertices, faces in batch:
+            session.execute(
+                update(structures).where(structures.c.id == structure_id)
+                .values(mesh_id=get_or_create_mesh_id(session, vertices, faces), vertices=None, faces=None)
+            )
+        session.flush()
+
+    return batch[-1].id
+
+
+# Tables whose rows carry a uuid and a row version, so merges can find the rows added or changed since the last one.
+VERSIONED_TABLES = ("simulations", "monitors", "structures")
+
+# Every insert or update of a versioned row increments the change counter of the database and stamps the row with
+# it. Inserted rows get a random uuid unless they were copied with one.
+ROW_VERSION_TRIGGERS = [
+    trigger
+    for table in VERSIONED_TABLES
+    for trigger in (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_row_version_insert AFTER INSERT ON {table}
+        BEGIN
+            UPDATE database_state SET row_version = row_version + 1;
+            UPDATE {table}
+            SET uuid = coalesce(NEW.uuid, lower(hex(randomblob(16)))),
+                row_version = (SELECT row_version FROM database_state)
+            WHERE id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {table}_row_version_update AFTER UPDATE ON {table}
+        WHEN NEW.row_version IS OLD.row_version
+        BEGIN
+            UPDATE database_state SET row_version = row_version + 1;
+            UPDATE {table} SET row_version = (SELECT row_version FROM database_state) WHERE id = NEW.id;
+        END
+        """,
+    )
+]
+
+
+def _track_row_versions(connection: Connection) -> None:
+    """
+    Gives the database an identity and a change counter, stamps existing rows of the versioned tables with a uuid
+    and the first row version, and creates the triggers stamping rows from then on.
+    """
+    if connection.execute(select(DatabaseStateModel.id)).first() is None:
+        connection.execute(insert(DatabaseStateModel).values(id=1, uuid=uuid.uuid4().hex, row_version=1))
+
+    for table in VERSIONED_TABLES:
+        connection.exec_driver_sql(
+            f"UPDATE {table} SET uuid = coalesce(uuid, lower(hex(randomblob(16)))), row_version = 1 "
+            f"WHERE uuid IS NULL OR row_version IS NULL"
+        )
+    for trigger in ROW_VERSION_TRIGGERS:
+        connection.exec_driver_sql(trigger)
+    _create_indexes(connection)
+
+
+def _field_limits(session: Session, field: FieldModel) -> np.ndarray:
+    """Returns the component limits of a field, computed one chunk at a time for chunked fields."""
+    if field.chunk_wavelengths is None:
+        return component_limits(field.data)
+
+    shape = field.shape
+    limits = np.empty((shape[3], shape[4], 3, 2), dtype=np.float32)
+    chunks = session.execute(
+        select(FieldChunkModel.wavelength_start, FieldChunkModel.component, FieldChunkModel.data)
+        .where(FieldChunkModel.field_id == field.id),
+        execution_options={"yield_per": 8}
+    )
+    for start, component, chunk in chunks:
+        limits[start:start + chunk.shape[3], component] = component_limits(chunk[..., np.newaxis])[:, 0]
+    return limits
+
+
+def _store_field_limits(connection: Connection, cursor: int) -> Optional[int]:
+    """Stores the per-wavelength component limits of fields stored without them, which viewers use for colour scales."""
+    batch = connection.execute(
+        select(FieldModel.id).where(FieldModel.id > cursor).order_by(FieldModel.id).limit(10)
+    ).scalars().all()
+    if not batch:
+        return None
+
+    has_limits = select(DerivedQuantityModel.id).where(
+        DerivedQuantityModel.monitor_id == FieldModel.monitor_id,
+        DerivedQuantityModel.quantity == FieldModel.field_name + " limits"
+    ).exists()
+    with Session(bind=connection) as session:
+        for field in session.execute(select(FieldModel).where(FieldModel.id.in_(batch), ~has_limits)).scalars():
+            session.add(DerivedQuantityModel(
+                monitor_id=field.monitor_id,
+                quantity=f"{field.field_name} limits",
+                source_field=field.field_name,
+                components=field.components,
+                data=_field_limits(session, field)
+            ))
+        session.flush()
+
+    return batch[-1]
+
+
+def _resample_spectra(connection: Connection, cursor: int) -> Optional[int]:
+    """Resamples the spectra of monitors stored before resampled spectra were onto the grids of their categories."""
+    spectra = unresampled_spectra(connection, MonitorModel.id > cursor, limit=500)
+    if not spectra:
+        return None
+
+    store_resampled_spectra(connection, spectra)
+    return spectra[-1].monitor_id
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "Index the columns used to populate the database tree and look up children", _create_indexes),
+    Migration(2, "Fill the searchable parameters table from the simulation parameters",
+              _clear_parameter_table, _fill_parameter_table),
+    Migration(3, "Deduplicate structure meshes into a reference counted meshes table",
+              _create_mesh_triggers, _deduplicate_meshes),
+    Migration(4, "Track uuids and row versions of simulations, monitors and structures", _track_row_versions),
+    Migration(5, "Store the component limits of fields stored without them",
+              step=_store_field_limits, background=True),
+    Migration(6, "Resample the spectra of monitors onto a shared wavelength grid per category",
+              step=_resample_spectra, background=True),
+]
+
+
+def completed_versions(connection: Connection) -> List[int]:
+    """Returns the versions of the migrations completed on the database."""
+    stmt = select(SchemaVersionModel.version).where(SchemaVersionModel.cursor.is_(None))
+    return list(connection.execute(stmt.order_by(SchemaVersionModel.version)).scalars())
+
+
+def current_version(connection: Connection) -> int:
+    """Returns the version of the last migration applied to the database, or 0 if none are."""
+    return connection.execute(select(func.max(SchemaVersionModel.version))).scalar() or 0
+
+
+def _run_migration(engine: Engine, migration: Migration, steps: bool = True,
+                   stop: Optional[threading.Event] = None) -> bool:
+    """
+    Applies a migration, or resumes it from its stored cursor, and returns True once it has completed. Steps are
+    skipped if steps is False, and stop between batches once the stop event is set.
+    """
+    with engine.begin() as connection:
+        cursor = connection.execute(
+            select(SchemaVersionModel.cursor).where(SchemaVersionModel.version == migration.version)
+        ).first()
+        if cursor is None:
+            if migration.apply is not None:
+                migration.apply(connection)
+            connection.execute(insert(SchemaVersionModel).values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.now(timezone.utc).isoformat(),
+                cursor=0 if migration.step is not None else None
+            ))
+            cursor = 0 if migration.step is not None else None
+        else:
+            cursor = cursor[0]
+
+    while cursor is not None:
+        if not steps or (stop is not None and stop.is_set()):
+            return False
+        cursor = _run_step(engine, migration, cursor)
+
+    return True
+
+
+@retry_on_busy
+def _run_step(engine: Engine, migration: Migration, cursor: int) -> Optional[int]:
+    """Runs the next batch of a migration and stores the cursor after it, in one transaction."""
+    with engine.begin() as connection:
+        cursor = migration.step(connection, cursor)
+        connection.execute(
+            update(SchemaVersionModel).where(SchemaVersionModel.version == migration.version).values(cursor=cursor)
+        )
+    return cursor
+
+
+def migrate(engine: Engine) -> List[int]:
+    """
+    Brings the schema of a database file up to date with the models. Columns added to the models are added to
+    their tables, and pending migrations are applied in order. Each migration, or each batch of a batched one,
+    is applied in its own transaction, so an interrupted upgrade resumes where it stopped.
+
+    The steps of background migrations are left to run_background_migrations().
+
+    Returns the versions of the migrations completed.
+    """
+    Base.metadata.create_all(engine)
+    add_missing_columns(engine)
+
+    with engine.connect() as connection:
+        completed = set(completed_versions(connection))
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version in completed:
+            continue
+        if _run_migration(engine, migration, steps=not migration.background):
+            applied.append(migration.version)
+
+    return applied
+
+
+def is_up_to_date(engine: Engine) -> bool:
+    """
+    Returns True if the file has every table and column of the models and all migrations other than background
+    ones have completed, so it can be opened read-only. Background migrations only fill derived tables.
+    """
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            return False
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        if any(column.name not in existing for column in table.columns):
+            return False
+
+    with engine.connect() as connection:
+        completed = set(completed_versions(connection))
+    return all(migration.version in completed for migration in MIGRATIONS if not migration.background)
+
+
+def pending_background_migrations(engine: Engine) -> List[Migration]:
+    """Returns the background migrations whose steps have not completed."""
+    with engine.connect() as connection:
+        completed = set(completed_versions(connection))
+    return [migration for migration in MIGRATIONS if migration.background and migration.version not in completed]
+
+
+def run_background_migrations(engine: Engine, stop: Optional[threading.Event] = None) -> bool:
+    """
+    Runs the steps of pending background migrations, committing after every batch, until they complete or the stop
+    event is set. Returns True if all completed.
+    """
+    for migration in pending_background_migrations(engine):
+        if not _run_migration(engine, migration, stop=stop):
+            return False
+    return True
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import hashlib
+from typing import List, Optional, Sequence, Tuple
+
+import matplotlib.patches as mpatches
+import matplotlib.path as mpath
+import numpy as np
+import shapely
+from matplotlib.patches import PathPatch
+from numpy.typing import NDArray
+
+# Key of the cached projection of a mesh onto a plane, which doesn't depend on any coordinates.
+PROJECTION = ""
+
+# Faces seen so close to edge-on that their projection is thinner than this are left out of projections.
+MIN_FACE_CLEARANCE = 1e-4
+
+
+def coordinates_digest(coordinates: NDArray) -> str:
+    """Returns a content hash of the coordinates a mesh is intersected at."""
+    coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+    return hashlib.sha1(memoryview(coordinates).cast("B")).hexdigest()
+
+
+def encode_patches(patches: Sequence[Optional[PathPatch]]) -> Tuple[NDArray, NDArray, NDArray]:
+    """
+    Packs the paths of a list of patches into three arrays: the (N, 2) vertices and the N path codes of all patches
+    concatenated, and the number of vertices of each patch. Missing patches are stored with zero vertices.
+    """
+    paths = [patch.get_path() if patch is not None else None for patch in patches]
+    counts = np.array([len(path.vertices) if path is not None else 0 for path in paths], dtype=np.int64)
+    present = [path for path in paths if path is not None]
+    if not present:
+        return np.empty((0, 2)), np.empty(0, dtype=np.uint8), counts
+
+    vertices = np.concatenate([path.vertices for path in present]).astype(np.float64, copy=False)
+    codes = np.concatenate([
+        path.codes if path.codes is not None else np.full(len(path.vertices), mpath.Path.LINETO, dtype=np.uint8)
+        for path in present
+    ]).astype(np.uint8, copy=False)
+    return vertices, codes, counts
+
+
+def decode_patches(vertices: NDArray, codes: NDArray, counts: NDArray) -> List[Optional[PathPatch]]:
+    """Rebuilds the patches packed by encode_patches(), as new artists that can be added to any axes."""
+    patches = []
+    ends = np.cumsum(counts)
+    for end, count in zip(ends, counts):
+        if count == 0:
+            patches.append(None)
+        else:
+            patches.append(mpatches.PathPatch(mpath.Path(vertices[end - count:end], codes[end - count:end])))
+    return patches
+
+
+def projected_faces(vertices: NDArray, faces: NDArray, indices: Sequence[int]) -> NDArray:
+    """
+    Projects the faces of a mesh onto the plane of two of its axes, and returns the projected faces that are wider
+    than MIN_FACE_CLEARANCE as an array of polygons.
+    """
+    triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(faces)][:, :, list(indices)]
+    edges = np.roll(triangles, -1, axis=1) - triangles
+    doubled_area = np.abs(edges[:, 0, 0] * edges[:, 1, 1] - edges[:, 0, 1] * edges[:, 1, 0])
+    longest_edge = np.linalg.norm(edges, axis=2).max(axis=1, initial=0)
+
+    # The minimum clearance of a triangle is its smallest height, which is the one onto its longest edge.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        wide = doubled_area / longest_edge > MIN_FACE_CLEARANCE
+    return shapely.polygons(triangles[wide])
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import ctypes
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Dict, Union
+
+# SQLite settings applied to every connection opened by a DatabaseHandler, by profile name.
+#
+#   safe:              Rollback journal with full syncs, as SQLite does by default. Works on network drives.
+#   bulk-write:        WAL journal with syncs only at checkpoints and a large page cache, for writing many
+#                      simulations at once. A power loss can drop the last transactions, but never corrupts the file.
+#   interactive-read:  WAL journal, so the GUI can read while a simulation is being written, with memory mapped
+#                      reads for quick access to large blobs.
+#
+# Negative cache sizes are in KiB. page_size only has an effect when a new database file is created. The journal
+# mode is a property of the file rather than of the connection, and it can only be changed while no other
+# connection has the file open. If one does, ie. FDTDiscover viewing a sweep in WAL mode while the simulation script
+# writes to it with the safe profile, the file keeps its current mode. busy_timeout is how many milliseconds a
+# connection waits for a lock held by another connection before failing with SQLITE_BUSY.
+PROFILES: Dict[str, Dict[str, Union[int, str]]] = {
+    "safe": {
+        "page_size": 4096,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "bulk-write": {
+        "page_size": 16384,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -262144,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    "interactive-read": {
+        "page_size": 16384,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -65536,
+        "mmap_size": 1 << 30,
+        "temp_store": "MEMORY",
+        "busy_timeout": 2000,
+    },
+}
+
+
+def get_profile(name: str) -> Dict[str, Union[int, str]]:
+    if name not in PROFILES:
+        raise ValueError(f"Unknown SQLite profile '{name}'. Available profiles are {list(PROFILES)}.")
+    return PROFILES[name]
+
+
+# Filesystem types of network drives on Linux, as listed in /proc/mounts.
+NETWORK_FILESYSTEMS = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "afs", "9p", "ncpfs", "fuse.sshfs", "davfs")
+# Drive type of network drives returned by GetDriveTypeW on Windows.
+DRIVE_REMOTE = 4
+
+
+def is_network_path(path: Union[str, Path]) -> bool:
+    """
+    Returns True if the path is on a network drive, where WAL can't be used as its shared memory index only works
+    between processes on the same machine. Returns False if that can't be determined on the platform.
+    """
+    path = Path(os.path.abspath(path))
+    if sys.platform == "win32":
+        drive = path.drive
+        if drive.startswith("\\\\"):  # UNC path, ie. \\server\share
+            return True
+        return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == DRIVE_REMOTE
+
+    try:
+        with open("/proc/mounts") as mounts:
+            entries = [line.split()[1:3] for line in mounts]
+    except OSError:
+        return False
+
+    # The filesystem of the path is the one mounted at the longest mount point containing it.
+    mount_points = {mount_point.replace("\\040", " "): fs_type for mount_point, fs_type in entries}
+    for parent in (path, *path.parents):
+        if str(parent) in mount_points:
+            return mount_points[str(parent)] in NETWORK_FILESYSTEMS
+    return False
+
+
+def profile_for_path(path: Union[str, Path], name: str) -> str:
+    """Returns the profile, or 'safe' if the profile uses WAL and the file is on a network drive."""
+    if get_profile(name)["journal_mode"] == "WAL" and is_network_path(path):
+        return "safe"
+    return name
+
+
+# Pragmas that write to the database file, which are skipped on read-only connections.
+FILE_PRAGMAS = ("page_size", "journal_mode")
+
+
+def apply_profile(dbapi_connection, name: str, read_only: bool = False) -> None:
+    """
+    Applies the pragmas of a profile to a raw sqlite3 connection, along with foreign key enforcement. Read-only
+    connections keep the journal mode of the file, and are made query_only so a write fails even if the file
+    itself is writable.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA foreign_keys=ON")
+        for pragma, value in get_profile(name).items():  # page_size must come before journal_mode
+            if pragma in FILE_PRAGMAS and read_only:
+                continue
+            if pragma == "journal_mode":
+                _set_journal_mode(cursor, value)
+            else:
+                cursor.execute(f"PRAGMA {pragma}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _set_journal_mode(cursor, mode: str) -> None:
+    """Sets the journal mode of the file, unless another connection has it open. busy_timeout is set after."""
+    cursor.execute("PRAGMA busy_timeout=0")  # Don't wait for the other connections to close
+    try:
+        cursor.execute(f"PRAGMA journal_mode={mode}")
+    except sqlite3.OperationalError:
+        pass
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import MetaData, Table, or_, select
+from sqlalchemy.sql.elements import ColumnElement
+
+from .db import Base
+
+# SQLite's default limit on the number of databases attached to one connection.
+MAX_ATTACHED = 10
+
+
+def read_only_uri(path: Path) -> str:
+    """Returns the URI opening a database file read-only, as passed to ATTACH DATABASE on a URI connection."""
+    return f"{Path(path).resolve().as_uri()}?mode=ro"
+
+
+def attached_tables(alias: str) -> Dict[str, Table]:
+    """Returns copies of the tables qualified with the schema name of an attached database, by table name."""
+    metadata = MetaData()
+    return {table.name: table.to_metadata(metadata, schema=alias) for table in Base.metadata.sorted_tables}
+
+
+def simulation_filters(simulations: Table, parameters: Table, category: Optional[str],
+                       conditions: Dict[str, Any]) -> List[ColumnElement[bool]]:
+    """
+    Returns the criteria selecting rows of a simulations table by category and by parameter conditions, as
+    described in DatabaseHandler.find(). Taking the tables as arguments lets the same criteria be applied to the
+    tables of attached databases.
+    """
+    criteria = []
+    if category is not None:
+        criteria.append(simulations.c.category == category)
+
+    for key, condition in conditions.items():
+        matching = select(parameters.c.simulation_id).where(parameters.c.key == key)
+
+        if isinstance(condition, tuple):
+            if len(condition) != 2:
+                raise ValueError(f"Range for parameter '{key}' must be a (min, max) tuple, got {condition}.")
+            low, high = condition
+            if low is not None:
+                matching = matching.where(parameters.c.numeric_value >= low)
+            if high is not None:
+                matching = matching.where(parameters.c.numeric_value <= high)
+            if low is None and high is None:
+                matching = matching.where(parameters.c.numeric_value.is_not(None))
+        elif isinstance(condition, (list, set, frozenset)):
+            numbers = [value for value in condition if isinstance(value, (int, float))]
+            texts = [str(value) for value in condition if not isinstance(value, (int, float))]
+            matching = matching.where(or_(parameters.c.numeric_value.in_(numbers),
+                                          parameters.c.text_value.in_(texts)))
+        elif isinstance(condition, (int, float)):
+            matching = matching.where(parameters.c.numeric_value == condition)
+        else:
+            matching = matching.where(parameters.c.text_value == str(condition))
+
+        criteria.append(simulations.c.id.in_(matching))
+
+    return criteria
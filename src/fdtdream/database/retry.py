@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import functools
+import random
+import time
+from typing import Callable, TypeVar
+
+from sqlalchemy.exc import OperationalError
+
+T = TypeVar("T")
+
+# Attempts made by retry_on_busy() before the error is raised, and the delays between them in seconds. The delay
+# doubles after every attempt, with random jitter so that competing writers don't retry in lockstep.
+BUSY_ATTEMPTS = 6
+BUSY_DELAY = 0.05
+BUSY_MAX_DELAY = 2.0
+
+
+def is_busy_error(error: BaseException) -> bool:
+    """
+    Returns True if the error is SQLITE_BUSY or SQLITE_LOCKED. SQLite returns these without waiting out the busy
+    timeout when waiting could deadlock, ie. when a reader tries to upgrade to a writer while another connection
+    holds the write lock, so they have to be retried by starting the transaction over.
+    """
+    if not isinstance(error, OperationalError):
+        return False
+    message = str(error.orig).lower()
+    return "database is locked" in message or "database table is locked" in message
+
+
+def retry_on_busy(function: Callable[..., T]) -> Callable[..., T]:
+    """
+    Decorates a function running a single transaction, retrying it with exponential backoff while another
+    connection holds the lock it needs. A failed transaction is rolled back, so the function can be started over.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs) -> T:
+        delay = BUSY_DELAY
+        for _ in range(BUSY_ATTEMPTS - 1):
+            try:
+                return function(*args, **kwargs)
+            except OperationalError as e:
+                if not is_busy_error(e):
+                    raise
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, BUSY_MAX_DELAY)
+        return function(*args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from numpy.typing import NDArray
+from sqlalchemy import insert, or_, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import ColumnElement
+
+from .db import GridModel, MonitorModel, ResampledSpectrumModel, SimulationModel
+from .grids import hash_grid
+
+# Points of the wavelength grid spectra are resampled onto, plenty for lines drawn across a plot.
+RESAMPLED_POINTS = 512
+
+SPECTRUM_QUANTITIES = ("T", "power")
+
+
+class SpectrumBlock(NamedTuple):
+    """The resampled spectra of a category, one row per monitor in order of simulation and monitor id."""
+
+    wavelengths: NDArray
+    """The (Nλ,) wavelength grid shared by the rows."""
+
+    simulation_ids: NDArray
+    monitor_ids: NDArray
+
+    values: NDArray
+    """The (Nruns, Nλ) float32 spectra, NaN outside the wavelength range recorded by each monitor."""
+
+    def line_collection(self, **kwargs) -> LineCollection:
+        """Returns all the spectra as a single artist. Keyword arguments are passed on to the LineCollection."""
+        segments = np.empty(self.values.shape + (2,))
+        segments[..., 0] = self.wavelengths
+        segments[..., 1] = self.values
+        return LineCollection(segments, **kwargs)
+
+
+class Spectra(NamedTuple):
+    """The raw spectra of a monitor, to be resampled."""
+
+    monitor_id: int
+    category: Optional[str]
+    wavelengths: Optional[NDArray]
+    T: Optional[NDArray]
+    power: Optional[NDArray]
+
+
+def resample(wavelengths: NDArray, values: Optional[NDArray], grid: NDArray) -> Optional[NDArray]:
+    """
+    Linearly interpolates a spectrum onto the grid, with NaN outside the wavelengths it was recorded at. Returns
+    None if the values are not a real spectrum over the wavelengths.
+    """
+    if values is None:
+        return None
+    values = np.asarray(values)
+    if values.ndim != 1 or len(values) != len(wavelengths) or len(values) == 0 or np.iscomplexobj(values):
+        return None
+
+    order = np.argsort(wavelengths)  # Wavelengths converted from frequencies are descending
+    resampled = np.interp(grid, np.asarray(wavelengths, dtype=np.float64)[order], values[order],
+                          left=np.nan, right=np.nan)
+    return resampled.astype(np.float32)
+
+
+def covering_grid(grid: Optional[NDArray], wavelengths: Iterable[NDArray]) -> Optional[NDArray]:
+    """
+    Returns the grid if it covers all the wavelengths, and otherwise a new grid spanning both, so a category's grid
+    only ever widens.
+    """
+    ranges = [(float(np.min(values)), float(np.max(values))) for values in wavelengths if len(values)]
+    if not ranges:
+        return grid
+
+    low, high = min(low for low, _ in ranges), max(high for _, high in ranges)
+    if grid is not None:
+        if grid[0] <= low and high <= grid[-1]:
+            return grid
+        low, high = min(low, grid[0]), max(high, grid[-1])
+    return np.linspace(low, high, RESAMPLED_POINTS)
+
+
+def _grid_values(connection: Connection, grid_ids: Iterable[int]) -> Dict[int, NDArray]:
+    stmt = select(GridModel.id, GridModel.values).where(GridModel.id.in_(set(grid_ids)))
+    return dict(connection.execute(stmt).tuples().all())
+
+
+def _get_or_create_grid_id(connection: Connection, grid: NDArray) -> int:
+    digest = hash_grid(grid)
+    grid_id = connection.execute(select(GridModel.id).where(GridModel.digest == digest)).scalar()
+    if grid_id is None:
+        grid_id = connection.execute(
+            insert(GridModel).values(digest=digest, values=grid).returning(GridModel.id)
+        ).scalar_one()
+    return grid_id
+
+
+def _category_grid_id(connection: Connection, category: Optional[str]) -> Optional[int]:
+    """Returns the grid the last spectrum of the category was resampled onto, which covers the ones before it."""
+    stmt = (
+        select(ResampledSpectrumModel.grid_id)
+        .join(MonitorModel, MonitorModel.id == ResampledSpectrumModel.monitor_id)
+        .join(SimulationModel, SimulationModel.id == MonitorModel.simulation_id)
+        .where(SimulationModel.category.is_(category) if category is None else SimulationModel.category == category)
+        .order_by(ResampledSpectrumModel.monitor_id.desc())
+        .limit(1)
+    )
+    return connection.execute(stmt).scalar()
+
+
+def store_resampled_spectra(connection: Connection, spectra: Sequence[Spectra]) -> int:
+    """
+    Resamples the spectra of monitors onto the grids of their categories and inserts them, widening a category's
+    grid first if the spectra extend beyond it. Monitors without spectra are skipped.
+
+    Returns the number of monitors stored.
+    """
+    by_category: Dict[Optional[str], List[Spectra]] = defaultdict(list)
+    for monitor in spectra:
+        if monitor.wavelengths is not None and (monitor.T is not None or monitor.power is not None):
+            by_category[monitor.category].append(monitor)
+
+    rows = []
+    for category, monitors in by_category.items():
+        grid_id = _category_grid_id(connection, category)
+        grid = _grid_values(connection, [grid_id])[grid_id] if grid_id is not None else None
+        wider = covering_grid(grid, (monitor.wavelengths for monitor in monitors))
+        if wider is not grid:
+            grid, grid_id = wider, _get_or_create_grid_id(connection, wider)
+
+        for monitor in monitors:
+            T = resample(monitor.wavelengths, monitor.T, grid)
+            power = resample(monitor.wavelengths, monitor.power, grid)
+            if T is not None or power is not None:
+                rows.append({"monitor_id": monitor.monitor_id, "grid_id": grid_id, "T": T, "power": power})
+
+    if rows:
+        connection.execute(insert(ResampledSpectrumModel), rows)
+    return len(rows)
+
+
+def unresampled_spectra(connection: Connection, *conditions: ColumnElement[bool], limit: Optional[int] = None
+                        ) -> List[Spectra]:
+    """
+    Returns the spectra of monitors matching the conditions that have spectra but were not resampled, ie. monitors
+    stored before resampled spectra were introduced, or copied from another database.
+    """
+    monitors = MonitorModel.__table__
+    stmt = (
+        select(monitors.c.id, SimulationModel.category, monitors.c.wavelengths_grid_id, monitors.c.wavelengths,
+               monitors.c.T, monitors.c.power)
+        .join(SimulationModel, SimulationModel.id == monitors.c.simulation_id)
+        .where(
+            or_(monitors.c.T.is_not(None), monitors.c.power.is_not(None)),
+            ~select(ResampledSpectrumModel.monitor_id)
+            .where(ResampledSpectrumModel.monitor_id == monitors.c.id).exists(),
+            *conditions
+        )
+        .order_by(monitors.c.id)
+        .limit(limit)
+    )
+    rows = connection.execute(stmt).all()
+
+    grids = _grid_values(connection, (row.wavelengths_grid_id for row in rows if row.wavelengths_grid_id is not None))
+    return [Spectra(row.id, row.category, grids.get(row.wavelengths_grid_id, row.wavelengths), row.T, row.power)
+            for row in rows]
+
+
+def spectrum_block(connection: Connection, category: str, quantity: str = "T",
+                   monitor_name: Optional[str] = None) -> Optional[SpectrumBlock]:
+    """
+    Reads the resampled spectra of a category with a single query. Spectra resampled onto an earlier, narrower grid
+    of the category, or moved in from another category, are interpolated onto the widest grid. Returns None if the
+    category has no resampled spectra.
+    """
+    if quantity not in SPECTRUM_QUANTITIES:
+        raise ValueError(f"Unknown spectrum '{quantity}'. Spectra are {list(SPECTRUM_QUANTITIES)}.")
+
+    column = getattr(ResampledSpectrumModel, quantity)
+    stmt = (
+        select(MonitorModel.simulation_id, ResampledSpectrumModel.monitor_id, ResampledSpectrumModel.grid_id, column)
+        .join(MonitorModel, MonitorModel.id == ResampledSpectrumModel.monitor_id)
+        .join(SimulationModel, SimulationModel.id == MonitorModel.simulation_id)
+        .where(SimulationModel.category == category, column.is_not(None))
+        .order_by(MonitorModel.simulation_id, ResampledSpectrumModel.monitor_id)
+    )
+    if monitor_name is not None:
+        stmt = stmt.where(MonitorModel.name == monitor_name)
+    rows: List[Tuple[int, int, int, NDArray]] = connection.execute(stmt).tuples().all()
+    if not rows:
+        return None
+
+    grids = _grid_values(connection, (grid_id for _, _, grid_id, _ in rows))
+    grid_id = max(grids, key=lambda key: (grids[key][-1] - grids[key][0], key))
+    grid = grids[grid_id]
+
+    values = np.empty((len(rows), len(grid)), dtype=np.float32)
+    for i, (_, _, row_grid_id, spectrum) in enumerate(rows):
+        if row_grid_id == grid_id:
+            values[i] = spectrum
+        else:
+            values[i] = np.interp(grid, grids[row_grid_id], spectrum, left=np.nan, right=np.nan)
+
+    return SpectrumBlock(
+        wavelengths=grid,
+        simulation_ids=np.array([row[0] for row in rows], dtype=np.int64),
+        monitor_ids=np.array([row[1] for row in rows], dtype=np.int64),
+        values=values
+    )
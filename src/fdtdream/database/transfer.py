@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from typing import Dict, Sequence, Set, Tuple
+
+from sqlalchemy import LargeBinary, Table, delete, func, insert, literal, select, type_coerce
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import ColumnElement
+
+from .codecs import REFERENCE_HEADER, read_reference
+from .db import Base, NumpyArrayType
+from .spectra import store_resampled_spectra, unresampled_spectra
+
+
+def _id_offset(connection: Connection, target: Table, source: Table, where: ColumnElement[bool]) -> int:
+    """
+    Returns the offset added to the ids of the source rows matching the condition to place them after the last row
+    of the target table. Offsetting keeps the ids of copied rows unique, and lets children find their new parent
+    ids by adding the same offset to their foreign keys.
+    """
+    max_id = connection.execute(select(func.max(target.c.id))).scalar() or 0
+    min_id = connection.execute(select(func.min(source.c.id)).where(where)).scalar() or 0
+    return max_id + 1 - min_id
+
+
+def _copy_rows(connection: Connection, target: Table, source: Table, where: ColumnElement[bool],
+               **overrides: ColumnElement) -> Set[str]:
+    """
+    Copies the source rows matching the condition with a single INSERT ... SELECT, so array columns are moved as
+    stored, without being decoded. Columns are copied as they are unless given an expression in overrides. Ids
+    are assigned by the target unless overridden.
+
+    Returns the digests of the blob store arrays referenced by the copied rows.
+    """
+    columns = [column.name for column in target.columns if column.name != "id" or "id" in overrides]
+    stmt = select(*(overrides.get(name, source.c[name]) for name in columns)).where(where)
+    connection.execute(insert(target).from_select(columns, stmt))
+
+    digests = set()
+    for column in source.columns:
+        if isinstance(column.type, NumpyArrayType) and column.type.external:
+            raw = type_coerce(column, LargeBinary)
+            references = select(raw).where(where, func.substr(raw, 1, len(REFERENCE_HEADER)) == REFERENCE_HEADER)
+            digests.update(read_reference(blob) for blob in connection.execute(references).scalars())
+    return digests
+
+
+def _by_digest(target: Table, source: Table, source_id: ColumnElement) -> ColumnElement:
+    """Returns the id of the target row with the same digest as the source row with the given id."""
+    return (
+        select(target.c.id)
+        .where(target.c.digest == select(source.c.digest).where(source.c.id == source_id).scalar_subquery())
+        .scalar_subquery()
+    )
+
+
+def _copy_by_digest(connection: Connection, target: Table, source: Table, ids: ColumnElement,
+                    **overrides: ColumnElement) -> None:
+    """Copies the content-addressed source rows with the given ids that the target does not hold yet."""
+    _copy_rows(connection, target, source, source.c.id.in_(ids) & source.c.digest.not_in(select(target.c.digest)),
+               **overrides)
+
+
+def copy_simulations(connection: Connection, source: Dict[str, Table], sim_ids: Sequence[int],
+                     replace: bool = False) -> Tuple[Dict[int, int], Set[str]]:
+    """
+    Copies simulations with all their rows from an attached database into the main database of the connection.
+
+    Grids and meshes already in the target are shared rather than copied. Mesh reference counts are updated by the
+    triggers on the structures table. The spectra of the copied monitors are resampled onto the wavelength grids of
+    their categories in the target, rather than copied along with the grids of the source.
+
+    Args:
+        connection (Connection): Connection to the target database, with the source database attached.
+        source (Dict[str, Table]): The tables of the source database, as returned by queries.attached_tables().
+        sim_ids (Sequence[int]): Ids of the simulations in the source database.
+        replace (bool): Delete simulations in the target with the same uuid as a copied one first, so simulations
+            copied before are updated rather than duplicated.
+
+    Returns:
+        Dict[int, int]: The new id of every copied simulation by its id in the source. Ids missing from the source
+            are left out.
+        Set[str]: The digests of the blob store arrays referenced by the copied rows, which have to be copied to
+            the blob store of the target.
+    """
+    tables = {table.name: table for table in Base.metadata.sorted_tables}
+    simulations, monitors, fields = tables["simulations"], tables["monitors"], tables["fields"]
+    src_simulations, src_monitors, src_fields = source["simulations"], source["monitors"], source["fields"]
+
+    in_batch = src_simulations.c.id.in_(sim_ids)
+    monitors_in_batch = src_monitors.c.simulation_id.in_(sim_ids)
+    monitor_ids = select(src_monitors.c.id).where(monitors_in_batch)
+    fields_in_batch = src_fields.c.monitor_id.in_(monitor_ids)
+    field_ids = select(src_fields.c.id).where(fields_in_batch)
+
+    if replace:
+        connection.execute(delete(simulations).where(
+            simulations.c.uuid.in_(select(src_simulations.c.uuid).where(in_batch))
+        ))
+
+    sim_offset = _id_offset(connection, simulations, src_simulations, in_batch)
+    monitor_offset = _id_offset(connection, monitors, src_monitors, monitors_in_batch)
+    field_offset = _id_offset(connection, fields, src_fields, fields_in_batch)
+
+    copied = list(connection.execute(select(src_simulations.c.id).where(in_batch)).scalars())
+    digests = _copy_rows(connection, simulations, src_simulations, in_batch, id=src_simulations.c.id + sim_offset)
+
+    src_parameters = source["parameters"]
+    digests |= _copy_rows(connection, tables["parameters"], src_parameters, src_parameters.c.simulation_id.in_(sim_ids),
+                          simulation_id=src_parameters.c.simulation_id + sim_offset)
+
+    # Structures, sharing meshes with identical geometry
+    src_structures, src_meshes = source["structures"], source["meshes"]
+    structures_in_batch = src_structures.c.simulation_id.in_(sim_ids)
+    # Reference counts start at zero, as the triggers count the structures copied after the meshes.
+    _copy_by_digest(connection, tables["meshes"], src_meshes,
+                    select(src_structures.c.mesh_id).where(structures_in_batch), ref_count=literal(0))
+    digests |= _copy_rows(connection, tables["structures"], src_structures, structures_in_batch,
+                          simulation_id=src_structures.c.simulation_id + sim_offset,
+                          mesh_id=_by_digest(tables["meshes"], src_meshes, src_structures.c.mesh_id))
+
+    # Monitors, sharing coordinate and wavelength grids
+    grid_columns = ("wavelengths_grid_id", "x_grid_id", "y_grid_id", "z_grid_id")
+    for column in grid_columns:
+        _copy_by_digest(connection, tables["grids"], source["grids"],
+                        select(src_monitors.c[column]).where(monitors_in_batch))
+    digests |= _copy_rows(connection, monitors, src_monitors, monitors_in_batch,
+                          id=src_monitors.c.id + monitor_offset,
+                          simulation_id=src_monitors.c.simulation_id + sim_offset,
+                          **{column: _by_digest(tables["grids"], source["grids"], src_monitors.c[column])
+                             for column in grid_columns})
+
+    # Fields, their chunks, and derived quantities
+    digests |= _copy_rows(connection, fields, src_fields, fields_in_batch,
+                          id=src_fields.c.id + field_offset,
+                          monitor_id=src_fields.c.monitor_id + monitor_offset)
+    src_chunks = source["field_chunks"]
+    digests |= _copy_rows(connection, tables["field_chunks"], src_chunks, src_chunks.c.field_id.in_(field_ids),
+                          field_id=src_chunks.c.field_id + field_offset)
+    src_derived = source["derived_quantities"]
+    digests |= _copy_rows(connection, tables["derived_quantities"], src_derived,
+                          src_derived.c.monitor_id.in_(monitor_ids),
+                          monitor_id=src_derived.c.monitor_id + monitor_offset)
+
+    new_ids = {sim_id: sim_id + sim_offset for sim_id in copied}
+    store_resampled_spectra(connection, unresampled_spectra(connection, monitors.c.simulation_id.in_(new_ids.values())))
+    return new_ids, digests
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import create_engine, select, union
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import StaticPool
+
+from .db import DatabaseStateModel, MonitorModel, SimulationModel
+from .queries import read_only_uri
+from .retry import is_busy_error
+
+if TYPE_CHECKING:
+    from .handler import DatabaseHandler
+
+# Milliseconds a poll waits for a writer to release its lock before giving up until the next poll.
+POLL_BUSY_TIMEOUT = 100
+
+
+class TreeChanges(NamedTuple):
+    """Changes to the category/simulation/monitor hierarchy of a database since the previous poll."""
+
+    rows: List[Tuple[str, int, str, Optional[int], Optional[str]]]
+    """Rows of the added and changed simulations, as returned by DatabaseHandler.get_tree_snapshot()."""
+
+    removed: List[int]
+    """Ids of the simulations deleted."""
+
+
+class DatabaseWatcher:
+    """
+    Detects commits made to a database by other connections, ie. by a simulation script writing results while the
+    database is viewed in FDTDiscover, and reports how they changed the tree of the database.
+
+    The watcher keeps a read-only connection of its own open, and compares PRAGMA data_version on it, which SQLite
+    changes whenever another connection commits. Polling an unchanged database costs that single pragma. After a
+    commit, the simulations changed are found through the row versions the triggers stamp on simulations and
+    monitors, and the deleted ones by comparing ids.
+    """
+
+    handler: DatabaseHandler
+    engine: Engine
+
+    def __init__(self, handler: DatabaseHandler) -> None:
+        self.handler = handler
+        # data_version is tracked per connection, so the engine holds exactly one.
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool,
+            creator=lambda: sqlite3.connect(read_only_uri(handler.path), uri=True, check_same_thread=False,
+                                            timeout=POLL_BUSY_TIMEOUT / 1000)
+        )
+        self.reset()
+
+    def reset(self) -> None:
+        """Takes the current state of the database as the one the next poll reports changes from."""
+        with self.engine.connect() as connection:
+            self._data_version = connection.exec_driver_sql("PRAGMA data_version").scalar()
+            self._row_version = connection.execute(select(DatabaseStateModel.row_version)).scalar_one()
+            self._monitors = self._monitor_simulations(connection)
+            self._simulations = set(connection.execute(select(SimulationModel.id)).scalars())
+
+    @staticmethod
+    def _monitor_simulations(connection) -> Dict[int, int]:
+        return dict(connection.execute(select(MonitorModel.id, MonitorModel.simulation_id)).all())
+
+    def poll(self) -> Optional[TreeChanges]:
+        """
+        Returns the changes committed since the previous poll, or None if there are none. If a writer holds the
+        lock for longer than POLL_BUSY_TIMEOUT, None is returned and the changes are reported by a later poll.
+        """
+        try:
+            with self.engine.connect() as connection:
+                data_version = connection.exec_driver_sql("PRAGMA data_version").scalar()
+                if data_version == self._data_version:
+                    return None
+                return self._changes(connection, data_version)
+        except OperationalError as e:
+            if is_busy_error(e):
+                return None
+            raise
+
+    def _changes(self, connection, data_version: int) -> TreeChanges:
+        row_version = connection.execute(select(DatabaseStateModel.row_version)).scalar_one()
+        monitors = self._monitor_simulations(connection)
+        simulations = set(connection.execute(select(SimulationModel.id)).scalars())
+
+        # Deleting a monitor doesn't stamp its simulation, so those are found through the monitors that are gone.
+        changed = set(connection.execute(union(
+            select(SimulationModel.id).where(SimulationModel.row_version > self._row_version),
+            select(MonitorModel.simulation_id).where(MonitorModel.row_version > self._row_version),
+        )).scalars())
+        changed.update(self._monitors[mon_id] for mon_id in self._monitors.keys() - monitors.keys())
+        changed &= simulations
+
+        rows = []
+        if changed:
+            stmt = (
+                select(SimulationModel.category, SimulationModel.id, SimulationModel.name,
+                       MonitorModel.id, MonitorModel.name)
+                .outerjoin(MonitorModel, MonitorModel.simulation_id == SimulationModel.id)
+                .where(SimulationModel.id.in_(changed))
+                .order_by(SimulationModel.category, SimulationModel.id, MonitorModel.id)
+            )
+            rows = [tuple(row) for row in connection.execute(stmt)]
+
+        removed = sorted(self._simulations - simulations)
+        self._data_version, self._row_version = data_version, row_version
+        self._monitors, self._simulations = monitors, simulations
+        return TreeChanges(rows, removed)
+
+    def close(self) -> None:
+        self.engine.dispose()
@@ -1,10 +1,16 @@
-from typing import TypedDict, Unpack, Self
+from typing import TypedDict, Unpack, Self, Union
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.constants import c as light_speed
 
 from .monitor import Monitor
 from .settings import general, advanced
 from ..base_classes import BaseGeometry
 from ..base_classes.object_modules import ModuleCollection
+from ..resources.functions import convert_length
 from ..resources.literals import MONITOR_TYPES_ALL
+from ..results.monitors import IndexMonitor as IndexMonitorResults, build_material_map
 
 
 class IndexMonitorKwargs(TypedDict, total=False):
@@ -123,4 +129,57 @@ class IndexMonitor(Monitor):
             self.settings.geometry.set_dimensions(**dimensions)
 
     def copy(self, name, **kwargs: Unpack[IndexMonitorKwargs]) -> Self:
-        return super().copy(name, **kwargs)
\ No newline at end of file
+        return super().copy(name, **kwargs)
+
+    def _get_results(self) -> Union[IndexMonitorResults, None]:
+
+        # Fetch lumapi
+        lumapi = self._lumapi
+
+        # Return None if the monitor has not recorded any index data.
+        available_results = lumapi.getresult(self.name).split("\n")
+        if "index" not in available_results:
+            return None
+
+        # Ready the set of parameters to be saved.
+        parameters = {
+            "Monitor type": "Index",
+            "Geometry type": self._get("monitor type", str),
+            "x [nm]": convert_length(self._get("x", float), "m", "nm"),
+            "y [nm]": convert_length(self._get("y", float), "m", "nm"),
+            "z [nm]": convert_length(self._get("z", float), "m", "nm"),
+            "x span [nm]": convert_length(self._get("x span", float), "m", "nm"),
+            "y span [nm]": convert_length(self._get("y span", float), "m", "nm"),
+            "z span [nm]": convert_length(self._get("z span", float), "m", "nm")
+        }
+
+        index_data = lumapi.getresult(self.name, "index")
+
+        # region Extract wavelengths
+        frequencies: NDArray = np.asarray(index_data["f"])
+
+        # Convert to wavelengths and reverse so the array is from shortest to longest.
+        raw_wavelengths = light_speed / frequencies.flatten()[::-1]
+        wavelengths = np.ascontiguousarray(convert_length(raw_wavelengths, "m", "nm").astype(np.float32))
+        # endregion
+
+        # region Extract coordinates
+        fetched_axes = {}
+        for axis in ["x", "y", "z"]:
+            coordinates = convert_length(np.asarray(index_data[axis], dtype=np.float64), "m", "nm")
+            fetched_axes[axis] = np.ascontiguousarray(np.atleast_1d(coordinates).flatten().astype(np.float32))
+        # endregion
+
+        # region Extract and compress the index
+        components = "".join(axis for axis in ["x", "y", "z"] if f"index_{axis}" in index_data)
+        index = np.stack([np.asarray(index_data[f"index_{axis}"]) for axis in components], axis=-1)
+
+        # Make sure the array is (Nx, Ny, Nz, Nλ, Nc) and reverse it along the wavelength axis.
+        index = index.reshape(*[len(fetched_axes[axis]) for axis in ["x", "y", "z"]], -1, len(components))
+        index = index[:, :, :, ::-1, :]
+
+        palette, index_map = build_material_map(index)
+        # endregion
+
+        return IndexMonitorResults(self.name, parameters, wavelengths, palette=palette, index_map=index_map,
+                                   components=components, **fetched_axes)
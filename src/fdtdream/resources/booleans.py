@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Iterable, Sequence
+
+import numpy as np
+import trimesh
+from manifold3d import Error, Manifold, Mesh64, OpType
+
+# Boolean operations on structure meshes. Meshes are converted to Manifolds once, the operations on them only
+# build a tree of booleans, and the tree is evaluated as a whole when the result is converted back with
+# to_trimesh(). Unions, differences and intersections of several meshes are single n-ary operations.
+
+
+def to_manifold(mesh: trimesh.Trimesh) -> Manifold:
+    """Converts a mesh to a Manifold. Raises a ValueError if the mesh is not a closed, oriented volume."""
+    if len(mesh.faces) == 0:
+        return Manifold()
+
+    manifold = Manifold(Mesh64(vert_properties=np.asarray(mesh.vertices, dtype=np.float64),
+                               tri_verts=np.asarray(mesh.faces, dtype=np.uint32)))
+    if manifold.status() != Error.NoError:
+        raise ValueError(f"Mesh is not a closed volume ({manifold.status().name}).")
+    return manifold
+
+
+def to_trimesh(manifold: Manifold) -> trimesh.Trimesh:
+    """Evaluates the booleans leading up to the Manifold and converts the result to a mesh."""
+    mesh = manifold.to_mesh64()
+    return trimesh.Trimesh(vertices=mesh.vert_properties[:, :3], faces=mesh.tri_verts, process=False)
+
+
+def union(manifolds: Iterable[Manifold]) -> Manifold:
+    """Returns the union of all the Manifolds, which is empty if there are none."""
+    manifolds = list(manifolds)
+    if len(manifolds) < 2:
+        return manifolds[0] if manifolds else Manifold()
+    return Manifold.batch_boolean(manifolds, OpType.Add)
+
+
+def difference(manifold: Manifold, subtracted: Iterable[Manifold]) -> Manifold:
+    """Returns the Manifold with all the subtracted Manifolds removed from it."""
+    subtracted = list(subtracted)
+    if not subtracted:
+        return manifold
+    return Manifold.batch_boolean([manifold] + subtracted, OpType.Subtract)
+
+
+def intersection(manifolds: Iterable[Manifold]) -> Manifold:
+    """Returns the volume common to all the Manifolds."""
+    manifolds = list(manifolds)
+    if len(manifolds) < 2:
+        return manifolds[0] if manifolds else Manifold()
+    return Manifold.batch_boolean(manifolds, OpType.Intersect)
+
+
+def mirror(manifold: Manifold, scale: Sequence[float], center: Sequence[float]) -> Manifold:
+    """Scales the Manifold by ±1 along each axis about the center, ie. mirrors it across the planes through it."""
+    center = tuple(float(c) for c in center)
+    return manifold.translate(tuple(-c for c in center)).scale(tuple(float(s) for s in scale)).translate(center)
@@ -1,7 +1,8 @@
 from __future__ import annotations
 from numpy.typing import NDArray
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from abc import ABC
+import numpy as np
 
 
 class Monitor(ABC):
@@ -38,6 +39,64 @@ class FieldAndPowerMonitor(Monitor):
         self.T, self.power = T, power
 
 
+class IndexMonitor(Monitor):
+    wavelengths: NDArray
+    x: NDArray
+    y: NDArray
+    z: NDArray
+    palette: NDArray
+    index_map: NDArray
+    components: str
+
+    def __init__(self, name: str, parameters: dict, wavelengths: NDArray, x: NDArray, y: NDArray, z: NDArray,
+                 palette: NDArray, index_map: NDArray, components: str) -> None:
+        super().__init__(name, parameters)
+
+        self.monitor_type = "index"
+
+        self.wavelengths = wavelengths
+        self.x, self.y, self.z = x, y, z
+        self.palette, self.index_map = palette, index_map
+        self.components = components
+
+
+def build_material_map(index: NDArray, decimals: Optional[int] = 4) -> Tuple[NDArray, NDArray]:
+    """
+    Compresses a complex refractive index array of shape (Nx, Ny, Nz, Nλ, Nc) into a palette of the unique
+    materials and a map of which palette entry each point uses.
+
+    Each point is identified by its index values over all wavelengths and components. If decimals is not None,
+    values are rounded to that many decimals first, so numerical noise doesn't create separate entries.
+
+    Returns:
+        Tuple[NDArray, NDArray]: The complex palette of shape (Npalette, Nλ, Nc) holding n + ik for each material,
+            and the uint8/uint16/uint32 index map of shape (Nx, Ny, Nz).
+    """
+    index = np.asarray(index, dtype=np.complex64)
+    if decimals is not None:
+        index = np.round(index, decimals)
+
+    signatures = np.ascontiguousarray(index.reshape(np.prod(index.shape[:3]), -1))
+    palette, inverse = np.unique(signatures, axis=0, return_inverse=True)
+
+    if len(palette) <= np.iinfo(np.uint8).max + 1:
+        map_dtype = np.uint8
+    elif len(palette) <= np.iinfo(np.uint16).max + 1:
+        map_dtype = np.uint16
+    else:
+        map_dtype = np.uint32
+
+    index_map = inverse.reshape(index.shape[:3]).astype(map_dtype)
+    palette = np.ascontiguousarray(palette.reshape(-1, *index.shape[3:]))
+
+    return palette, index_map
+
+
+def expand_material_map(palette: NDArray, index_map: NDArray) -> NDArray:
+    """Rebuilds the full (Nx, Ny, Nz, Nλ, Nc) complex index array from a palette and index map."""
+    return palette[index_map]
+
+
 class Field:
 
     field_name: str
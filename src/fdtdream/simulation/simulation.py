@@ -11,7 +11,7 @@ import pickle
 from .add import Add
 from ..interfaces import SimulationInterface, SimulationObjectInterface
 from ..lumapi import Lumapi
-from ..resources import errors
+from ..resources import booleans, errors
 from ..resources.functions import get_unique_name, convert_length
 from ..resources.literals import LENGTH_UNITS
 from .. import structures
@@ -26,7 +26,6 @@ from ..results.simulation import Simulation as SimulationResults
 from ..results.saved_simulation import SavedSimulation
 from ..database import DatabaseHandler
 import numpy as np
-from trimesh.boolean import intersection
 import trimesh
 from ..results.plotted_structure import PlottedStructure
 
@@ -509,8 +508,10 @@ class Simulation(SimulationInterface):
             m.apply_translation(fdtd_position - np.array([0, 0, z_span / 2]))
             mirrored_regions.append(m)
 
-        if mirrored_regions:
-            fdtd_mesh = trimesh.boolean.difference([fdtd_mesh, trimesh.boolean.union(mirrored_regions)])
+        # Convert the region and etches once, as every structure is cut by them.
+        fdtd_region = booleans.difference(booleans.to_manifold(fdtd_mesh),
+                                          [booleans.to_manifold(m) for m in mirrored_regions])
+        etches = booleans.union(booleans.to_manifold(m) for m in etch_structures)
 
         # Define mirror directions
         mirror_axes = []
@@ -528,20 +529,23 @@ class Simulation(SimulationInterface):
             mirror_axes.append([1])
 
         def mirror_structure(struct, parent_group) -> SavedStructure | None:
-            org_mesh = struct._get_trimesh(absolute=True, units="nm")
-
-            # Remove potential etches
-            if etch_structures:
-                org_mesh = trimesh.boolean.difference([org_mesh] + etch_structures)
-
+            original_mesh = struct._get_trimesh(absolute=True, units="nm")
+            org_mesh = None
             mirrored = []
 
             try:
+                # Fails for meshes that are not closed volumes, which are saved as they are.
+                org_mesh = booleans.to_manifold(original_mesh)
+
+                # Remove potential etches
+                if etch_structures:
+                    org_mesh = booleans.difference(org_mesh, [etches])
+
                 # Get the portion of the structure that is inside the mirrored region
-                mirror_part = trimesh.boolean.intersection([org_mesh, fdtd_mesh])
+                mirror_part = booleans.intersection([org_mesh, fdtd_region])
 
                 # Return None if no part of the structure is inside the region.
-                if mirror_part.is_empty:
+                if mirror_part.is_empty():
                     return None
 
                 # Mirror across symmetric axes (assumes mirroring around the fdtd_center)
@@ -549,21 +553,20 @@ class Simulation(SimulationInterface):
                     if scale == (1, 1, 1):
                         mirrored.append(mirror_part)
                     else:
-                        m = mirror_part.copy()
-                        m.apply_translation(-fdtd_center)
-                        m.apply_scale(scale)
-                        m.apply_translation(fdtd_center)
-                        mirrored.append(m)
+                        mirrored.append(booleans.mirror(mirror_part, scale, fdtd_center))
 
             except Exception as e:
                 print(f"Warning: Mirroring failed for structure '{struct.name}': {e}")
 
             # Combine original and mirrored pieces
-            try:
-                recombined_struct = trimesh.boolean.union(mirrored)
-            except Exception as e:
-                print(f"Warning: Concatenation failed for '{struct.name}': {e}")
-                recombined_struct = org_mesh
+            if org_mesh is None:
+                recombined_struct = original_mesh
+            else:
+                try:
+                    recombined_struct = booleans.to_trimesh(booleans.union(mirrored) if mirrored else org_mesh)
+                except Exception as e:
+                    print(f"Warning: Concatenation failed for '{struct.name}': {e}")
+                    recombined_struct = original_mesh
 
             saved_structure = SavedStructure(struct.name, recombined_struct)
 
@@ -594,13 +597,16 @@ class Simulation(SimulationInterface):
             simulation_category: str,
             simulation_name: str,
             parameters: Dict[str, Union[str, float, int, bool]] = None,
-            info_text: str = None) -> SimulationResults:
+            info_text: str = None,
+            store_derived: bool = False) -> SimulationResults:
         """
         Runs the simulation and extracts the result to the database at the database_path.
         The category is a string deciding what "folder" in the database to put the simulation in.
         The simulation name is the name of the simulation in the database.
         The parameter dictionary is an optional set of parameters that can be saved to the database.
         The info_text string is a str you can save to the simulation with additional information.
+        If store_derived is True, quantities derived from the recorded fields (|E|^2, |H|^2, colour limits and the
+        integrated Poynting flux) are stored alongside them, so viewers don't have to recompute them.
         """
 
         # Check if a simulation region has been added
@@ -658,7 +664,7 @@ class Simulation(SimulationInterface):
         )
 
         # Add the model to the database.
-        db_handler.add_simulation(saved_sim)
+        db_handler.add_simulation(saved_sim, store_derived=store_derived)
 
         # Switch back to layout and save the temp file again (to avoid double saving data).
         self._lumapi().switchtolayout()
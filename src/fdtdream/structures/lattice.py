@@ -3,7 +3,6 @@ from __future__ import annotations
 from typing import TypedDict, Unpack, Iterable
 
 import numpy as np
-import trimesh.boolean
 from numpy.typing import NDArray
 from trimesh import Trimesh
 
@@ -11,7 +10,7 @@ from .rotation import Rotation
 from .structure import UpdatableStructure, Structure
 from ..base_classes import BaseGeometry, ModuleCollection
 from ..interfaces import SimulationInterface, SimulationObjectInterface
-from ..resources import validation
+from ..resources import booleans, validation
 from ..resources.constants import DECIMALS
 from ..resources.functions import convert_length
 from ..resources.literals import LENGTH_UNITS, AXES
@@ -387,19 +386,18 @@ class Lattice(UpdatableStructure):
             latticepos = convert_length(self._get_position(absolute=absolute), "m", units)
             base_structure_pos = convert_length(self._base_structure._get_position(absolute=False), self._units, units)
             base_poly = self._base_structure._get_trimesh(absolute=False, units=units)
-            base_poly: Trimesh = base_poly.apply_translation(-base_structure_pos)
+            base_poly = booleans.to_manifold(base_poly.apply_translation(-base_structure_pos))
 
-            # Make copies at each lattice site.
+            # Place a copy at each lattice site. The copies share the converted base mesh.
             polys = []
             sites = convert_length(self._sites, "m", units)
             for row in sites:
                 for site in row:
                     site = np.array((site[0], site[0], 0)) + latticepos
-                    copied = base_poly.copy()
-                    polys.append(copied.apply_translation(site))
+                    polys.append(base_poly.translate(tuple(site)))
 
             # Merge all polygons
-            merged: Trimesh = trimesh.boolean.union(polys)
+            merged: Trimesh = booleans.to_trimesh(booleans.union(polys))
 
             return merged
 
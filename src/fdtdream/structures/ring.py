@@ -12,7 +12,7 @@ from .structure import Structure
 from .settings import StructureSettings
 from ..base_classes import BaseGeometry
 from ..interfaces import SimulationInterface, SimulationObjectInterface
-from ..resources import validation, Materials
+from ..resources import booleans, validation, Materials
 from ..resources.functions import convert_length
 from ..resources.literals import AXES, LENGTH_UNITS
 
@@ -217,7 +217,7 @@ class Ring(Structure):
         inner_cylinder.apply_transform(scale_matrix_inner)
 
         # Subtract the inner cylinder from the outer cylinder to create the ring
-        ring = outer_cylinder.difference(inner_cylinder)
+        ring = booleans.difference(booleans.to_manifold(outer_cylinder), [booleans.to_manifold(inner_cylinder)])
 
         # Create a 2D mask polygon using Shapely
         if theta_start != theta_stop:
@@ -235,7 +235,9 @@ class Ring(Structure):
             mask_volume.apply_translation([0, 0, -z_span])
 
             # Subtract the mask from the ring
-            ring = ring.intersection(mask_volume)
+            ring = booleans.intersection([ring, booleans.to_manifold(mask_volume)])
+
+        ring = booleans.to_trimesh(ring)
 
         # Translate the ring to its final position
         position = convert_length(self._get_position(absolute), "m", units)
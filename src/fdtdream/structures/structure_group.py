@@ -23,7 +23,7 @@ from ..base_classes import BaseGeometry, Module
 from ..resources.functions import convert_length
 from ..resources.literals import AXES, LENGTH_UNITS
 from ..resources.materials_literal import Materials
-from ..resources import validation
+from ..resources import booleans, validation
 
 T = TypeVar("T")
 
@@ -241,8 +241,8 @@ class StructureGroup(Structure):
         else:
             validation.in_literal(units, "units", LENGTH_UNITS)
 
-        trimeshes = [obj._get_trimesh(absolute=False, units="nm") for obj in self._structures]
-        union = trimesh.boolean.union(trimeshes)
+        manifolds = [booleans.to_manifold(obj._get_trimesh(absolute=False, units="nm")) for obj in self._structures]
+        union = booleans.to_trimesh(booleans.union(manifolds))
         union = trimesh.Trimesh(vertices=convert_length(union.vertices, "nm", units), faces=union.faces)
         translated = union.apply_translation(convert_length(self._get_position(absolute), "m", units))
 